@@ -3,11 +3,15 @@
 Usage:
     python embed_tweets.py                  # Embed all un-embedded tweets
     python embed_tweets.py --force          # Re-embed everything
-    python embed_tweets.py --source-id XX   # Only embed tweets from a specific source
+    python embed_tweets.py --source-id XX   # Only new / changed tweets of a specific source
+
+Vectors are looked up in the global embedding_cache first (migration 015); only texts
+no one has embedded before are sent to OpenAI.
 """
 
 import os
 import sys
+import asyncio
 import argparse
 import logging
 from pathlib import Path
@@ -19,10 +23,22 @@ load_dotenv(ROOT_DIR / '.env')
 from openai import OpenAI
 from supabase import create_client
 
+from services.embedding_store import (
+    EMBEDDING_MODEL,
+    clean_for_embedding,
+    embedding_key,
+    fill_source_tweets_from_cache,
+    get_cached_embeddings,
+    put_cached_embeddings,
+    save_source_tweet_embeddings,
+    select_rows_to_embed,
+)
+from services.topic_embedding_cache import topic_embedding_cache
+from services.vector_index import search_source_tweets, source_vector_index
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 logger = logging.getLogger(__name__)
 
-EMBEDDING_MODEL = "text-embedding-3-small"
 BATCH_SIZE = 100
 
 supabase_url = os.environ['SUPABASE_URL']
@@ -32,126 +48,119 @@ supabase = create_client(supabase_url, supabase_key)
 openai_client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
 
 
-def get_tweets_to_embed(source_id: str = None, force: bool = False) -> list:
-    """Fetch tweets that need embedding."""
-    query = supabase.table("source_tweets").select("id, content")
+def get_tweets_to_embed(source_id: str = None, force: bool = False) -> tuple[list, int]:
+    """Fetch tweets whose content has no up-to-date embedding.
+
+    A row needs embedding when its stored content_hash doesn't match the hash of its
+    current content (new row, or text changed since the last embed). force=True
+    re-embeds everything. Returns (pending rows with "hash", skipped count).
+    """
+    query = supabase.table("source_tweets").select("id, content, content_hash")
     
     if source_id:
         query = query.eq("source_id", source_id)
-    
-    if not force:
-        query = query.is_("embedding", "null")
+    elif not force:
+        # Tüm tablo: sadece hiç embed edilmemiş / hash'i olmayan satırlar
+        query = query.or_("embedding.is.null,content_hash.is.null")
     
     result = query.limit(5000).execute()
-    return result.data or []
+    return select_rows_to_embed(result.data or [], force=force)
 
 
-def embed_batch(texts: list[str]) -> list[list[float]]:
-    """Embed a batch of texts using OpenAI."""
+def _embed_uncached(texts: list[str]) -> list[list[float]]:
+    """Embed cleaned texts with OpenAI and store the vectors in embedding_cache."""
     response = openai_client.embeddings.create(
         model=EMBEDDING_MODEL,
         input=texts
     )
-    return [item.embedding for item in response.data]
+    embeddings = [item.embedding for item in response.data]
+    put_cached_embeddings(supabase, [embedding_key(t) for t in texts], embeddings)
+    return embeddings
 
 
-def save_embeddings(tweet_ids: list[str], embeddings: list[list[float]]):
-    """Save embeddings to Supabase one by one (pgvector needs special handling)."""
-    for tweet_id, embedding in zip(tweet_ids, embeddings):
-        try:
-            supabase.table("source_tweets").update({
-                "embedding": embedding
-            }).eq("id", tweet_id).execute()
-        except Exception as e:
-            logger.error(f"Failed to save embedding for {tweet_id}: {e}")
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    """Embed a batch of texts, calling OpenAI only for texts missing from embedding_cache."""
+    cleaned = [clean_for_embedding(t) for t in texts]
+    keys = [embedding_key(t) for t in cleaned]
+    cached = get_cached_embeddings(supabase, keys)
+    
+    missing = list(dict.fromkeys(t for t, k in zip(cleaned, keys) if k not in cached))
+    if missing:
+        cached.update(zip((embedding_key(t) for t in missing), _embed_uncached(missing)))
+    return [cached[k] for k in keys]
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Embed source tweets")
-    parser.add_argument("--force", action="store_true", help="Re-embed all tweets")
-    parser.add_argument("--source-id", type=str, help="Only embed tweets from this source")
-    args = parser.parse_args()
-
-    tweets = get_tweets_to_embed(source_id=args.source_id, force=args.force)
+def embed_query(text: str) -> list[float]:
+    """Embed a search query / topic: in-process LRU → embedding_cache → OpenAI."""
+    memo_key = topic_embedding_cache.make_key(text, EMBEDDING_MODEL)
+    embedding = topic_embedding_cache.get(memo_key)
+    if embedding is not None:
+        return embedding
     
-    if not tweets:
-        logger.info("No tweets to embed.")
-        return
+    key = memo_key[1]
+    embedding = get_cached_embeddings(supabase, [key]).get(key)
+    if embedding is not None:
+        topic_embedding_cache.put(memo_key, embedding, persistent=True)
+        return embedding
     
-    logger.info(f"Embedding {len(tweets)} tweets...")
+    embedding = _embed_uncached([clean_for_embedding(text)])[0]
+    topic_embedding_cache.put(memo_key, embedding)
+    return embedding
+
+
+def save_embeddings(tweet_ids: list[str], embeddings: list[list[float]], hashes: list[str] = None) -> int:
+    """Save a batch of embeddings (+ content hashes) with a single bulk RPC (see services/embedding_store)."""
+    return save_source_tweet_embeddings(supabase, tweet_ids, embeddings, hashes)
+
+
+def refresh_embeddings(source_id: str = None, force: bool = False) -> dict:
+    """Embed only new / changed tweets. Returns {"total", "embedded", "cache_hits", "skipped", "errors"}."""
+    tweets, skipped = get_tweets_to_embed(source_id=source_id, force=force)
+    stats = {"total": len(tweets) + skipped, "embedded": 0, "cache_hits": 0, "skipped": skipped, "errors": 0}
     
-    total_embedded = 0
     for i in range(0, len(tweets), BATCH_SIZE):
         batch = tweets[i:i + BATCH_SIZE]
-        texts = [t['content'] for t in batch]
-        ids = [t['id'] for t in batch]
-        
-        # Skip empty texts
-        valid = [(tid, txt) for tid, txt in zip(ids, texts) if txt and txt.strip()]
-        if not valid:
-            continue
-        
-        valid_ids, valid_texts = zip(*valid)
-        
         try:
-            embeddings = embed_batch(list(valid_texts))
-            save_embeddings(list(valid_ids), embeddings)
-            total_embedded += len(valid_ids)
-            logger.info(f"  Batch {i // BATCH_SIZE + 1}: {len(valid_ids)} tweets embedded ({total_embedded}/{len(tweets)})")
+            # Cache'te olanlar DB içinde kopyalanır, kalanlar OpenAI'a gider
+            filled = fill_source_tweets_from_cache(supabase, batch)
+            misses = [t for t in batch if str(t['id']) not in filled]
+            saved = len(filled)
+            if misses:
+                embeddings = _embed_uncached([clean_for_embedding(t['content']) for t in misses])
+                saved += save_embeddings([t['id'] for t in misses], embeddings, [t['hash'] for t in misses])
+            stats["embedded"] += saved
+            stats["cache_hits"] += len(filled)
+            stats["errors"] += len(batch) - saved
+            logger.info(f"  Batch {i // BATCH_SIZE + 1}: {saved} tweets embedded, {len(filled)} from cache ({stats['embedded']}/{len(tweets)})")
         except Exception as e:
+            stats["errors"] += len(batch)
             logger.error(f"  Batch {i // BATCH_SIZE + 1} failed: {e}")
     
-    logger.info(f"Done! {total_embedded} tweets embedded.")
+    if source_id and stats["embedded"]:
+        source_vector_index.invalidate(source_id)
+    scope = f"source {source_id}" if source_id else "all sources"
+    logger.info(f"Embedding refresh for {scope}: {stats}")
+    return stats
 
 
-async def embed_tweets_for_source(source_id: str):
-    """Async helper to embed tweets for a specific source. Called after scraping."""
-    tweets = get_tweets_to_embed(source_id=source_id, force=True)
-    if not tweets:
-        return 0
-    
-    total = 0
-    for i in range(0, len(tweets), BATCH_SIZE):
-        batch = tweets[i:i + BATCH_SIZE]
-        valid = [(t['id'], t['content']) for t in batch if t.get('content', '').strip()]
-        if not valid:
-            continue
-        
-        ids, texts = zip(*valid)
-        try:
-            embeddings = embed_batch(list(texts))
-            save_embeddings(list(ids), embeddings)
-            total += len(ids)
-        except Exception as e:
-            logger.error(f"Embedding batch failed for source {source_id}: {e}")
-    
-    logger.info(f"Embedded {total} tweets for source {source_id}")
-    return total
+def main():
+    parser = argparse.ArgumentParser(description="Embed source tweets")
+    parser.add_argument("--force", action="store_true", help="Re-embed all tweets")
+    parser.add_argument("--source-id", type=str, help="Only embed tweets from this source")
+    args = parser.parse_args()
+
+    stats = refresh_embeddings(source_id=args.source_id, force=args.force)
+    logger.info(f"Done! {stats['embedded']} tweets embedded, {stats['skipped']} unchanged skipped.")
+
 
+async def embed_tweets_for_source(source_id: str) -> dict:
+    """Async helper to embed new / changed tweets of a source. Called after scraping."""
+    return await asyncio.to_thread(refresh_embeddings, source_id)
 
-def embed_tweets_for_source_sync(source_id: str) -> int:
+
+def embed_tweets_for_source_sync(source_id: str) -> dict:
     """Sync version for calling from non-async contexts."""
-    tweets = get_tweets_to_embed(source_id=source_id, force=True)
-    if not tweets:
-        return 0
-    
-    total = 0
-    for i in range(0, len(tweets), BATCH_SIZE):
-        batch = tweets[i:i + BATCH_SIZE]
-        valid = [(t['id'], t['content']) for t in batch if t.get('content', '').strip()]
-        if not valid:
-            continue
-        
-        ids, texts = zip(*valid)
-        try:
-            embeddings = embed_batch(list(texts))
-            save_embeddings(list(ids), embeddings)
-            total += len(ids)
-        except Exception as e:
-            logger.error(f"Embedding batch failed for source {source_id}: {e}")
-    
-    logger.info(f"Embedded {total} tweets for source {source_id}")
-    return total
+    return refresh_embeddings(source_id)
 
 
 def _compute_combined_score(similarity: float, likes: int, retweets: int) -> float:
@@ -209,7 +218,7 @@ def get_similar_tweets(query_text: str, source_ids: list[str], limit: int = 20,
     
     # Embed the query
     try:
-        query_embedding = embed_batch([query_text])[0]
+        query_embedding = embed_query(query_text)
     except Exception as e:
         logger.error(f"Failed to embed query: {e}")
         result = supabase.table("source_tweets").select("id, content, likes, retweets, source_id").or_(or_filter).order("likes", desc=True).limit(limit).execute()
@@ -218,16 +227,18 @@ def get_similar_tweets(query_text: str, source_ids: list[str], limit: int = 20,
     # Fetch top 50 candidates for diversity sampling
     fetch_count = max(limit * 3, 50)
     
-    # Call the pgvector similarity function
+    # Configured retrieval backend (local / quantized), otherwise / on failure the pgvector similarity function
     try:
-        result = supabase.rpc("match_source_tweets", {
-            "query_embedding": query_embedding,
-            "match_source_ids": source_ids,
-            "match_threshold": threshold,
-            "match_count": fetch_count
-        }).execute()
+        matches = search_source_tweets(supabase, source_ids, query_embedding, fetch_count, threshold)
+        if matches is None:
+            matches = supabase.rpc("match_source_tweets", {
+                "query_embedding": query_embedding,
+                "match_source_ids": source_ids,
+                "match_threshold": threshold,
+                "match_count": fetch_count
+            }).execute().data
         
-        candidates = [{"content": t["content"], "likes": t.get("likes", 0), "retweets": t.get("retweets", 0), "similarity": t.get("similarity", 0)} for t in (result.data or [])]
+        candidates = [{"content": t["content"], "likes": t.get("likes", 0), "retweets": t.get("retweets", 0), "similarity": t.get("similarity", 0)} for t in (matches or [])]
     except Exception as e:
         logger.error(f"Similarity search failed: {e}")
         result = supabase.table("source_tweets").select("id, content, likes, retweets, source_id").or_(or_filter).order("likes", desc=True).limit(fetch_count).execute()
@@ -9,16 +9,61 @@ Kullanım:
         # account_id: str | None
         # None = tek hesaplı kullanıcı veya henüz seçilmemiş
 
-Performans: Header'dan okur, her request'te DB'ye gitmez.
-Fallback: Header yoksa user_settings.active_account_id'den çeker (1 kez).
+Performans:
+  - Sonuç request.state'te tutulur; aynı request'te tekrar çözülmez.
+  - Ownership ve fallback (user_settings / primary) sonuçları ACCOUNT_CACHE_TTL
+    saniye process içinde cache'lenir. routes/accounts.py ve settings mutasyonları
+    invalidate_account_cache(user_id) ile kullanıcının kayıtlarını siler.
+    Diğer worker'lardaki cache en geç TTL sonunda tazelenir.
+Fallback: Header yoksa user_settings.active_account_id, o da yoksa primary hesap.
 """
+import os
+import time
 import logging
+from collections import OrderedDict
 from typing import Optional
 from fastapi import Header, Depends, Request
 from middleware.auth import require_auth
+from services.db import db_execute
 
 logger = logging.getLogger(__name__)
 
+ACCOUNT_CACHE_TTL = int(os.environ.get("ACCOUNT_CACHE_TTL", "60"))
+ACCOUNT_CACHE_SIZE = int(os.environ.get("ACCOUNT_CACHE_SIZE", "4096"))
+
+# (user_id, account_id) → (owned: bool, expires_at)
+_ownership_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+# user_id → (fallback account_id | None, expires_at)
+_fallback_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+_MISS = object()
+
+
+def _cache_get(cache: OrderedDict, key):
+    entry = cache.get(key)
+    if entry is None:
+        return _MISS
+    value, expires_at = entry
+    if time.monotonic() >= expires_at:
+        cache.pop(key, None)
+        return _MISS
+    cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache: OrderedDict, key, value):
+    cache[key] = (value, time.monotonic() + ACCOUNT_CACHE_TTL)
+    cache.move_to_end(key)
+    while len(cache) > ACCOUNT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def invalidate_account_cache(user_id: str):
+    """Kullanıcının hesap ekleme/silme/primary/aktif hesap değişikliklerinden sonra çağır."""
+    _fallback_cache.pop(user_id, None)
+    for key in [k for k in _ownership_cache if k[0] == user_id]:
+        _ownership_cache.pop(key, None)
+
 
 def _get_supabase():
     from server import supabase
@@ -39,53 +84,79 @@ async def get_active_account(
     3. Primary connected_account (son fallback)
     4. None (hesap yok)
     """
-    sb = _get_supabase()
+    memo = getattr(request.state, "active_account", None) if request else None
+    if memo is not None and memo[0] == (user.id, x_active_account_id):
+        return memo[1]
+
+    account_id = await _resolve_active_account(user.id, x_active_account_id)
+    if request:
+        request.state.active_account = ((user.id, x_active_account_id), account_id)
+    return account_id
 
+
+async def _resolve_active_account(user_id: str, x_active_account_id: Optional[str]) -> Optional[str]:
     # 1. Header'dan (+ IDOR koruması: bu hesap bu user'a ait mi? + deleted check)
     if x_active_account_id and x_active_account_id != "null":
-        ownership = sb.table("connected_accounts") \
-            .select("id") \
-            .eq("id", x_active_account_id) \
-            .eq("user_id", user.id) \
-            .is_("deleted_at", "null") \
-            .limit(1) \
-            .execute()
-        if ownership.data:
+        owned = _cache_get(_ownership_cache, (user_id, x_active_account_id))
+        if owned is _MISS:
+            ownership = await db_execute(_get_supabase().table("connected_accounts")
+                .select("id")
+                .eq("id", x_active_account_id)
+                .eq("user_id", user_id)
+                .is_("deleted_at", "null")
+                .limit(1))
+            owned = bool(ownership.data)
+            _cache_put(_ownership_cache, (user_id, x_active_account_id), owned)
+        if owned:
             return x_active_account_id
-        else:
-            # Stale localStorage veya IDOR: uyarı seviyesi yeter (deleted/başkasına ait)
-            logger.info(f"Active account miss (stale/deleted/IDOR): user {user.id}, account {x_active_account_id}")
-            # Fallback'e düş
+        # Stale localStorage veya IDOR: uyarı seviyesi yeter (deleted/başkasına ait)
+        logger.info(f"Active account miss (stale/deleted/IDOR): user {user_id}, account {x_active_account_id}")
+        # Fallback'e düş
+
+    fallback = _cache_get(_fallback_cache, user_id)
+    if fallback is not _MISS:
+        return fallback
+
+    fallback, cacheable = await _resolve_fallback_account(user_id)
+    if cacheable:
+        _cache_put(_fallback_cache, user_id, fallback)
+    return fallback
+
+
+async def _resolve_fallback_account(user_id: str) -> tuple:
+    """(account_id | None, cacheable). DB hatası olursa sonuç cache'lenmez."""
+    sb = _get_supabase()
+    cacheable = True
 
     # 2. user_settings'ten (fallback)
     try:
-        res = sb.table("user_settings") \
-            .select("active_account_id") \
-            .eq("user_id", user.id) \
-            .limit(1) \
-            .execute()
+        res = await db_execute(sb.table("user_settings")
+            .select("active_account_id")
+            .eq("user_id", user_id)
+            .limit(1))
 
         if res.data and res.data[0].get("active_account_id"):
-            return res.data[0]["active_account_id"]
+            return res.data[0]["active_account_id"], True
     except Exception as e:
+        cacheable = False
         logger.warning(f"Active account fallback error: {e}")
 
     # 3. Primary account (son fallback, deleted hariç)
     try:
-        res = sb.table("connected_accounts") \
-            .select("id") \
-            .eq("user_id", user.id) \
-            .eq("is_primary", True) \
-            .is_("deleted_at", "null") \
-            .limit(1) \
-            .execute()
+        res = await db_execute(sb.table("connected_accounts")
+            .select("id")
+            .eq("user_id", user_id)
+            .eq("is_primary", True)
+            .is_("deleted_at", "null")
+            .limit(1))
 
         if res.data:
-            return res.data[0]["id"]
+            return res.data[0]["id"], True
     except Exception as e:
+        cacheable = False
         logger.warning(f"Primary account fallback error: {e}")
 
-    return None
+    return None, cacheable
 
 
 async def get_active_account_or_none(
@@ -1,11 +1,22 @@
 """
 JWT Auth Middleware - Supabase token doğrulama, whitelist kontrolü, brute force koruması.
+
+Token'lar lokal doğrulanır (Supabase Auth'a round trip yok):
+  - HS256: SUPABASE_JWT_SECRET (Dashboard → Settings → API → JWT Secret)
+  - RS256/ES256: {SUPABASE_URL}/auth/v1/.well-known/jwks.json (key'ler cache'lenir)
+İkisi de mümkün değilse (secret yok / AUTH_VERIFY_MODE=remote) sb.auth.get_user'a düşer.
+Doğrulanan token → user, token hash'i ile LRU'da tutulur; kayıt token'ın exp'ine kadar geçerli.
 """
 import os
 import time
+import asyncio
+import hashlib
 import logging
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from dataclasses import dataclass, field
 from typing import Optional
+
+import jwt
 from fastapi import Header, HTTPException, Request
 
 logger = logging.getLogger(__name__)
@@ -27,6 +38,37 @@ _auth_bans: dict[str, float] = {}
 MAX_FAILED_ATTEMPTS = 5
 BAN_DURATION = 900  # 15 dakika
 
+# Lokal JWT doğrulama
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET", "")
+SUPABASE_JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+# auto: lokal doğrula, mümkün değilse get_user | remote: her zaman get_user
+AUTH_VERIFY_MODE = os.environ.get("AUTH_VERIFY_MODE", "auto").lower()
+JWKS_CACHE_TTL = int(os.environ.get("JWKS_CACHE_TTL", "600"))
+JWT_LEEWAY = int(os.environ.get("JWT_LEEWAY", "10"))
+
+# Doğrulanmış token cache'i: sha256(token) → (user, expires_at)
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "2048"))
+# get_user ile doğrulanan token'lar için üst sınır (revoke edilen session'lar geç kalmasın)
+AUTH_REMOTE_CACHE_TTL = int(os.environ.get("AUTH_REMOTE_CACHE_TTL", "300"))
+_token_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_jwks_client: Optional[jwt.PyJWKClient] = None
+auth_stats = {"cache_hits": 0, "local": 0, "remote": 0}
+
+_ASYMMETRIC_ALGS = ("RS256", "ES256", "EdDSA")
+
+
+@dataclass(frozen=True)
+class TokenUser:
+    """JWT claim'lerinden kurulan user. Route'lar sadece id/email kullanıyor."""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    aud: Optional[str] = None
+    phone: Optional[str] = None
+    is_anonymous: bool = False
+    app_metadata: dict = field(default_factory=dict)
+    user_metadata: dict = field(default_factory=dict)
+
 
 def _get_supabase():
     """server.py'deki supabase client'ı import et."""
@@ -34,6 +76,129 @@ def _get_supabase():
     return supabase
 
 
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str):
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if time.time() >= expires_at:
+        _token_cache.pop(key, None)
+        return None
+    _token_cache.move_to_end(key)
+    return user
+
+
+def _cache_put(key: str, user, expires_at: float):
+    _token_cache[key] = (user, expires_at)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > AUTH_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+
+def _get_jwks_client() -> Optional[jwt.PyJWKClient]:
+    global _jwks_client
+    if _jwks_client is None:
+        supabase_url = os.environ.get("SUPABASE_URL", "").rstrip("/")
+        if not supabase_url:
+            return None
+        _jwks_client = jwt.PyJWKClient(
+            f"{supabase_url}/auth/v1/.well-known/jwks.json",
+            cache_keys=True,
+            lifespan=JWKS_CACHE_TTL,
+        )
+    return _jwks_client
+
+
+def _user_from_claims(claims: dict) -> TokenUser:
+    return TokenUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        aud=claims.get("aud"),
+        phone=claims.get("phone"),
+        is_anonymous=bool(claims.get("is_anonymous", False)),
+        app_metadata=claims.get("app_metadata") or {},
+        user_metadata=claims.get("user_metadata") or {},
+    )
+
+
+def _decode(token: str, key, algorithms: list) -> dict:
+    return jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=SUPABASE_JWT_AUDIENCE,
+        leeway=JWT_LEEWAY,
+        options={"require": ["exp", "sub"]},
+    )
+
+
+def _verify_remote(token: str):
+    """Eski yol: Supabase Auth'a sor (blocking network çağrısı)."""
+    return _get_supabase().auth.get_user(token).user
+
+
+async def verify_token(token: str):
+    """
+    Token'ı doğrula ve user döndür. Geçersizse exception fırlatır.
+
+    Sıcak yol: LRU hit → sadece sha256 + dict lookup.
+    """
+    key = _token_key(token)
+    user = _cache_get(key)
+    if user is not None:
+        auth_stats["cache_hits"] += 1
+        return user
+
+    header = jwt.get_unverified_header(token)
+    alg = header.get("alg", "")
+    claims = None
+
+    if AUTH_VERIFY_MODE != "remote":
+        if alg == "HS256" and SUPABASE_JWT_SECRET:
+            claims = _decode(token, SUPABASE_JWT_SECRET, ["HS256"])
+        elif alg in _ASYMMETRIC_ALGS and _get_jwks_client():
+            # İlk çağrı / bilinmeyen kid JWKS'i HTTP ile çeker → loop'u bloklamasın
+            signing_key = await asyncio.to_thread(_jwks_client.get_signing_key_from_jwt, token)
+            claims = _decode(token, signing_key.key, [alg])
+
+    if claims is not None:
+        auth_stats["local"] += 1
+        user = _user_from_claims(claims)
+        _cache_put(key, user, float(claims["exp"]))
+        return user
+
+    auth_stats["remote"] += 1
+    user = await asyncio.to_thread(_verify_remote, token)
+    if not user:
+        raise ValueError("Token rejected by Supabase Auth")
+    # get_user doğruladı; exp'i imzayı kontrol etmeden okumak güvenli
+    exp = jwt.decode(token, options={"verify_signature": False}).get("exp") or 0
+    _cache_put(key, user, min(float(exp), time.time() + AUTH_REMOTE_CACHE_TTL))
+    return user
+
+
+async def resolve_request_user(request: Optional[Request], token: str):
+    """
+    Token'ı request başına bir kez doğrula.
+
+    rate_limit, require_auth ve optional_auth aynı request'te bu fonksiyonu çağırır;
+    ilk çağrının sonucu request.state'te tutulur, sonrakiler doğrudan döner.
+    """
+    if request is not None:
+        memo = getattr(request.state, "auth", None)
+        if memo is not None and memo[0] == token:
+            return memo[1]
+    user = await verify_token(token)
+    if request is not None:
+        request.state.auth = (token, user)
+    return user
+
+
 def _check_brute_force(client_ip: str):
     """Check if IP is banned from too many failed auth attempts."""
     now = time.time()
@@ -86,9 +251,7 @@ async def require_auth(authorization: Optional[str] = Header(None), request: Req
 
     token = authorization.replace("Bearer ", "")
     try:
-        sb = _get_supabase()
-        user_response = sb.auth.get_user(token)
-        user = user_response.user
+        user = await resolve_request_user(request, token)
     except Exception:
         _record_failed_attempt(client_ip)
         raise HTTPException(status_code=401, detail=GENERIC_AUTH_ERROR)
@@ -97,8 +260,7 @@ async def require_auth(authorization: Optional[str] = Header(None), request: Req
         _record_failed_attempt(client_ip)
         raise HTTPException(status_code=401, detail=GENERIC_AUTH_ERROR)
 
-    # Token expiry kontrolü (Supabase handles this via get_user, but double check)
-    # Supabase get_user() already validates token expiry, so this is covered.
+    # Token expiry: jwt.decode exp'i kontrol eder, cache kaydı da exp'te düşer.
 
     # Whitelist kontrolü - FAIL-CLOSED
     if ALLOWED_EMAILS is not None:
@@ -121,7 +283,7 @@ async def require_auth(authorization: Optional[str] = Header(None), request: Req
     return user
 
 
-async def optional_auth(authorization: Optional[str] = Header(None)):
+async def optional_auth(authorization: Optional[str] = Header(None), request: Request = None):
     """
     Opsiyonel auth dependency.
     Token varsa user döner, yoksa None döner. Hata fırlatmaz.
@@ -130,8 +292,6 @@ async def optional_auth(authorization: Optional[str] = Header(None)):
         return None
     token = authorization.replace("Bearer ", "")
     try:
-        sb = _get_supabase()
-        user_response = sb.auth.get_user(token)
-        return user_response.user
+        return await resolve_request_user(request, token)
     except Exception:
         return None
@@ -5,6 +5,8 @@ import logging
 import asyncio
 from datetime import datetime, timezone
 
+from services.db import db_execute
+
 logger = logging.getLogger(__name__)
 
 MAX_GENERATIONS_PER_USER = 1000
@@ -14,37 +16,36 @@ async def cleanup_old_generations(supabase):
     """Delete excess generations per user (keep latest MAX_GENERATIONS_PER_USER)."""
     try:
         # Get all user_ids with generation counts
-        result = supabase.rpc("get_users_with_excess_generations", {
+        result = await db_execute(supabase.rpc("get_users_with_excess_generations", {
             "max_count": MAX_GENERATIONS_PER_USER
-        }).execute()
+        }))
 
         # If RPC doesn't exist, do it manually
         if not result.data:
             # Fallback: get distinct user_ids
-            users_result = supabase.table("generations").select("user_id").execute()
+            users_result = await db_execute(supabase.table("generations").select("user_id"))
             user_ids = set(r["user_id"] for r in (users_result.data or []) if r.get("user_id"))
 
             for user_id in user_ids:
                 try:
                     # Count total
-                    count_result = supabase.table("generations").select("id", count="exact").eq("user_id", user_id).execute()
+                    count_result = await db_execute(supabase.table("generations").select("id", count="exact").eq("user_id", user_id))
                     total = count_result.count or 0
 
                     if total > MAX_GENERATIONS_PER_USER:
                         excess = total - MAX_GENERATIONS_PER_USER
                         # Get oldest IDs to delete
-                        old_result = supabase.table("generations") \
-                            .select("id") \
-                            .eq("user_id", user_id) \
-                            .order("created_at", desc=False) \
-                            .limit(excess) \
-                            .execute()
+                        old_result = await db_execute(supabase.table("generations")
+                            .select("id")
+                            .eq("user_id", user_id)
+                            .order("created_at", desc=False)
+                            .limit(excess))
 
                         ids_to_delete = [r["id"] for r in (old_result.data or [])]
                         if ids_to_delete:
                             for batch_start in range(0, len(ids_to_delete), 100):
                                 batch = ids_to_delete[batch_start:batch_start + 100]
-                                supabase.table("generations").delete().in_("id", batch).execute()
+                                await db_execute(supabase.table("generations").delete().in_("id", batch))
 
                             logger.info(f"Cleaned up {len(ids_to_delete)} old generations for user {user_id}")
                 except Exception as e:
@@ -63,11 +63,9 @@ async def rate_limit(request: Request):
     auth_header = request.headers.get("authorization", "")
     if auth_header.startswith("Bearer "):
         try:
-            from middleware.auth import _get_supabase
+            from middleware.auth import resolve_request_user
             token = auth_header.replace("Bearer ", "")
-            sb = _get_supabase()
-            user_response = sb.auth.get_user(token)
-            user = user_response.user
+            user = await resolve_request_user(request, token)
         except Exception:
             pass
 
@@ -0,0 +1,14 @@
+-- 009: generations tablosuna prompt caching telemetrisi
+-- Çalıştır: Supabase SQL Editor
+
+-- 1. Provider'ın cache'ten okuduğu prompt token sayısı (usage.prompt_tokens_details.cached_tokens)
+ALTER TABLE generations ADD COLUMN IF NOT EXISTS cached_tokens INTEGER DEFAULT 0;
+
+-- 2. Prompt builder versiyonu (v1, v3, v3_cached) — builder bazında cache hit oranı karşılaştırması için
+ALTER TABLE generations ADD COLUMN IF NOT EXISTS prompt_engine TEXT;
+
+-- 3. v1 route'ları da artık tokens_used yazıyor (v2 zaten yazıyordu)
+ALTER TABLE generations ADD COLUMN IF NOT EXISTS tokens_used INTEGER DEFAULT 0;
+
+-- 4. Index (builder bazında telemetri sorguları)
+CREATE INDEX IF NOT EXISTS idx_generations_prompt_engine ON generations(prompt_engine, created_at DESC);
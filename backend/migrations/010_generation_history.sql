@@ -0,0 +1,27 @@
+-- 010: Generation history — keyset pagination + hesap başına grouped count
+-- Çalıştır: Supabase SQL Editor
+
+-- 1. Keyset index: WHERE user_id/account_id + ORDER BY created_at DESC, id DESC
+--    (cursor sayfaları offset taramadan direkt index'ten okunur)
+CREATE INDEX IF NOT EXISTS idx_generations_history
+    ON generations(user_id, account_id, created_at DESC, id DESC);
+
+-- 2. scope=all sayaçları: hesap sayısından bağımsız tek sorgu
+CREATE OR REPLACE FUNCTION generation_counts_by_account(
+    p_user_id UUID,
+    p_account_ids UUID[],
+    p_type TEXT DEFAULT NULL
+) RETURNS TABLE (
+    account_id UUID,
+    total BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT g.account_id, COUNT(*)::BIGINT AS total
+    FROM generations g
+    WHERE g.user_id = p_user_id
+        AND g.account_id = ANY(p_account_ids)
+        AND (p_type IS NULL OR g.type = p_type)
+    GROUP BY g.account_id;
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -0,0 +1,6 @@
+-- 011: History sayfası favori lookup'ı — generation_id IN (sayfadaki id'ler)
+-- Çalıştır: Supabase SQL Editor
+
+CREATE INDEX IF NOT EXISTS idx_favorites_user_generation
+    ON favorites(user_id, generation_id)
+    WHERE deleted_at IS NULL AND generation_id IS NOT NULL;
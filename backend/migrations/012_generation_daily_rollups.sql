@@ -0,0 +1,185 @@
+-- 012: Günlük generation özetleri — calendar / streak / user stats
+-- Çalıştır: Supabase SQL Editor
+--
+-- generations'a her insert/delete (ve account_id/type/created_at update'i) trigger ile
+-- (user, account, gün) satırını artırır/azaltır. Endpoint'ler sadece bu tabloyu okur,
+-- variant gövdeleri hiç taşınmaz. Gün sınırı UTC (created_at'in ilk 10 karakteri ile aynı).
+
+-- 1. Tablo
+CREATE TABLE IF NOT EXISTS generation_daily_rollups (
+    user_id UUID NOT NULL,
+    account_id UUID,
+    day DATE NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    type_counts JSONB NOT NULL DEFAULT '{}'::jsonb,   -- {"tweet": 3, "reply": 1}
+    previews JSONB NOT NULL DEFAULT '[]'::jsonb,      -- en yeni 10 generation (id, type, topic, created_at, content[:150])
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT generation_daily_rollups_key UNIQUE NULLS NOT DISTINCT (user_id, account_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gen_rollups_user_account_day
+    ON generation_daily_rollups(user_id, account_id, day DESC);
+
+-- RLS (yazma sadece trigger üzerinden)
+ALTER TABLE generation_daily_rollups ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can read own rollups" ON generation_daily_rollups;
+CREATE POLICY "Users can read own rollups" ON generation_daily_rollups
+  FOR SELECT USING (auth.uid() = user_id);
+
+-- 2. Tek generation'ı ekle (+1) / çıkar (-1)
+-- SECURITY DEFINER değil ve EXECUTE revoke ediliyor: p_user_id dışarıdan geldiği için
+-- /rest/v1/rpc/generation_rollup_apply ile başka kullanıcının rollup'ı değiştirilebilirdi.
+-- Sadece trigger (aşağıda, definer) üzerinden çağrılır.
+CREATE OR REPLACE FUNCTION generation_rollup_apply(
+    p_user_id UUID,
+    p_account_id UUID,
+    p_created_at TIMESTAMPTZ,
+    p_type TEXT,
+    p_id UUID,
+    p_topic TEXT,
+    p_variants JSONB,
+    p_delta INT
+) RETURNS VOID AS $$
+DECLARE
+    v_day DATE := (p_created_at AT TIME ZONE 'UTC')::date;
+    v_type TEXT := COALESCE(p_type, 'tweet');
+    v_preview JSONB;
+BEGIN
+    IF p_user_id IS NULL OR p_created_at IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF p_delta > 0 THEN
+        v_preview := jsonb_build_object(
+            'id', p_id,
+            'type', v_type,
+            'topic', COALESCE(p_topic, ''),
+            'created_at', p_created_at,
+            'content', LEFT(COALESCE(
+                CASE jsonb_typeof(p_variants->0)
+                    WHEN 'object' THEN p_variants->0->>'content'
+                    WHEN 'string' THEN p_variants->>0
+                END, ''), 150)
+        );
+
+        INSERT INTO generation_daily_rollups AS r (user_id, account_id, day, total, type_counts, previews)
+        VALUES (p_user_id, p_account_id, v_day, 1, jsonb_build_object(v_type, 1), jsonb_build_array(v_preview))
+        ON CONFLICT ON CONSTRAINT generation_daily_rollups_key DO UPDATE SET
+            total = r.total + 1,
+            type_counts = jsonb_set(
+                r.type_counts, ARRAY[v_type],
+                to_jsonb(COALESCE((r.type_counts->>v_type)::int, 0) + 1)
+            ),
+            previews = (
+                SELECT COALESCE(jsonb_agg(p ORDER BY ord), '[]'::jsonb)
+                FROM jsonb_array_elements(jsonb_build_array(v_preview) || r.previews) WITH ORDINALITY AS e(p, ord)
+                WHERE ord <= 10
+            ),
+            updated_at = NOW();
+    ELSE
+        UPDATE generation_daily_rollups r SET
+            total = GREATEST(r.total - 1, 0),
+            type_counts = CASE
+                WHEN COALESCE((r.type_counts->>v_type)::int, 0) <= 1 THEN r.type_counts - v_type
+                ELSE jsonb_set(r.type_counts, ARRAY[v_type], to_jsonb((r.type_counts->>v_type)::int - 1))
+            END,
+            previews = (
+                SELECT COALESCE(jsonb_agg(p ORDER BY ord), '[]'::jsonb)
+                FROM jsonb_array_elements(r.previews) WITH ORDINALITY AS e(p, ord)
+                WHERE p->>'id' IS DISTINCT FROM p_id::text
+            ),
+            updated_at = NOW()
+        WHERE r.user_id = p_user_id
+            AND r.account_id IS NOT DISTINCT FROM p_account_id
+            AND r.day = v_day;
+
+        DELETE FROM generation_daily_rollups r
+        WHERE r.user_id = p_user_id
+            AND r.account_id IS NOT DISTINCT FROM p_account_id
+            AND r.day = v_day
+            AND r.total <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION generation_rollup_apply(UUID, UUID, TIMESTAMPTZ, TEXT, UUID, TEXT, JSONB, INT)
+    FROM PUBLIC, anon, authenticated;
+
+-- 3. Trigger (trigger fonksiyonları RPC ile çağrılamaz; definer → generations'a kim yazarsa yazsın
+-- rollup tablosuna yazabilir)
+CREATE OR REPLACE FUNCTION generation_rollup_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM generation_rollup_apply(OLD.user_id, OLD.account_id, OLD.created_at, OLD.type,
+                                        OLD.id, OLD.topic, OLD.variants, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM generation_rollup_apply(NEW.user_id, NEW.account_id, NEW.created_at, NEW.type,
+                                        NEW.id, NEW.topic, NEW.variants, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS trg_generation_rollup ON generations;
+CREATE TRIGGER trg_generation_rollup
+    AFTER INSERT OR DELETE ON generations
+    FOR EACH ROW EXECUTE FUNCTION generation_rollup_trigger();
+
+-- UPDATE: sadece ilgili kolonlar gerçekten değiştiyse (kolonu aynı değerle yazan update'ler
+-- -1/+1 yapıp o günün preview sırasını bozmasın)
+DROP TRIGGER IF EXISTS trg_generation_rollup_update ON generations;
+CREATE TRIGGER trg_generation_rollup_update
+    AFTER UPDATE OF user_id, account_id, created_at, type ON generations
+    FOR EACH ROW
+    WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id
+          OR OLD.account_id IS DISTINCT FROM NEW.account_id
+          OR OLD.created_at IS DISTINCT FROM NEW.created_at
+          OR OLD.type IS DISTINCT FROM NEW.type)
+    EXECUTE FUNCTION generation_rollup_trigger();
+
+-- 4. Backfill (mevcut generations)
+INSERT INTO generation_daily_rollups (user_id, account_id, day, total, type_counts, previews)
+SELECT
+    d.user_id, d.account_id, d.day, d.total, t.type_counts, p.previews
+FROM (
+    SELECT user_id, account_id, (created_at AT TIME ZONE 'UTC')::date AS day, COUNT(*)::int AS total
+    FROM generations
+    WHERE user_id IS NOT NULL AND created_at IS NOT NULL
+    GROUP BY 1, 2, 3
+) d
+CROSS JOIN LATERAL (
+    SELECT jsonb_object_agg(tc.type, tc.cnt) AS type_counts
+    FROM (
+        SELECT COALESCE(g.type, 'tweet') AS type, COUNT(*)::int AS cnt
+        FROM generations g
+        WHERE g.user_id = d.user_id
+            AND g.account_id IS NOT DISTINCT FROM d.account_id
+            AND (g.created_at AT TIME ZONE 'UTC')::date = d.day
+        GROUP BY 1
+    ) tc
+) t
+CROSS JOIN LATERAL (
+    SELECT COALESCE(jsonb_agg(pv.preview ORDER BY pv.created_at DESC), '[]'::jsonb) AS previews
+    FROM (
+        SELECT g.created_at, jsonb_build_object(
+            'id', g.id,
+            'type', COALESCE(g.type, 'tweet'),
+            'topic', COALESCE(g.topic, ''),
+            'created_at', g.created_at,
+            'content', LEFT(COALESCE(
+                CASE jsonb_typeof(g.variants->0)
+                    WHEN 'object' THEN g.variants->0->>'content'
+                    WHEN 'string' THEN g.variants->>0
+                END, ''), 150)
+        ) AS preview
+        FROM generations g
+        WHERE g.user_id = d.user_id
+            AND g.account_id IS NOT DISTINCT FROM d.account_id
+            AND (g.created_at AT TIME ZONE 'UTC')::date = d.day
+        ORDER BY g.created_at DESC
+        LIMIT 10
+    ) pv
+) p
+ON CONFLICT ON CONSTRAINT generation_daily_rollups_key DO NOTHING;
@@ -0,0 +1,22 @@
+-- 013: source_tweets embedding'lerini toplu yaz (batch başına tek RPC)
+-- Çalıştır: Supabase SQL Editor
+--
+-- p_embeddings: pgvector text literal'leri ('[0.0123457,-0.0456789,...]'), p_ids ile aynı sırada.
+-- Returns: güncellenen satır sayısı.
+
+CREATE OR REPLACE FUNCTION bulk_set_source_tweet_embeddings(
+    p_ids UUID[],
+    p_embeddings TEXT[]
+) RETURNS INT AS $$
+DECLARE
+    v_updated INT;
+BEGIN
+    UPDATE source_tweets st
+    SET embedding = u.embedding::vector(1536)
+    FROM unnest(p_ids, p_embeddings) AS u(id, embedding)
+    WHERE st.id = u.id;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,52 @@
+-- 014: source_tweets incremental embedding refresh
+-- Çalıştır: Supabase SQL Editor
+--
+-- content_hash: embedding'in üretildiği içeriğin normalize sha256'sı
+-- (services/embedding_store.content_hash ile aynı normalizasyon). Refresh sadece
+-- hash'i içerikle uyuşmayan satırları tekrar embed eder.
+
+-- 1. Kolon
+ALTER TABLE source_tweets ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- 2. Refresh artık delete+insert değil, (source_id, tweet_id) üzerinden upsert
+--    Önce duplicate'leri temizle (en son eklenen kalır), sonra unique index
+DELETE FROM source_tweets a
+USING source_tweets b
+WHERE a.source_id = b.source_id
+    AND a.tweet_id = b.tweet_id
+    AND a.ctid < b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_source_tweets_source_tweet
+    ON source_tweets(source_id, tweet_id);
+
+-- 3. Toplu yazma RPC'si artık hash'i de yazıyor (013'teki 2 argümanlı versiyonun yerine)
+DROP FUNCTION IF EXISTS bulk_set_source_tweet_embeddings(UUID[], TEXT[]);
+
+CREATE OR REPLACE FUNCTION bulk_set_source_tweet_embeddings(
+    p_ids UUID[],
+    p_embeddings TEXT[],
+    p_hashes TEXT[] DEFAULT NULL
+) RETURNS INT AS $$
+DECLARE
+    v_updated INT;
+BEGIN
+    UPDATE source_tweets st
+    SET embedding = u.embedding::vector(1536),
+        content_hash = u.content_hash
+    FROM unnest(p_ids, p_embeddings, COALESCE(p_hashes, array_fill(NULL::TEXT, ARRAY[cardinality(p_ids)])))
+        AS u(id, embedding, content_hash)
+    WHERE st.id = u.id;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 4. Backfill: zaten embedding'i olan satırlar tekrar embed edilmesin
+UPDATE source_tweets
+SET content_hash = encode(sha256(convert_to(
+        btrim(regexp_replace(content, '[ \t\n\r\f\v]+', ' ', 'g'), ' '),
+        'UTF8')), 'hex')
+WHERE embedding IS NOT NULL
+    AND content_hash IS NULL
+    AND content IS NOT NULL;
@@ -0,0 +1,37 @@
+-- 015: Global embedding cache — (model, temizlenmiş metnin sha256'sı) → vektör
+-- Çalıştır: Supabase SQL Editor
+--
+-- Aynı viral tweet N kullanıcının source'unda N kez bulunabiliyor; vektör sadece
+-- metne bağlı olduğu için bir kez üretilip burada saklanır. Anahtar backend'deki
+-- services/embedding_store.embedding_key ile üretilir (clean_for_embedding → sha256),
+-- yani API'ye gönderilen metnin birebir aynısı. Model değişirse anahtar da değişir.
+
+-- 1. Tablo
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    embedding vector(1536) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (model, text_hash)
+);
+
+-- RLS (policy yok → sadece service key erişir)
+ALTER TABLE embedding_cache ENABLE ROW LEVEL SECURITY;
+
+-- 2. Cache'te olan vektörleri source_tweets'e DB içinde kopyala (vektör ağdan taşınmaz)
+-- p_keys: embedding_cache anahtarları, p_hashes: source_tweets.content_hash (migration 014)
+-- Returns: güncellenen source_tweets id'leri (cache miss olanlar dönmez → API ile embed edilir)
+CREATE OR REPLACE FUNCTION fill_source_tweets_from_cache(
+    p_model TEXT,
+    p_ids UUID[],
+    p_keys TEXT[],
+    p_hashes TEXT[]
+) RETURNS SETOF UUID AS $$
+    UPDATE source_tweets st
+    SET embedding = ec.embedding,
+        content_hash = u.content_hash
+    FROM unnest(p_ids, p_keys, p_hashes) AS u(id, text_hash, content_hash)
+    JOIN embedding_cache ec ON ec.model = p_model AND ec.text_hash = u.text_hash
+    WHERE st.id = u.id
+    RETURNING st.id;
+$$ LANGUAGE sql;
@@ -0,0 +1,24 @@
+-- 016: Source başına embedding fingerprint'i — in-process vektör index'i için tazelik kontrolü
+-- Çalıştır: Supabase SQL Editor
+--
+-- services/vector_index her source'un embedding matrisini bellekte (veya VECTOR_INDEX_DIR'de) tutar.
+-- Index'in hâlâ güncel olup olmadığını anlamak için vektörleri tekrar çekmek yerine bu
+-- fonksiyon çağrılır: embed edilmiş satırların (id, content_hash, engagement alanları)
+-- üzerinden tek bir md5 döner. Değişmediyse index olduğu gibi kullanılır.
+-- Ön koşul: 014 (content_hash) + 007 (engagement_score, algo_score, tweet_type, word_count).
+
+CREATE OR REPLACE FUNCTION source_embedding_fingerprints(p_source_ids UUID[])
+RETURNS TABLE (source_id UUID, row_count BIGINT, fingerprint TEXT) AS $$
+    SELECT
+        st.source_id,
+        COUNT(*),
+        md5(string_agg(
+            md5(ROW(st.id, st.content_hash, st.likes, st.retweets, st.replies,
+                    st.engagement_score, st.algo_score, st.tweet_type, st.word_count)::text),
+            '' ORDER BY st.id
+        ))
+    FROM source_tweets st
+    WHERE st.source_id = ANY(p_source_ids)
+        AND st.embedding IS NOT NULL
+    GROUP BY st.source_id;
+$$ LANGUAGE sql STABLE;
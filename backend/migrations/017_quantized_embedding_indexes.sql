@@ -0,0 +1,110 @@
+-- 017: Quantized embedding index'leri (halfvec / kısaltılmış halfvec / binary) + full precision rescoring
+-- Çalıştır: Supabase SQL Editor (pgvector >= 0.8: halfvec, subvector, binary_quantize, hnsw.iterative_scan)
+--
+-- source_tweets.embedding vector(1536) float32 olarak kalır: rescoring tam hassasiyet ister ve
+-- diğer RPC'ler (002, 007) vector tipini bekler. Küçülen taraf HNSW index'i; index quantize
+-- edilmiş ifade üzerine kurulur:
+--   halfvec    : embedding::halfvec(1536)                    2 byte/boyut   (3 KB/satır, float32'nin yarısı)
+--   halfvec512 : subvector(embedding, 1, 512)::halfvec(512)  ilk 512 boyut  (1 KB; text-embedding-3 Matryoshka)
+--   binary     : binary_quantize(embedding)::bit(1536)       1 bit/boyut    (192 B, hamming)
+-- match_source_tweets_quantized: quantized sıralamadan p_candidates aday → float32 cosine ile yeniden
+-- sırala (rescoring). Backend seçimi: RAG_RETRIEVAL_BACKEND=halfvec|halfvec512|binary (services/vector_index).
+-- Benchmark: scripts/bench_embedding_quantization.py
+--
+-- Her HNSW index'i tüm source_tweets üzerinde ayrı bir graph'tır (build süresi + RAM + her insert'te
+-- bakım), bu yüzden sadece seçilen modun index'i kurulur. Fonksiyon (2) koşulsuz oluşturulur;
+-- index'i olmayan mod da çalışır ama source'un tüm satırlarını tarayıp sıralar (exact, yavaş).
+-- Seçilen mod doğrulanınca float32 index'i kaldırılabilir:
+--   DROP INDEX IF EXISTS idx_source_tweets_embedding;   -- 002
+
+-- 1. Index — RAG_RETRIEVAL_BACKEND'e karşılık gelen bloğun yorumunu kaldırıp çalıştırın (sadece biri).
+-- Her blok diğer iki modun index'ini de kaldırır (mod değiştirirken aynı blok tekrar çalıştırılabilir).
+
+-- RAG_RETRIEVAL_BACKEND=halfvec
+-- CREATE INDEX IF NOT EXISTS idx_source_tweets_embedding_half
+--     ON source_tweets USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops)
+--     WITH (m = 16, ef_construction = 64);
+-- DROP INDEX IF EXISTS idx_source_tweets_embedding_half512;
+-- DROP INDEX IF EXISTS idx_source_tweets_embedding_bit;
+
+-- RAG_RETRIEVAL_BACKEND=halfvec512
+-- CREATE INDEX IF NOT EXISTS idx_source_tweets_embedding_half512
+--     ON source_tweets USING hnsw ((subvector(embedding, 1, 512)::halfvec(512)) halfvec_cosine_ops)
+--     WITH (m = 16, ef_construction = 64);
+-- DROP INDEX IF EXISTS idx_source_tweets_embedding_half;
+-- DROP INDEX IF EXISTS idx_source_tweets_embedding_bit;
+
+-- RAG_RETRIEVAL_BACKEND=binary
+-- CREATE INDEX IF NOT EXISTS idx_source_tweets_embedding_bit
+--     ON source_tweets USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+--     WITH (m = 16, ef_construction = 64);
+-- DROP INDEX IF EXISTS idx_source_tweets_embedding_half;
+-- DROP INDEX IF EXISTS idx_source_tweets_embedding_half512;
+
+-- 2. Quantized aday seçimi + float32 rescoring
+-- ORDER BY ifadeleri index ifadeleriyle birebir aynı olmalı (yoksa planner index'i kullanmaz).
+CREATE OR REPLACE FUNCTION match_source_tweets_quantized(
+    query_embedding vector(1536),
+    source_ids UUID[],
+    match_count INT DEFAULT 20,
+    match_threshold FLOAT DEFAULT NULL,
+    p_mode TEXT DEFAULT 'halfvec',
+    p_candidates INT DEFAULT 100
+) RETURNS TABLE (
+    id UUID,
+    source_id UUID,
+    content TEXT,
+    likes INT,
+    retweets INT,
+    replies INT,
+    engagement_score FLOAT,
+    algo_score FLOAT,
+    tweet_type TEXT,
+    word_count INT,
+    similarity FLOAT
+) AS $$
+DECLARE
+    v_limit INT := GREATEST(p_candidates, match_count);
+    v_candidates UUID[];
+BEGIN
+    -- HNSW varsayılan ef_search=40 aday döner; source filtresi sonrası eksik kalmasın
+    PERFORM set_config('hnsw.ef_search', GREATEST(v_limit, 40)::text, true);
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+
+    IF p_mode = 'halfvec' THEN
+        SELECT array_agg(c.id) INTO v_candidates FROM (
+            SELECT st.id FROM source_tweets st
+            WHERE st.source_id = ANY(source_ids) AND st.embedding IS NOT NULL
+            ORDER BY st.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)
+            LIMIT v_limit
+        ) c;
+    ELSIF p_mode = 'halfvec512' THEN
+        SELECT array_agg(c.id) INTO v_candidates FROM (
+            SELECT st.id FROM source_tweets st
+            WHERE st.source_id = ANY(source_ids) AND st.embedding IS NOT NULL
+            ORDER BY subvector(st.embedding, 1, 512)::halfvec(512) <=> subvector(query_embedding, 1, 512)::halfvec(512)
+            LIMIT v_limit
+        ) c;
+    ELSIF p_mode = 'binary' THEN
+        SELECT array_agg(c.id) INTO v_candidates FROM (
+            SELECT st.id FROM source_tweets st
+            WHERE st.source_id = ANY(source_ids) AND st.embedding IS NOT NULL
+            ORDER BY binary_quantize(st.embedding)::bit(1536) <~> binary_quantize(query_embedding)::bit(1536)
+            LIMIT v_limit
+        ) c;
+    ELSE
+        RAISE EXCEPTION 'match_source_tweets_quantized: unknown mode %', p_mode;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        st.id, st.source_id, st.content, st.likes, st.retweets, st.replies,
+        st.engagement_score, st.algo_score, st.tweet_type, st.word_count,
+        1 - (st.embedding <=> query_embedding) AS similarity
+    FROM source_tweets st
+    WHERE st.id = ANY(v_candidates)
+        AND (match_threshold IS NULL OR 1 - (st.embedding <=> query_embedding) > match_threshold)
+    ORDER BY st.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql;  -- STABLE değil: set_config (transaction-local) çağırıyor
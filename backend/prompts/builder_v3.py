@@ -465,6 +465,12 @@ def _build_son_kontrol() -> str:
 5. **Karakter limiti:** Verilen aralıkta mı? Değilse düzelt."""
 
 
+# Cached layout'ta tam liste en başta; model son okuduğuna daha çok uyduğu için sonda kısa hatırlatma
+_SON_KONTROL_REMINDER = """## SON KONTROL
+
+Göndermeden önce en baştaki SON KONTROL listesini uygula: yasaklı kelime/emoji yok, AI hissi yok, ilk cümle sıradan değil, dolgu cümle yok, karakter limiti içinde."""
+
+
 # ─────────────────────────────────────────────
 # APEX SECTION (optional, appended when active)
 # ─────────────────────────────────────────────
@@ -568,4 +574,86 @@ def build_final_prompt_v3(
     return "\n\n---\n\n".join(sections)
 
 
-__all__ = ["build_final_prompt_v3", "FEW_SHOT_EXAMPLES"]
+def build_final_prompt_v3_cached(
+    content_type: str,
+    topic: str = None,
+    persona: str = "otorite",
+    tone: str = "natural",
+    knowledge: str = None,
+    length: str = "punch",
+    language: str = "auto",
+    original_tweet: str = None,
+    reply_mode: str = None,
+    article_style: str = None,
+    references: list = None,
+    additional_context: str = None,
+    is_apex: bool = False,
+    style_prompt: str = None,
+    example_tweets: list = None,
+    platform: str = "twitter",
+    direction: str = None,
+    direction_custom: str = None,
+    brand_voice: dict = None,
+    **kwargs,
+) -> str:
+    """
+    Build prompt v3 (cache-friendly layout): v3 ile aynı bölümler, farklı sıra.
+
+    Provider prefix caching (OpenAI vb.) sadece prompt'un başı byte-identical
+    ise çalışır. v3'te GÖREV (topic, context, referanslar) en başta olduğu için
+    her istek farklı bir prefix'le başlar. Burada önce aynı kullanıcı + ayarlar
+    için değişmeyen bölümler gelir (cache'lenen prefix), sonra isteğe göre
+    değişenler:
+      1. SON KONTROL — tamamen statik (tam liste)
+      2. KURALLAR — content_type / length / language / knowledge
+      3. SES — persona / tone / style / brand voice
+      ── prefix burada biter ──
+      4. ÖRNEKLER — few-shot examples (if any); topic'e göre RAG'den gelir, prefix'e dahil değil
+      5. APEX (optional)
+      6. GÖREV — topic, original tweet, context, references
+      7. SON KONTROL hatırlatması — kısa, statik
+    """
+    sections = [
+        _build_son_kontrol(),
+        _build_kurallar(
+            content_type=content_type,
+            length=length,
+            language=language,
+            knowledge=knowledge,
+            platform=platform,
+        ),
+        _build_ses(
+            persona=persona,
+            tone=tone,
+            style_prompt=style_prompt,
+            platform=platform,
+            content_type=content_type,
+            brand_voice=brand_voice,
+        ),
+    ]
+
+    ornekler = _build_ornekler(example_tweets)
+    if ornekler:
+        sections.append(ornekler)
+
+    if is_apex:
+        sections.append(_APEX_V3)
+
+    sections.append(_build_gorev(
+        content_type=content_type,
+        topic=topic,
+        original_tweet=original_tweet,
+        reply_mode=reply_mode,
+        article_style=article_style,
+        references=references,
+        additional_context=additional_context,
+        direction=direction,
+        direction_custom=direction_custom,
+    ))
+
+    sections.append(_SON_KONTROL_REMINDER)
+
+    return "\n\n---\n\n".join(sections)
+
+
+__all__ = ["build_final_prompt_v3", "build_final_prompt_v3_cached", "FEW_SHOT_EXAMPLES"]
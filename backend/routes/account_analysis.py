@@ -9,6 +9,8 @@ from typing import Optional, List
 from datetime import datetime, timezone
 import uuid
 import logging
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/analyze", tags=["analysis"])
@@ -117,7 +119,7 @@ async def analyze_account(request: AccountAnalysisRequest, user=Depends(require_
 
         lang = "Türkçe" if request.language != "en" else "English"
 
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"""Sen uzman bir sosyal medya analistisin. Twitter hesabını 5 boyutta derinlemesine analiz et.
@@ -261,13 +263,13 @@ Son {len(tweets)} tweet (engagement + format flag'leri):
 
         try:
             # Aynı kullanıcı + aynı hesap varsa güncelle (upsert)
-            existing = sb.table("account_analyses").select("id").eq("user_id", user.id).eq("twitter_username", username).limit(1).execute()
+            existing = await db_execute(sb.table("account_analyses").select("id").eq("user_id", user.id).eq("twitter_username", username).limit(1))
             if existing.data:
-                sb.table("account_analyses").update(record).eq("id", existing.data[0]["id"]).execute()
+                await db_execute(sb.table("account_analyses").update(record).eq("id", existing.data[0]["id"]))
             else:
                 record["id"] = str(uuid.uuid4())
                 record["created_at"] = now
-                sb.table("account_analyses").insert(record).execute()
+                await db_execute(sb.table("account_analyses").insert(record))
         except Exception as db_err:
             logger.warning(f"DB upsert failed: {db_err}")
 
@@ -296,12 +298,11 @@ async def get_analysis_history(limit: int = Query(20, le=100), offset: int = Que
     try:
         sb = get_supabase()
         result = (
-            sb.table("account_analyses")
+            await db_execute(sb.table("account_analyses")
             .select("id, twitter_username, display_name, avatar_url, overall_score, tweet_count, followers_count, bio, created_at, updated_at")
             .eq("user_id", user.id)
             .order("updated_at", desc=True)
-            .range(offset, offset + limit - 1)
-            .execute()
+            .range(offset, offset + limit - 1))
         )
         return {"analyses": result.data or [], "has_more": len(result.data or []) >= limit}
     except Exception as e:
@@ -314,7 +315,7 @@ async def get_analysis_detail(analysis_id: str, user=Depends(require_auth)):
     """Tek analiz detayı (tam veri)"""
     try:
         sb = get_supabase()
-        result = sb.table("account_analyses").select("*").eq("id", analysis_id).eq("user_id", user.id).limit(1).execute()
+        result = await db_execute(sb.table("account_analyses").select("*").eq("id", analysis_id).eq("user_id", user.id).limit(1))
         if not result.data:
             raise HTTPException(status_code=404, detail="Analiz bulunamadı")
         return result.data[0]
@@ -330,7 +331,7 @@ async def delete_analysis(analysis_id: str, user=Depends(require_auth)):
     """Analiz geçmişinden sil"""
     try:
         sb = get_supabase()
-        sb.table("account_analyses").delete().eq("id", analysis_id).eq("user_id", user.id).execute()
+        await db_execute(sb.table("account_analyses").delete().eq("id", analysis_id).eq("user_id", user.id))
         return {"success": True}
     except Exception as e:
         logger.error(f"Analysis delete error: {e}")
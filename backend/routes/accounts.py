@@ -11,10 +11,12 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 from middleware.auth import require_auth
+from middleware.active_account import invalidate_account_cache
 from datetime import datetime, timezone
 import uuid
 import logging
 import httpx
+from services.db import db_execute
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 logger = logging.getLogger(__name__)
@@ -36,12 +38,11 @@ class AccountUpdate(BaseModel):
 
 async def _merge_ghost_account(user_id: str, new_account_id: str, sb):
     """Default (ghost) hesaptaki tüm veriyi yeni gerçek hesaba aktar ve default'u sil."""
-    default_res = sb.table("connected_accounts") \
-        .select("id") \
-        .eq("user_id", user_id) \
-        .eq("platform", "default") \
-        .limit(1) \
-        .execute()
+    default_res = await db_execute(sb.table("connected_accounts")
+        .select("id")
+        .eq("user_id", user_id)
+        .eq("platform", "default")
+        .limit(1))
 
     if not default_res.data:
         return  # Ghost account yok
@@ -52,16 +53,15 @@ async def _merge_ghost_account(user_id: str, new_account_id: str, sb):
 
     for table in tables:
         try:
-            sb.table(table) \
-                .update({"account_id": new_account_id}) \
-                .eq("account_id", old_id) \
-                .execute()
+            await db_execute(sb.table(table)
+                .update({"account_id": new_account_id})
+                .eq("account_id", old_id))
         except Exception as e:
             logger.warning(f"Ghost merge {table} error: {e}")
 
     # Default hesabı sil
     try:
-        sb.table("connected_accounts").delete().eq("id", old_id).execute()
+        await db_execute(sb.table("connected_accounts").delete().eq("id", old_id))
         logger.info(f"Ghost merge completed: {old_id} → {new_account_id} for user {user_id}")
     except Exception as e:
         logger.error(f"Ghost account delete error: {e}")
@@ -76,11 +76,10 @@ async def _run_null_migration(user_id: str, primary_account_id: str, sb):
 
     for table in tables:
         try:
-            sb.table(table) \
-                .update({"account_id": primary_account_id}) \
-                .eq("user_id", user_id) \
-                .is_("account_id", "null") \
-                .execute()
+            await db_execute(sb.table(table)
+                .update({"account_id": primary_account_id})
+                .eq("user_id", user_id)
+                .is_("account_id", "null"))
         except Exception as e:
             logger.warning(f"Null migration {table} error: {e}")
 
@@ -97,12 +96,11 @@ async def mark_account_broken(user_id: str, platform: str, reason: str, sb=None)
         sb = get_supabase()
     now = datetime.now(timezone.utc).isoformat()
     try:
-        sb.table("connected_accounts") \
-            .update({"status": "broken", "broken_reason": reason, "broken_at": now}) \
-            .eq("user_id", user_id) \
-            .eq("platform", platform) \
-            .eq("status", "active") \
-            .execute()
+        await db_execute(sb.table("connected_accounts")
+            .update({"status": "broken", "broken_reason": reason, "broken_at": now})
+            .eq("user_id", user_id)
+            .eq("platform", platform)
+            .eq("status", "active"))
         logger.warning(f"Account marked broken: user={user_id}, platform={platform}, reason={reason}")
     except Exception as e:
         logger.error(f"Failed to mark account broken: {e}")
@@ -113,12 +111,11 @@ async def mark_account_healed(user_id: str, platform: str, sb=None):
     if sb is None:
         sb = get_supabase()
     try:
-        sb.table("connected_accounts") \
-            .update({"status": "active", "broken_reason": None, "broken_at": None}) \
-            .eq("user_id", user_id) \
-            .eq("platform", platform) \
-            .eq("status", "broken") \
-            .execute()
+        await db_execute(sb.table("connected_accounts")
+            .update({"status": "active", "broken_reason": None, "broken_at": None})
+            .eq("user_id", user_id)
+            .eq("platform", platform)
+            .eq("status", "broken"))
     except Exception as e:
         logger.error(f"Failed to heal account: {e}")
 
@@ -130,13 +127,12 @@ async def mark_account_healed(user_id: str, platform: str, sb=None):
 @router.get("")
 async def get_accounts(user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Tüm bağlı hesapları listele (soft-deleted hariç, status dahil)."""
-    result = supabase.table("connected_accounts") \
-        .select("*") \
-        .eq("user_id", user.id) \
-        .neq("platform", "default") \
-        .is_("deleted_at", "null") \
-        .order("created_at") \
-        .execute()
+    result = await db_execute(supabase.table("connected_accounts")
+        .select("*")
+        .eq("user_id", user.id)
+        .neq("platform", "default")
+        .is_("deleted_at", "null")
+        .order("created_at"))
     return result.data or []
 
 
@@ -164,21 +160,19 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
             logger.warning(f"Provider ID fetch failed for @{username}: {e}")
 
     # ── 1. Username bazlı eşleşme (aktif hesap güncelleme) ──
-    existing = supabase.table("connected_accounts") \
-        .select("id, deleted_at, status, provider_id") \
-        .eq("user_id", user.id) \
-        .eq("platform", platform) \
-        .eq("username", username) \
-        .execute()
+    existing = await db_execute(supabase.table("connected_accounts")
+        .select("id, deleted_at, status, provider_id")
+        .eq("user_id", user.id)
+        .eq("platform", platform)
+        .eq("username", username))
 
     # ── 2. Provider ID bazlı eşleşme (username değişmiş olabilir) ──
     if not existing.data and provider_id:
-        existing = supabase.table("connected_accounts") \
-            .select("id, deleted_at, status, provider_id, username") \
-            .eq("user_id", user.id) \
-            .eq("platform", platform) \
-            .eq("provider_id", provider_id) \
-            .execute()
+        existing = await db_execute(supabase.table("connected_accounts")
+            .select("id, deleted_at, status, provider_id, username")
+            .eq("user_id", user.id)
+            .eq("platform", platform)
+            .eq("provider_id", provider_id))
         if existing.data:
             old_username = existing.data[0].get("username", "?")
             logger.info(f"Provider ID match: @{old_username} → @{username} (provider_id={provider_id})")
@@ -189,7 +183,7 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
         # ── Diriliş: soft-deleted hesap geri bağlanıyor ──
         if record.get("deleted_at"):
             restored_id = record["id"]
-            supabase.table("connected_accounts") \
+            await db_execute(supabase.table("connected_accounts")
                 .update({
                     "username": username,
                     "label": body.label,
@@ -199,9 +193,9 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
                     "broken_at": None,
                     "provider_id": provider_id or record.get("provider_id"),
                     "updated_at": now,
-                }) \
-                .eq("id", restored_id) \
-                .execute()
+                })
+                .eq("id", restored_id))
+            invalidate_account_cache(user.id)
             logger.info(f"Account restored: {platform}/{username} (id={restored_id}) for user {user.id}")
             return {"success": True, "id": restored_id, "restored": True}
 
@@ -212,29 +206,26 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
             update_data["provider_id"] = provider_id  # Retroaktif provider_id doldur
         if body.label is not None:
             update_data["label"] = body.label
-        result = supabase.table("connected_accounts") \
-            .update(update_data) \
-            .eq("id", record["id"]) \
-            .execute()
+        result = await db_execute(supabase.table("connected_accounts")
+            .update(update_data)
+            .eq("id", record["id"]))
         return result.data[0] if result.data else {"success": True}
 
     # ── Yeni hesap ekleme ──
 
     # Paywall: hesap limiti kontrolü (soft-deleted hariç)
-    all_real = supabase.table("connected_accounts") \
-        .select("id", count="exact") \
-        .eq("user_id", user.id) \
-        .neq("platform", "default") \
-        .is_("deleted_at", "null") \
-        .execute()
+    all_real = await db_execute(supabase.table("connected_accounts")
+        .select("id", count="exact")
+        .eq("user_id", user.id)
+        .neq("platform", "default")
+        .is_("deleted_at", "null"))
     current_count = all_real.count if hasattr(all_real, 'count') and all_real.count is not None else len(all_real.data or [])
 
     # Kullanıcının limit'ini çek
-    settings_res = supabase.table("user_settings") \
-        .select("account_limit, subscription_tier") \
-        .eq("user_id", user.id) \
-        .limit(1) \
-        .execute()
+    settings_res = await db_execute(supabase.table("user_settings")
+        .select("account_limit, subscription_tier")
+        .eq("user_id", user.id)
+        .limit(1))
     account_limit = 1
     tier = "free"
     if settings_res.data:
@@ -259,7 +250,7 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
 
     # Yeni hesap oluştur
     new_id = str(uuid.uuid4())
-    result = supabase.table("connected_accounts").insert({
+    result = await db_execute(supabase.table("connected_accounts").insert({
         "id": new_id,
         "user_id": user.id,
         "platform": platform,
@@ -270,7 +261,7 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
         "status": "active",
         "created_at": now,
         "updated_at": now,
-    }).execute()
+    }))
 
     # Ghost merge: default hesap varsa veriyi yeni hesaba aktar
     if is_first:
@@ -279,36 +270,35 @@ async def upsert_account(platform: str, body: AccountUpdate, user=Depends(requir
     # İkinci+ hesap: null migration (güvenlik ağı)
     if not is_first:
         # Primary hesabı bul
-        primary_res = supabase.table("connected_accounts") \
-            .select("id") \
-            .eq("user_id", user.id) \
-            .eq("is_primary", True) \
-            .limit(1) \
-            .execute()
+        primary_res = await db_execute(supabase.table("connected_accounts")
+            .select("id")
+            .eq("user_id", user.id)
+            .eq("is_primary", True)
+            .limit(1))
         if primary_res.data:
             await _run_null_migration(user.id, primary_res.data[0]["id"], supabase)
 
     # Yeni hesabı aktif yap (user_settings)
     if is_first:
-        supabase.table("user_settings").upsert({
+        await db_execute(supabase.table("user_settings").upsert({
             "user_id": user.id,
             "active_account_id": new_id,
             "updated_at": now,
-        }, on_conflict="user_id").execute()
+        }, on_conflict="user_id"))
 
+    invalidate_account_cache(user.id)
     return result.data[0] if result.data else {"success": True, "id": new_id}
 
 
 @router.delete("/by-id/{account_id}")
 async def delete_account_by_id(account_id: str, user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Hesap soft-delete (account_id bazlı, multi-account safe)."""
-    target = supabase.table("connected_accounts") \
-        .select("id, is_primary, platform") \
-        .eq("id", account_id) \
-        .eq("user_id", user.id) \
-        .is_("deleted_at", "null") \
-        .limit(1) \
-        .execute()
+    target = await db_execute(supabase.table("connected_accounts")
+        .select("id, is_primary, platform")
+        .eq("id", account_id)
+        .eq("user_id", user.id)
+        .is_("deleted_at", "null")
+        .limit(1))
     return await _soft_delete_account(target, user, supabase)
 
 
@@ -318,13 +308,12 @@ async def delete_account(platform: str, user=Depends(require_auth), supabase=Dep
     if platform not in VALID_PLATFORMS:
         raise HTTPException(status_code=400, detail=f"Geçersiz platform: {platform}")
 
-    target = supabase.table("connected_accounts") \
-        .select("id, is_primary, platform") \
-        .eq("user_id", user.id) \
-        .eq("platform", platform) \
-        .is_("deleted_at", "null") \
-        .limit(1) \
-        .execute()
+    target = await db_execute(supabase.table("connected_accounts")
+        .select("id, is_primary, platform")
+        .eq("user_id", user.id)
+        .eq("platform", platform)
+        .is_("deleted_at", "null")
+        .limit(1))
     return await _soft_delete_account(target, user, supabase)
 
 
@@ -343,55 +332,51 @@ async def _soft_delete_account(target, user, supabase):
     cascade_counts = {}
     for table in cascade_tables:
         try:
-            res = supabase.table(table) \
-                .select("id", count="exact") \
-                .eq("account_id", deleted_id) \
-                .eq("user_id", user.id) \
-                .execute()
+            res = await db_execute(supabase.table(table)
+                .select("id", count="exact")
+                .eq("account_id", deleted_id)
+                .eq("user_id", user.id))
             cascade_counts[table] = res.count or 0
         except Exception:
             cascade_counts[table] = 0
 
     # 2. Hesabı soft-delete (hard delete değil, diriliş mümkün)
-    supabase.table("connected_accounts") \
-        .update({"deleted_at": now, "is_primary": False, "status": "deleted"}) \
-        .eq("id", deleted_id) \
-        .execute()
+    await db_execute(supabase.table("connected_accounts")
+        .update({"deleted_at": now, "is_primary": False, "status": "deleted"})
+        .eq("id", deleted_id))
 
     # 3. Aktif hesap silindiyse → fallback
-    settings = supabase.table("user_settings") \
-        .select("active_account_id") \
-        .eq("user_id", user.id) \
-        .limit(1) \
-        .execute()
+    settings = await db_execute(supabase.table("user_settings")
+        .select("active_account_id")
+        .eq("user_id", user.id)
+        .limit(1))
 
     active_was_deleted = settings.data and settings.data[0].get("active_account_id") == deleted_id
 
     # Kalan AKTİF hesapları bul
-    remaining = supabase.table("connected_accounts") \
-        .select("id") \
-        .eq("user_id", user.id) \
-        .neq("platform", "default") \
-        .is_("deleted_at", "null") \
-        .order("created_at") \
-        .limit(1) \
-        .execute()
+    remaining = await db_execute(supabase.table("connected_accounts")
+        .select("id")
+        .eq("user_id", user.id)
+        .neq("platform", "default")
+        .is_("deleted_at", "null")
+        .order("created_at")
+        .limit(1))
 
     fallback_id = remaining.data[0]["id"] if remaining.data else None
 
     if active_was_deleted:
-        supabase.table("user_settings").upsert({
+        await db_execute(supabase.table("user_settings").upsert({
             "user_id": user.id,
             "active_account_id": fallback_id,
             "updated_at": now,
-        }, on_conflict="user_id").execute()
+        }, on_conflict="user_id"))
 
     if was_primary and fallback_id:
-        supabase.table("connected_accounts") \
-            .update({"is_primary": True}) \
-            .eq("id", fallback_id) \
-            .execute()
+        await db_execute(supabase.table("connected_accounts")
+            .update({"is_primary": True})
+            .eq("id", fallback_id))
 
+    invalidate_account_cache(user.id)
     return {
         "deleted": 1,
         "fallback_account_id": fallback_id,
@@ -404,27 +389,25 @@ async def _soft_delete_account(target, user, supabase):
 @router.patch("/by-id/{account_id}/primary")
 async def set_primary_by_id(account_id: str, user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Hesabı primary yap (account_id bazlı, multi-account safe)."""
-    existing = supabase.table("connected_accounts") \
-        .select("id, platform") \
-        .eq("id", account_id) \
-        .eq("user_id", user.id) \
-        .is_("deleted_at", "null") \
-        .limit(1) \
-        .execute()
+    existing = await db_execute(supabase.table("connected_accounts")
+        .select("id, platform")
+        .eq("id", account_id)
+        .eq("user_id", user.id)
+        .is_("deleted_at", "null")
+        .limit(1))
     if not existing.data:
         raise HTTPException(status_code=404, detail="Hesap bulunamadı")
 
     # Hepsini unset
-    supabase.table("connected_accounts") \
-        .update({"is_primary": False}) \
-        .eq("user_id", user.id) \
-        .execute()
+    await db_execute(supabase.table("connected_accounts")
+        .update({"is_primary": False})
+        .eq("user_id", user.id))
     # Bu hesabı set
-    supabase.table("connected_accounts") \
-        .update({"is_primary": True}) \
-        .eq("id", account_id) \
-        .execute()
+    await db_execute(supabase.table("connected_accounts")
+        .update({"is_primary": True})
+        .eq("id", account_id))
 
+    invalidate_account_cache(user.id)
     return {"success": True, "primary_id": account_id}
 
 
@@ -434,25 +417,23 @@ async def set_primary(platform: str, user=Depends(require_auth), supabase=Depend
     if platform not in VALID_PLATFORMS:
         raise HTTPException(status_code=400, detail=f"Geçersiz platform: {platform}")
 
-    existing = supabase.table("connected_accounts") \
-        .select("id") \
-        .eq("user_id", user.id) \
-        .eq("platform", platform) \
-        .is_("deleted_at", "null") \
-        .limit(1) \
-        .execute()
+    existing = await db_execute(supabase.table("connected_accounts")
+        .select("id")
+        .eq("user_id", user.id)
+        .eq("platform", platform)
+        .is_("deleted_at", "null")
+        .limit(1))
     if not existing.data:
         raise HTTPException(status_code=404, detail="Hesap bulunamadı")
 
-    supabase.table("connected_accounts") \
-        .update({"is_primary": False}) \
-        .eq("user_id", user.id) \
-        .execute()
-    supabase.table("connected_accounts") \
-        .update({"is_primary": True}) \
-        .eq("id", existing.data[0]["id"]) \
-        .execute()
+    await db_execute(supabase.table("connected_accounts")
+        .update({"is_primary": False})
+        .eq("user_id", user.id))
+    await db_execute(supabase.table("connected_accounts")
+        .update({"is_primary": True})
+        .eq("id", existing.data[0]["id"]))
 
+    invalidate_account_cache(user.id)
     return {"success": True, "primary": platform}
 
 
@@ -460,22 +441,22 @@ async def set_primary(platform: str, user=Depends(require_auth), supabase=Depend
 async def switch_account(account_id: str, user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Aktif hesabı değiştir."""
     # Hesap bu kullanıcıya ait mi?
-    acc = supabase.table("connected_accounts") \
-        .select("id, platform, username, status") \
-        .eq("id", account_id) \
-        .eq("user_id", user.id) \
-        .limit(1) \
-        .execute()
+    acc = await db_execute(supabase.table("connected_accounts")
+        .select("id, platform, username, status")
+        .eq("id", account_id)
+        .eq("user_id", user.id)
+        .limit(1))
 
     if not acc.data:
         raise HTTPException(status_code=404, detail="Hesap bulunamadı")
 
     now = datetime.now(timezone.utc).isoformat()
-    supabase.table("user_settings").upsert({
+    await db_execute(supabase.table("user_settings").upsert({
         "user_id": user.id,
         "active_account_id": account_id,
         "updated_at": now,
-    }, on_conflict="user_id").execute()
+    }, on_conflict="user_id"))
+    invalidate_account_cache(user.id)
 
     account = acc.data[0]
     return {
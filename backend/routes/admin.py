@@ -7,6 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from middleware.auth import require_auth
 from pydantic import BaseModel
 from typing import Optional
+from services.db import db_execute
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -38,17 +39,19 @@ async def rotate_key(body: RotateKeyRequest, user=Depends(require_auth)):
     if body.key_type == "openai":
         if not body.new_key.startswith("sk-"):
             raise HTTPException(status_code=400, detail="Invalid OpenAI key format")
-        from openai import OpenAI
+        from services.llm_gateway import llm_gateway
         try:
-            new_client = OpenAI(api_key=body.new_key)
+            new_client = llm_gateway.sync_client("openai", api_key=body.new_key)
             # Quick validation
             new_client.models.list()
         except Exception:
             raise HTTPException(status_code=400, detail="OpenAI key validation failed")
 
         import server
-        server.openai_client = new_client
         os.environ["OPENAI_API_KEY"] = body.new_key
+        llm_gateway.forget_key("openai")
+        server.openai_client = llm_gateway.sync_client("openai")
+        server.openai_async_client = llm_gateway.async_client("openai")
         logger.info(f"OpenAI key rotated by {user.email}")
         return {"success": True, "key_type": "openai", "message": "Key rotated successfully"}
 
@@ -57,7 +60,7 @@ async def rotate_key(body: RotateKeyRequest, user=Depends(require_auth)):
         try:
             new_sb = create_client(os.environ["SUPABASE_URL"], body.new_key)
             # Quick validation
-            new_sb.table("status_checks").select("id").limit(1).execute()
+            await db_execute(new_sb.table("status_checks").select("id").limit(1))
         except Exception:
             raise HTTPException(status_code=400, detail="Supabase key validation failed")
 
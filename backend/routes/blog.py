@@ -11,6 +11,8 @@ GET /api/meta/blog/levels - İçerik seviyeleri
 from fastapi import APIRouter, HTTPException, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.generation_stream import streamable
+from services.single_flight import single_flight
 from pydantic import BaseModel
 from typing import Optional, List
 import json
@@ -115,6 +117,8 @@ def _calculate_readability(text: str) -> dict:
 # ==================== ROUTES ====================
 
 @router.post("/generate/blog/outline", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_blog_outline(request: BlogOutlineRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Blog taslağı üret"""
     try:
@@ -142,7 +146,7 @@ async def generate_blog_outline(request: BlogOutlineRequest, _=Depends(rate_limi
 
         user_prompt = f"Konu: {request.topic}\n\nBlog taslağını oluştur."
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -151,6 +155,8 @@ async def generate_blog_outline(request: BlogOutlineRequest, _=Depends(rate_limi
 
 
 @router.post("/generate/blog/full", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_blog_full(request: BlogFullRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Tam blog yazısı üret"""
     try:
@@ -182,7 +188,7 @@ async def generate_blog_full(request: BlogFullRequest, _=Depends(rate_limit), us
 
         user_prompt = f"Konu: {request.topic}\n\nBlog yazısını yaz."
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
 
         # Readability metrikleri hesapla
         readability = _calculate_readability(contents[0])
@@ -195,6 +201,8 @@ async def generate_blog_full(request: BlogFullRequest, _=Depends(rate_limit), us
 
 
 @router.post("/generate/blog/seo-optimize", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_blog_seo(request: BlogSEORequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Mevcut blog yazısını SEO analiz et"""
     try:
@@ -208,7 +216,7 @@ async def generate_blog_seo(request: BlogSEORequest, _=Depends(rate_limit), user
         system_prompt = f"{format_prompt}\n{keyword_ctx}\n{lang}"
         user_prompt = f"Bu blog yazısını SEO açısından analiz et:\n\n{request.content}"
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
 
         # Readability metrikleri
         readability = _calculate_readability(request.content)
@@ -231,6 +239,8 @@ async def generate_blog_seo(request: BlogSEORequest, _=Depends(rate_limit), user
 
 
 @router.post("/generate/blog/cover-image", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_blog_cover_image(request: BlogCoverImageRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Blog cover image + makale içi görsel promptları üret"""
     try:
@@ -250,7 +260,7 @@ async def generate_blog_cover_image(request: BlogCoverImageRequest, _=Depends(ra
             f"Cover image ve makale içi görsel promptlarını üret."
         )
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
 
         # Parse JSON
         raw = contents[0].replace("```json", "").replace("```", "").strip()
@@ -267,6 +277,8 @@ async def generate_blog_cover_image(request: BlogCoverImageRequest, _=Depends(ra
 
 
 @router.post("/generate/blog/repurpose", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_blog_repurpose(request: BlogRepurposeRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Blog'u başka platforma dönüştür"""
     try:
@@ -279,7 +291,7 @@ async def generate_blog_repurpose(request: BlogRepurposeRequest, _=Depends(rate_
         system_prompt = f"{format_prompt}\n\nHedef platform: {request.target_platform}\n\n## DİL\n{lang}"
         user_prompt = f"Bu blog yazısını {request.target_platform} formatına dönüştür:\n\n{request.blog_content}"
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -16,6 +16,8 @@ from datetime import datetime, timezone, timedelta
 import json
 import logging
 import uuid
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/coach", tags=["coach"])
@@ -69,10 +71,9 @@ async def get_coach_feed(user=Depends(require_auth), account_id: str = Depends(g
 
     # Dismissed kartları filtrele
     try:
-        dismissed_res = sb.table("coach_dismissed_cards") \
-            .select("card_key") \
-            .eq("user_id", user.id).eq("account_id", account_id) \
-            .execute()
+        dismissed_res = await db_execute(sb.table("coach_dismissed_cards")
+            .select("card_key")
+            .eq("user_id", user.id).eq("account_id", account_id))
         dismissed_keys = {d["card_key"] for d in (dismissed_res.data or [])}
         cards = [c for c in cards if c.get("key") not in dismissed_keys]
     except Exception as e:
@@ -97,12 +98,12 @@ async def dismiss_card(body: DismissRequest, user=Depends(require_auth), account
     sb = get_supabase()
     now = datetime.now(timezone.utc).isoformat()
     try:
-        sb.table("coach_dismissed_cards").upsert({
+        await db_execute(sb.table("coach_dismissed_cards").upsert({
             "id": str(uuid.uuid4()),
             "user_id": user.id,
             "card_key": body.card_key,
             "dismissed_at": now,
-        }, on_conflict="user_id,card_key").execute()
+        }, on_conflict="user_id,card_key"))
         return {"success": True}
     except Exception as e:
         logger.error(f"Dismiss error: {e}")
@@ -120,12 +121,11 @@ async def get_weekly_plan(user=Depends(require_auth), account_id: str = Depends(
     monday = _this_monday().isoformat()
 
     try:
-        res = sb.table("coach_weekly_plans") \
-            .select("*") \
-            .eq("user_id", user.id).eq("account_id", account_id) \
-            .eq("week_start", monday) \
-            .limit(1) \
-            .execute()
+        res = await db_execute(sb.table("coach_weekly_plans")
+            .select("*")
+            .eq("user_id", user.id).eq("account_id", account_id)
+            .eq("week_start", monday)
+            .limit(1))
 
         if res.data:
             row = res.data[0]
@@ -162,12 +162,11 @@ async def create_weekly_plan(
         sb = get_supabase()
 
         # Kullanıcının üretim geçmişinden context çıkar
-        gen_res = sb.table("generations") \
-            .select("persona, tone, length, type") \
-            .eq("user_id", user.id).eq("account_id", account_id) \
-            .order("created_at", desc=True) \
-            .limit(30) \
-            .execute()
+        gen_res = await db_execute(sb.table("generations")
+            .select("persona, tone, length, type")
+            .eq("user_id", user.id).eq("account_id", account_id)
+            .order("created_at", desc=True)
+            .limit(30))
         gens = gen_res.data or []
 
         # En çok kullanılan persona/tone
@@ -178,11 +177,10 @@ async def create_weekly_plan(
         least_persona = personas.most_common()[-1][0] if len(personas) > 1 else None
 
         # Creator Hub profile
-        profile_res = sb.table("user_settings") \
-            .select("display_name, niches, brand_voice") \
-            .eq("user_id", user.id) \
-            .limit(1) \
-            .execute()
+        profile_res = await db_execute(sb.table("user_settings")
+            .select("display_name, niches, brand_voice")
+            .eq("user_id", user.id)
+            .limit(1))
         profile = profile_res.data[0] if profile_res.data else {}
         creator_name = profile.get("display_name") or user.email.split("@")[0]
         creator_niches = profile.get("niches") or []
@@ -212,7 +210,7 @@ async def create_weekly_plan(
             ordered_days.append(f"{DAY_NAMES_TR[d]} ({date.strftime('%d.%m')})")
         days_str = ", ".join(ordered_days)
 
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"""Sen {creator_name} adlı kullanıcının kişisel sosyal medya stratejistisin. Sıcak ve enerjik bir hitapla (Merhaba {creator_name}!) başla. Kişiselleştirilmiş 7 günlük Twitter içerik planı oluştur.
@@ -265,22 +263,20 @@ JSON formatında döndür:
             "updated_at": now,
         }
 
-        existing = sb.table("coach_weekly_plans") \
-            .select("id") \
-            .eq("user_id", user.id).eq("account_id", account_id) \
-            .eq("week_start", monday) \
-            .limit(1) \
-            .execute()
+        existing = await db_execute(sb.table("coach_weekly_plans")
+            .select("id")
+            .eq("user_id", user.id).eq("account_id", account_id)
+            .eq("week_start", monday)
+            .limit(1))
 
         if existing.data:
-            sb.table("coach_weekly_plans") \
-                .update(record) \
-                .eq("id", existing.data[0]["id"]) \
-                .execute()
+            await db_execute(sb.table("coach_weekly_plans")
+                .update(record)
+                .eq("id", existing.data[0]["id"]))
         else:
             record["id"] = str(uuid.uuid4())
             record["created_at"] = now
-            sb.table("coach_weekly_plans").insert(record).execute()
+            await db_execute(sb.table("coach_weekly_plans").insert(record))
 
         return {
             "plan": plan_data.get("plan", []),
@@ -308,23 +304,21 @@ async def get_insights(user=Depends(require_auth), account_id: str = Depends(get
         sb = get_supabase()
 
         # Son 100 generation
-        gen_res = sb.table("generations") \
-            .select("persona, tone, length, type, created_at") \
-            .eq("user_id", user.id).eq("account_id", account_id) \
-            .order("created_at", desc=True) \
-            .limit(100) \
-            .execute()
+        gen_res = await db_execute(sb.table("generations")
+            .select("persona, tone, length, type, created_at")
+            .eq("user_id", user.id).eq("account_id", account_id)
+            .order("created_at", desc=True)
+            .limit(100))
 
         gens = gen_res.data or []
         if not gens:
             return {"stats": {}, "insights": [], "message": "Henüz yeterli veri yok. Birkaç içerik ürettikten sonra koç önerileri burada belirecek."}
 
         # Favori sayısı
-        fav_res = sb.table("favorites") \
-            .select("id") \
-            .eq("user_id", user.id).eq("account_id", account_id) \
-            .is_("deleted_at", "null") \
-            .execute()
+        fav_res = await db_execute(sb.table("favorites")
+            .select("id")
+            .eq("user_id", user.id).eq("account_id", account_id)
+            .is_("deleted_at", "null"))
         fav_count = len(fav_res.data or [])
 
         # Stats
@@ -9,6 +9,7 @@ from middleware.auth import require_auth
 from pydantic import BaseModel
 from typing import Optional
 import logging
+from services.db import db_execute
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/drafts", tags=["drafts"])
@@ -44,12 +45,11 @@ async def get_draft(draft_id: str, user=Depends(require_auth)):
     """Tek taslak getir. Bridge akışında /create sayfası bunu çeker."""
     sb = get_supabase()
     try:
-        result = sb.table("daily_drafts") \
-            .select("*") \
-            .eq("id", draft_id) \
-            .eq("user_id", user.id) \
-            .limit(1) \
-            .execute()
+        result = await db_execute(sb.table("daily_drafts")
+            .select("*")
+            .eq("id", draft_id)
+            .eq("user_id", user.id)
+            .limit(1))
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Taslak bulunamadı")
@@ -80,11 +80,10 @@ async def update_draft(draft_id: str, body: DraftUpdate, user=Depends(require_au
         raise HTTPException(status_code=400, detail="Güncellenecek alan yok")
 
     try:
-        result = sb.table("daily_drafts") \
-            .update(update) \
-            .eq("id", draft_id) \
-            .eq("user_id", user.id) \
-            .execute()
+        result = await db_execute(sb.table("daily_drafts")
+            .update(update)
+            .eq("id", draft_id)
+            .eq("user_id", user.id))
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Taslak bulunamadı")
@@ -8,6 +8,8 @@ GET /api/meta/instagram/formats - Mevcut formatlar
 from fastapi import APIRouter, HTTPException, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.generation_stream import streamable
+from services.single_flight import single_flight
 from pydantic import BaseModel
 from typing import Optional, List
 import logging
@@ -57,6 +59,8 @@ class GenerationResponse(BaseModel):
 
 
 @router.post("/generate/instagram/caption", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_instagram_caption(request: InstagramCaptionRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Instagram caption üret"""
     try:
@@ -69,7 +73,7 @@ async def generate_instagram_caption(request: InstagramCaptionRequest, _=Depends
 
         system_prompt = f"{INSTAGRAM_SYSTEM_PROMPT}\n\n{BANNED_PATTERNS}\n\n{format_prompt}\n\n## DİL\n{lang}\n\n{'## EK BAĞLAM' + chr(10) + request.additional_context if request.additional_context else ''}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants)
+        contents, _ = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants)
         variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -78,6 +82,8 @@ async def generate_instagram_caption(request: InstagramCaptionRequest, _=Depends
 
 
 @router.post("/generate/instagram/reel-script", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_instagram_reel(request: InstagramReelRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Instagram reel scripti üret"""
     try:
@@ -90,7 +96,7 @@ async def generate_instagram_reel(request: InstagramReelRequest, _=Depends(rate_
 
         system_prompt = f"{INSTAGRAM_SYSTEM_PROMPT}\n\n{BANNED_PATTERNS}\n\n{format_prompt}\n\nHedef süre: {request.duration} saniye\n\n## DİL\n{lang}\n\n{'## EK BAĞLAM' + chr(10) + request.additional_context if request.additional_context else ''}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Reel scriptini üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Reel scriptini üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -99,6 +105,8 @@ async def generate_instagram_reel(request: InstagramReelRequest, _=Depends(rate_
 
 
 @router.post("/generate/instagram/hashtags", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_instagram_hashtags(request: InstagramHashtagRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Instagram hashtag seti üret"""
     try:
@@ -108,7 +116,7 @@ async def generate_instagram_hashtags(request: InstagramHashtagRequest, _=Depend
         niche_ctx = f"\nNiş: {request.niche}" if request.niche else ""
         system_prompt = f"{INSTAGRAM_HASHTAG_PROMPT}{niche_ctx}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Hashtag setini üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Hashtag setini üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -117,6 +125,8 @@ async def generate_instagram_hashtags(request: InstagramHashtagRequest, _=Depend
 
 
 @router.post("/generate/instagram/story-ideas", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_instagram_stories(request: InstagramStoryRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Instagram story fikirleri üret"""
     try:
@@ -128,7 +138,7 @@ async def generate_instagram_stories(request: InstagramStoryRequest, _=Depends(r
 
         system_prompt = f"{INSTAGRAM_SYSTEM_PROMPT}\n\n{format_prompt}\n\nStory sayısı: {request.count}\n\n## DİL\n{lang}\n\n{'## EK BAĞLAM' + chr(10) + request.additional_context if request.additional_context else ''}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Story fikirlerini üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Story fikirlerini üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -10,6 +10,8 @@ GET /api/meta/linkedin/personas - Persona'lar
 from fastapi import APIRouter, HTTPException, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.generation_stream import streamable
+from services.single_flight import single_flight
 from pydantic import BaseModel
 from typing import Optional, List
 import json
@@ -111,6 +113,8 @@ def _get_lang(language: str) -> str:
 # ==================== ROUTES ====================
 
 @router.post("/generate/linkedin", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_linkedin_post(request: LinkedInGenerateRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """LinkedIn post üret (persona entegrasyonlu)"""
     try:
@@ -136,7 +140,7 @@ async def generate_linkedin_post(request: LinkedInGenerateRequest, _=Depends(rat
 
         user_prompt = f"Konu: {request.topic}\n\nLinkedIn {request.format} post üret."
 
-        contents = await generate_with_openai(system_prompt, user_prompt, request.variants)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, request.variants)
         variants = [
             GeneratedContent(content=c, variant_index=i, character_count=len(c))
             for i, c in enumerate(contents)
@@ -148,6 +152,8 @@ async def generate_linkedin_post(request: LinkedInGenerateRequest, _=Depends(rat
 
 
 @router.post("/generate/linkedin/carousel", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_linkedin_carousel(request: LinkedInCarouselRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """LinkedIn carousel metin üret"""
     try:
@@ -172,7 +178,7 @@ async def generate_linkedin_carousel(request: LinkedInCarouselRequest, _=Depends
 
         user_prompt = f"Konu: {request.topic}\n\nLinkedIn carousel metinlerini üret."
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -181,6 +187,8 @@ async def generate_linkedin_carousel(request: LinkedInCarouselRequest, _=Depends
 
 
 @router.post("/generate/linkedin/hooks", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_linkedin_hooks(request: LinkedInHooksRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Hook alternatifleri üret"""
     try:
@@ -218,7 +226,7 @@ Sadece hook'ları yaz, açıklama ekleme."""
 
         user_prompt = f"Konu: {request.topic}\nFormat: {request.format}\n\n{request.count} farklı LinkedIn hook üret."
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -227,6 +235,8 @@ Sadece hook'ları yaz, açıklama ekleme."""
 
 
 @router.post("/generate/linkedin/analyze", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def analyze_linkedin_post(request: LinkedInAnalyzeRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Mevcut LinkedIn postunu analiz et"""
     try:
@@ -275,7 +285,7 @@ Sadece JSON döndür. {lang}"""
 
         user_prompt = f"Bu LinkedIn postunu analiz et ({char_count} karakter, {word_count} kelime, {hashtag_count} hashtag):\n\n{request.content}"
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
 
         # Parse JSON
         raw = contents[0].replace("```json", "").replace("```", "").strip()
@@ -303,6 +313,8 @@ Sadece JSON döndür. {lang}"""
 
 
 @router.post("/generate/linkedin/image-prompt", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_linkedin_image(request: LinkedInImageRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """LinkedIn post görseli için prompt üret"""
     try:
@@ -339,7 +351,7 @@ Sadece JSON döndür."""
 
         user_prompt = f"LinkedIn post konusu: {request.topic}\nGörsel stili: {request.style} ({style}){content_ctx}\n\nGörsel promptu üret."
 
-        contents = await generate_with_openai(system_prompt, user_prompt, 1)
+        contents, _ = await generate_with_openai(system_prompt, user_prompt, 1)
 
         raw = contents[0].replace("```json", "").replace("```", "").strip()
         try:
@@ -4,6 +4,7 @@ Media routes - Nano Banana Pro image prompt generation
 from fastapi import APIRouter, HTTPException, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.llm_gateway import llm_gateway
 from pydantic import BaseModel
 from typing import Optional
 import logging
@@ -78,7 +79,7 @@ Stil: {request.style} ({style_guide})
 Bu içeriğe uygun görsel promptu üret."""
 
     try:
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -11,6 +11,7 @@ from collections import Counter, defaultdict
 import json
 import logging
 from datetime import datetime
+from services.db import db_execute
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/posting-times", tags=["posting-times"])
@@ -94,7 +95,7 @@ async def get_posting_heatmap(user=Depends(require_auth), account_id: str = Depe
         sb = get_supabase()
 
         # Get user's favorited content timestamps (scoped to current user)
-        favs = sb.table("favorites").select("created_at").eq("user_id", user.id).eq("account_id", account_id).execute()
+        favs = await db_execute(sb.table("favorites").select("created_at").eq("user_id", user.id).eq("account_id", account_id))
         fav_hours = defaultdict(int)
         for f in (favs.data or []):
             try:
@@ -16,6 +16,8 @@ import httpx
 import base64
 import uuid
 import json
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 logger = logging.getLogger(__name__)
@@ -153,11 +155,10 @@ async def get_taxonomy():
 @router.get("")
 async def get_profile(user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Kullanıcı profil bilgilerini getir."""
-    result = supabase.table("user_settings") \
-        .select("display_name, title, avatar_url, niches, brand_voice") \
-        .eq("user_id", user.id) \
-        .limit(1) \
-        .execute()
+    result = await db_execute(supabase.table("user_settings")
+        .select("display_name, title, avatar_url, niches, brand_voice")
+        .eq("user_id", user.id)
+        .limit(1))
 
     if not result.data:
         # Default profil
@@ -195,9 +196,8 @@ async def update_profile(body: ProfileUpdate, user=Depends(require_auth), supaba
     if body.brand_voice is not None:
         update_data["brand_voice"] = body.brand_voice.model_dump()
 
-    result = supabase.table("user_settings") \
-        .upsert({"user_id": user.id, **update_data}, on_conflict="user_id") \
-        .execute()
+    result = await db_execute(supabase.table("user_settings")
+        .upsert({"user_id": user.id, **update_data}, on_conflict="user_id"))
 
     return {"success": True, "profile": result.data[0] if result.data else update_data}
 
@@ -241,13 +241,12 @@ async def update_avatar(body: AvatarUpdate, user=Depends(require_auth), supabase
         platform = body.source  # twitter, instagram, tiktok
 
         # Kullanıcının bu platformdaki hesabını bul
-        acc = supabase.table("connected_accounts") \
-            .select("username") \
-            .eq("user_id", user.id) \
-            .eq("platform", platform) \
-            .is_("deleted_at", "null") \
-            .limit(1) \
-            .execute()
+        acc = await db_execute(supabase.table("connected_accounts")
+            .select("username")
+            .eq("user_id", user.id)
+            .eq("platform", platform)
+            .is_("deleted_at", "null")
+            .limit(1))
 
         if not acc.data:
             raise HTTPException(status_code=404, detail=f"{platform} hesabı bulunamadı")
@@ -309,9 +308,8 @@ async def update_avatar(body: AvatarUpdate, user=Depends(require_auth), supabase
             raise HTTPException(status_code=500, detail="Avatar kaydedilemedi")
 
     # DB güncelle
-    supabase.table("user_settings") \
-        .upsert({"user_id": user.id, "avatar_url": avatar_url, "updated_at": now}, on_conflict="user_id") \
-        .execute()
+    await db_execute(supabase.table("user_settings")
+        .upsert({"user_id": user.id, "avatar_url": avatar_url, "updated_at": now}, on_conflict="user_id"))
 
     return {"success": True, "avatar_url": avatar_url}
 
@@ -341,7 +339,7 @@ async def dna_test(body: DnaTestRequest, user=Depends(require_auth)):
     sorted_t = sorted(active.items(), key=lambda x: -x[1])
 
     sb = get_supabase()
-    profile = sb.table("user_settings").select("niches").eq("user_id", user.id).limit(1).execute()
+    profile = await db_execute(sb.table("user_settings").select("niches").eq("user_id", user.id).limit(1))
     niches = profile.data[0].get("niches", []) if profile.data else []
 
     if not niches:
@@ -349,14 +347,13 @@ async def dna_test(body: DnaTestRequest, user=Depends(require_auth)):
 
     # Trend çek
     cutoff = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat()
-    trend_query = sb.table("trends") \
-        .select("topic, summary, keywords") \
-        .eq("is_visible", True) \
-        .gte("created_at", cutoff) \
-        .gte("score", 60) \
-        .order("score", desc=True) \
-        .limit(20) \
-        .execute()
+    trend_query = await db_execute(sb.table("trends")
+        .select("topic, summary, keywords")
+        .eq("is_visible", True)
+        .gte("created_at", cutoff)
+        .gte("score", 60)
+        .order("score", desc=True)
+        .limit(20))
 
     all_trends = trend_query.data or []
     chosen_trend = None
@@ -421,7 +418,7 @@ async def dna_test(body: DnaTestRequest, user=Depends(require_auth)):
     voice_section = "\n".join(voice_parts)
 
     try:
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"""Tek bir tweet üret. Sadece tweet metnini döndür, başka hiçbir şey yazma.
@@ -454,7 +451,7 @@ KURALLAR:
         # Draft'ı daily_drafts'a kaydet (bridge to /create)
         draft_id = str(uuid.uuid4())
         try:
-            sb.table("daily_drafts").insert({
+            await db_execute(sb.table("daily_drafts").insert({
                 "id": draft_id,
                 "user_id": user.id,
                 "content": content,
@@ -465,7 +462,7 @@ KURALLAR:
                 "trend_summary": chosen_trend.get("summary") if chosen_trend else None,
                 "insight": f"DNA test ile üretildi",
                 "created_at": datetime.now(timezone.utc).isoformat(),
-            }).execute()
+            }))
         except Exception as e:
             logger.warning(f"DNA test draft save error (non-fatal): {e}")
             draft_id = None
@@ -496,13 +493,12 @@ async def analyze_tone(body: AnalyzeToneRequest = AnalyzeToneRequest(), user=Dep
     # Username belirle
     username = body.twitter_username
     if not username:
-        acc = supabase.table("connected_accounts") \
-            .select("username") \
-            .eq("user_id", user.id) \
-            .eq("platform", "twitter") \
-            .is_("deleted_at", "null") \
-            .limit(1) \
-            .execute()
+        acc = await db_execute(supabase.table("connected_accounts")
+            .select("username")
+            .eq("user_id", user.id)
+            .eq("platform", "twitter")
+            .is_("deleted_at", "null")
+            .limit(1))
         if not acc.data:
             raise HTTPException(status_code=404, detail="Bağlı Twitter hesabı bulunamadı. Önce bir hesap ekleyin.")
         username = acc.data[0]["username"]
@@ -526,7 +522,7 @@ async def analyze_tone(body: AnalyzeToneRequest = AnalyzeToneRequest(), user=Dep
 
     # GPT ile ton analizi
     try:
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": """Sen uzman bir sosyal medya ton analistisin.
@@ -5,6 +5,7 @@ POST /api/repurpose/image-prompt - İçerikten görsel prompt üret (Nano Banana
 from fastapi import APIRouter, HTTPException, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.llm_gateway import llm_gateway
 from pydantic import BaseModel
 from typing import Optional, List
 import json
@@ -53,7 +54,7 @@ async def convert_to_video_script(request: VideoScriptRequest, _=Depends(rate_li
             platform=request.platform
         )
 
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": prompt},
@@ -120,7 +121,7 @@ async def generate_image_prompt(request: ImagePromptRequest, _=Depends(rate_limi
             platform=request.platform
         )
 
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat("openai",
             model=MODEL_CONTENT,
             messages=[
                 {"role": "system", "content": prompt},
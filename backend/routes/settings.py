@@ -1,10 +1,12 @@
 """User Settings — active profile, persona/tone defaults, active account."""
 from fastapi import APIRouter, Depends
 from middleware.auth import require_auth
+from middleware.active_account import invalidate_account_cache
 from pydantic import BaseModel
 from typing import Optional
 import logging
 from datetime import datetime, timezone
+from services.db import db_execute
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 logger = logging.getLogger(__name__)
@@ -25,7 +27,7 @@ class SettingsUpdate(BaseModel):
 
 @router.get("")
 async def get_settings(user=Depends(require_auth), supabase=Depends(get_supabase)):
-    result = supabase.table("user_settings").select("*").eq("user_id", user.id).execute()
+    result = await db_execute(supabase.table("user_settings").select("*").eq("user_id", user.id))
     if result.data:
         return result.data[0]
     return {
@@ -59,7 +61,9 @@ async def update_settings(body: SettingsUpdate, user=Depends(require_auth), supa
     if body.active_account_id is not None:
         update_data["active_account_id"] = body.active_account_id if body.active_account_id != "" else None
 
-    result = supabase.table("user_settings").upsert(update_data, on_conflict="user_id").execute()
+    result = await db_execute(supabase.table("user_settings").upsert(update_data, on_conflict="user_id"))
+    if "active_account_id" in update_data:
+        invalidate_account_cache(user.id)
     if result.data:
         return result.data[0]
     return update_data
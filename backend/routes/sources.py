@@ -5,9 +5,12 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
+import asyncio
 import logging
 
 from services.twitter_scraper import scraper
+from services.db import db_execute
+from services.tweet_collector import replace_source_tweets
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +49,7 @@ async def add_source(request: AddSourceRequest, user=Depends(require_auth), supa
     username = request.twitter_username.lstrip('@')
     
     # Check if already exists FOR THIS USER
-    existing = supabase.table("style_sources").select("*").eq("twitter_username", username).eq("user_id", user.id).execute()
+    existing = await db_execute(supabase.table("style_sources").select("*").eq("twitter_username", username).eq("user_id", user.id))
     if existing.data:
         raise HTTPException(status_code=400, detail=f"@{username} zaten ekli")
     
@@ -69,7 +72,7 @@ async def add_source(request: AddSourceRequest, user=Depends(require_auth), supa
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    supabase.table("style_sources").insert(source_data).execute()
+    await db_execute(supabase.table("style_sources").insert(source_data))
     
     # Fetch tweets (async — GraphQL fallback)
     logger.info(f"Fetching tweets for @{username}")
@@ -98,21 +101,21 @@ async def add_source(request: AddSourceRequest, user=Depends(require_auth), supa
         for i in range(0, len(tweet_records), batch_size):
             batch = tweet_records[i:i+batch_size]
             try:
-                supabase.table("source_tweets").insert(batch).execute()
+                await db_execute(supabase.table("source_tweets").insert(batch))
             except Exception as e:
                 logger.error(f"Failed to insert tweets batch: {e}")
     
     # Update source with tweet count
-    supabase.table("style_sources").update({
+    await db_execute(supabase.table("style_sources").update({
         "tweet_count": len(tweet_records),
         "last_scraped_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", source_id).execute()
+    }).eq("id", source_id))
     
     # Auto-embed tweets
     try:
         from embed_tweets import embed_tweets_for_source_sync
-        embed_tweets_for_source_sync(source_id)
-        logger.info(f"Auto-embedded tweets for source {source_id}")
+        embedding_stats = await asyncio.to_thread(embed_tweets_for_source_sync, source_id)
+        logger.info(f"Auto-embedded tweets for source {source_id}: {embedding_stats}")
     except Exception as e:
         logger.warning(f"Auto-embed failed for source {source_id}: {e}")
     
@@ -128,7 +131,7 @@ async def add_source(request: AddSourceRequest, user=Depends(require_auth), supa
 @router.get("/list", response_model=List[SourceResponse])
 async def list_sources(user=Depends(require_auth), supabase=Depends(get_supabase)):
     """List all style sources for this user"""
-    result = supabase.table("style_sources").select("*").eq("user_id", user.id).order("created_at", desc=True).execute()
+    result = await db_execute(supabase.table("style_sources").select("*").eq("user_id", user.id).order("created_at", desc=True))
     
     sources = []
     for row in result.data:
@@ -146,11 +149,11 @@ async def list_sources(user=Depends(require_auth), supabase=Depends(get_supabase
 @router.get("/{source_id}/tweets", response_model=List[TweetResponse])
 async def get_source_tweets(source_id: str, limit: int = 50, user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Get tweets from a source (verify ownership first)"""
-    source_check = supabase.table("style_sources").select("id").eq("id", source_id).eq("user_id", user.id).execute()
+    source_check = await db_execute(supabase.table("style_sources").select("id").eq("id", source_id).eq("user_id", user.id))
     if not source_check.data:
         raise HTTPException(status_code=404, detail="Kaynak bulunamadı")
     
-    result = supabase.table("source_tweets").select("*").eq("source_id", source_id).order("likes", desc=True).limit(limit).execute()
+    result = await db_execute(supabase.table("source_tweets").select("*").eq("source_id", source_id).order("likes", desc=True).limit(limit))
     
     tweets = []
     for row in result.data:
@@ -170,7 +173,7 @@ async def get_source_tweets(source_id: str, limit: int = 50, user=Depends(requir
 @router.delete("/{source_id}")
 async def delete_source(source_id: str, user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Delete a style source and its tweets (user-scoped)"""
-    result = supabase.table("style_sources").delete().eq("id", source_id).eq("user_id", user.id).execute()
+    result = await db_execute(supabase.table("style_sources").delete().eq("id", source_id).eq("user_id", user.id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Kaynak bulunamadı")
     return {"success": True}
@@ -178,7 +181,7 @@ async def delete_source(source_id: str, user=Depends(require_auth), supabase=Dep
 @router.post("/{source_id}/refresh")
 async def refresh_source(source_id: str, user=Depends(require_auth), supabase=Depends(get_supabase)):
     """Re-fetch tweets for a source (verify ownership)"""
-    result = supabase.table("style_sources").select("*").eq("id", source_id).eq("user_id", user.id).execute()
+    result = await db_execute(supabase.table("style_sources").select("*").eq("id", source_id).eq("user_id", user.id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Kaynak bulunamadı")
     
@@ -188,10 +191,7 @@ async def refresh_source(source_id: str, user=Depends(require_auth), supabase=De
     # Fetch new tweets (async — GraphQL fallback)
     tweets = await scraper.get_user_tweets_async(username, count=200)
     
-    # Delete old tweets
-    supabase.table("source_tweets").delete().eq("source_id", source_id).execute()
-    
-    # Insert new tweets
+    # Upsert new tweets (mevcut tweet'lerin embedding'leri korunur)
     tweet_records = []
     for tweet in tweets:
         tweet_records.append({
@@ -209,23 +209,21 @@ async def refresh_source(source_id: str, user=Depends(require_auth), supabase=De
         })
     
     if tweet_records:
-        batch_size = 50
-        for i in range(0, len(tweet_records), batch_size):
-            batch = tweet_records[i:i+batch_size]
-            supabase.table("source_tweets").insert(batch).execute()
+        await replace_source_tweets(supabase, source_id, tweet_records)
     
     # Update source
-    supabase.table("style_sources").update({
+    await db_execute(supabase.table("style_sources").update({
         "tweet_count": len(tweet_records),
         "last_scraped_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", source_id).execute()
+    }).eq("id", source_id))
     
-    # Auto-embed tweets
+    # Auto-embed tweets (sadece yeni / içeriği değişen tweet'ler)
+    embedding_stats = None
     try:
         from embed_tweets import embed_tweets_for_source_sync
-        embed_tweets_for_source_sync(source_id)
-        logger.info(f"Auto-embedded tweets for refreshed source {source_id}")
+        embedding_stats = await asyncio.to_thread(embed_tweets_for_source_sync, source_id)
+        logger.info(f"Auto-embedded tweets for refreshed source {source_id}: {embedding_stats}")
     except Exception as e:
         logger.warning(f"Auto-embed failed for source {source_id}: {e}")
     
-    return {"success": True, "tweet_count": len(tweet_records)}
+    return {"success": True, "tweet_count": len(tweet_records), "embeddings": embedding_stats}
@@ -3,6 +3,7 @@ Style Transfer Route — "Başka Biri Gibi Yaz"
 POST /api/style-transfer
 """
 
+import asyncio
 import json
 import logging
 import httpx
@@ -11,11 +12,12 @@ import re
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from openai import OpenAI
 from middleware.auth import require_auth
 from middleware.active_account import get_active_account
 from middleware.rate_limit import rate_limit
 from middleware.token_tracker import check_token_budget, record_token_usage
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -92,10 +94,9 @@ async def style_transfer(req: StyleTransferRequest, _=Depends(rate_limit), user=
         raise HTTPException(status_code=400, detail="Kaynak metin veya URL gerekli")
 
     # 2. Hedef profili çek
-    profile = supabase.table("style_profiles") \
-        .select("*") \
-        .eq("id", req.target_profile_id) \
-        .execute()
+    profile = await db_execute(supabase.table("style_profiles")
+        .select("*")
+        .eq("id", req.target_profile_id))
 
     if not profile.data:
         raise HTTPException(status_code=404, detail="Stil profili bulunamadı")
@@ -109,7 +110,7 @@ async def style_transfer(req: StyleTransferRequest, _=Depends(rate_limit), user=
     few_shot_tweets = []
     if source_ids:
         try:
-            similar = get_similar_tweets(source_text, source_ids, limit=5)
+            similar = await asyncio.to_thread(get_similar_tweets, source_text, source_ids, limit=5)
             few_shot_tweets = similar
         except Exception as e:
             logger.warning(f"Similar tweets fetch failed: {e}")
@@ -118,12 +119,11 @@ async def style_transfer(req: StyleTransferRequest, _=Depends(rate_limit), user=
     if not few_shot_tweets and example_tweets:
         few_shot_tweets = example_tweets[:5]
 
-    # 4. OpenAI client
+    # 4. OpenAI key kontrolü (çağrılar llm_gateway üzerinden: paylaşılan pool + limit + breaker)
     openai_api_key = os.environ.get("OPENAI_API_KEY")
     if not openai_api_key:
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
 
-    client = OpenAI(api_key=openai_api_key)
     model = os.environ.get("MODEL_CONTENT", "gpt-4o")
 
     # Token budget check
@@ -134,7 +134,7 @@ async def style_transfer(req: StyleTransferRequest, _=Depends(rate_limit), user=
 
     extract_resp = None
     try:
-        extract_resp = client.chat.completions.create(
+        extract_resp = await llm_gateway.chat("openai",
             model=model,
             messages=[
                 {"role": "system", "content": "Sen bir metin analiz uzmanısın. Sadece JSON döndür."},
@@ -165,7 +165,7 @@ async def style_transfer(req: StyleTransferRequest, _=Depends(rate_limit), user=
 
     transfer_resp = None
     try:
-        transfer_resp = client.chat.completions.create(
+        transfer_resp = await llm_gateway.chat("openai",
             model=model,
             messages=[
                 {"role": "system", "content": "Sen bir sosyal medya ghost writer'ısın. İstenen formatta JSON döndür."},
@@ -219,7 +219,7 @@ async def style_transfer(req: StyleTransferRequest, _=Depends(rate_limit), user=
 
     generation_id = None
     try:
-        gen_result = supabase.table("generations").insert(generation_record).execute()
+        gen_result = await db_execute(supabase.table("generations").insert(generation_record))
         generation_id = gen_result.data[0]["id"] if gen_result.data else None
     except Exception as e:
         logger.error(f"Generation save failed: {e}")
@@ -258,11 +258,10 @@ async def list_transfer_profiles(user=Depends(require_auth), account_id: str = D
     """Kullanıcının stil profillerini listele (style transfer dropdown için)."""
     supabase = _get_supabase()
 
-    profiles = supabase.table("style_profiles") \
-        .select("id, name, style_fingerprint, tweet_count, updated_at") \
-        .eq("user_id", user.id).eq("account_id", account_id) \
-        .order("updated_at", desc=True) \
-        .execute()
+    profiles = await db_execute(supabase.table("style_profiles")
+        .select("id, name, style_fingerprint, tweet_count, updated_at")
+        .eq("user_id", user.id).eq("account_id", account_id)
+        .order("updated_at", desc=True))
 
     HIDDEN_IDS = {"dd1a9608-1441-4b72-bf28-83e11d4c5a60", "f3935ab1-3728-4b79-9fa9-fb895a2b4903"}
     result = []
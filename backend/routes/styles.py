@@ -6,10 +6,13 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
+import asyncio
 import logging
 
 from services.twitter_scraper import scraper
 from services.style_analyzer import analyzer
+from services.db import db_execute
+from services.tweet_collector import replace_source_tweets
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +56,7 @@ async def create_from_handle(request: CreateFromHandleRequest, user=Depends(requ
         raise HTTPException(status_code=400, detail="Kullanıcı adı girin")
     
     # Check if user already has a profile for this handle
-    existing = supabase.table("style_profiles").select("id,name,style_fingerprint").eq("user_id", user.id).eq("account_id", account_id).execute()
+    existing = await db_execute(supabase.table("style_profiles").select("id,name,style_fingerprint").eq("user_id", user.id).eq("account_id", account_id))
     for p in (existing.data or []):
         fp = p.get("style_fingerprint") or {}
         if fp.get("twitter_username", "").lower() == username.lower():
@@ -82,11 +85,11 @@ async def create_from_handle(request: CreateFromHandleRequest, user=Depends(requ
     }
     
     # Check if source already exists
-    existing_source = supabase.table("style_sources").select("id").eq("twitter_username", username).eq("user_id", user.id).eq("account_id", account_id).execute()
+    existing_source = await db_execute(supabase.table("style_sources").select("id").eq("twitter_username", username).eq("user_id", user.id).eq("account_id", account_id))
     if existing_source.data:
         source_id = existing_source.data[0]["id"]
     else:
-        supabase.table("style_sources").insert(source_data).execute()
+        await db_execute(supabase.table("style_sources").insert(source_data))
     
     # 3. Fetch tweets
     logger.info(f"[StyleLab] Fetching tweets for @{username}")
@@ -95,10 +98,7 @@ async def create_from_handle(request: CreateFromHandleRequest, user=Depends(requ
     if not tweets:
         raise HTTPException(status_code=400, detail=f"@{username} için tweet bulunamadı")
     
-    # 4. Save tweets
-    # Delete old tweets for this source first
-    supabase.table("source_tweets").delete().eq("source_id", source_id).execute()
-    
+    # 4. Save tweets (upsert + eskileri sil; mevcut tweet'lerin embedding'leri korunur)
     tweet_records = []
     for tweet in tweets:
         tweet_records.append({
@@ -116,18 +116,13 @@ async def create_from_handle(request: CreateFromHandleRequest, user=Depends(requ
         })
     
     if tweet_records:
-        for i in range(0, len(tweet_records), 50):
-            batch = tweet_records[i:i+50]
-            try:
-                supabase.table("source_tweets").insert(batch).execute()
-            except Exception as e:
-                logger.error(f"Failed to insert tweets batch: {e}")
+        await replace_source_tweets(supabase, source_id, tweet_records)
     
     # Update source tweet count
-    supabase.table("style_sources").update({
+    await db_execute(supabase.table("style_sources").update({
         "tweet_count": len(tweet_records),
         "last_scraped_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", source_id).execute()
+    }).eq("id", source_id))
     
     # 5. Analyze style
     logger.info(f"[StyleLab] Analyzing {len(tweet_records)} tweets")
@@ -164,13 +159,13 @@ async def create_from_handle(request: CreateFromHandleRequest, user=Depends(requ
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    supabase.table("style_profiles").insert(profile_data).execute()
+    await db_execute(supabase.table("style_profiles").insert(profile_data))
     
     # 8. Auto-embed tweets (background, don't fail)
     try:
         from embed_tweets import embed_tweets_for_source_sync
-        embed_tweets_for_source_sync(source_id)
-        logger.info(f"[StyleLab] Tweets embedded for @{username}")
+        embedding_stats = await asyncio.to_thread(embed_tweets_for_source_sync, source_id)
+        logger.info(f"[StyleLab] Tweets embedded for @{username}: {embedding_stats}")
     except Exception as e:
         logger.warning(f"[StyleLab] Auto-embed skipped: {e}")
     
@@ -194,7 +189,7 @@ async def create_from_handle(request: CreateFromHandleRequest, user=Depends(requ
 @router.get("/list", response_model=List[ProfileResponse])
 async def list_profiles(user=Depends(require_auth), supabase=Depends(get_supabase), account_id: str = Depends(get_active_account)):
     """List all style profiles"""
-    result = supabase.table("style_profiles").select("*").eq("user_id", user.id).eq("account_id", account_id).order("created_at", desc=True).execute()
+    result = await db_execute(supabase.table("style_profiles").select("*").eq("user_id", user.id).eq("account_id", account_id).order("created_at", desc=True))
     
     # Hide system profiles
     HIDDEN_PROFILE_IDS = {"dd1a9608-1441-4b72-bf28-83e11d4c5a60", "f3935ab1-3728-4b79-9fa9-fb895a2b4903"}
@@ -229,13 +224,13 @@ async def list_profiles(user=Depends(require_auth), supabase=Depends(get_supabas
 async def create_style_profile(request: CreateProfileRequest, user=Depends(require_auth), supabase=Depends(get_supabase), account_id: str = Depends(get_active_account)):
     """Create a style profile from existing sources (legacy)"""
     for source_id in request.source_ids:
-        check = supabase.table("style_sources").select("id").eq("id", source_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+        check = await db_execute(supabase.table("style_sources").select("id").eq("id", source_id).eq("user_id", user.id).eq("account_id", account_id))
         if not check.data:
             raise HTTPException(status_code=403, detail="Bu kaynak size ait değil")
     
     all_tweets = []
     for source_id in request.source_ids:
-        result = supabase.table("source_tweets").select("*").eq("source_id", source_id).execute()
+        result = await db_execute(supabase.table("source_tweets").select("*").eq("source_id", source_id))
         all_tweets.extend(result.data)
     
     if not all_tweets:
@@ -255,7 +250,7 @@ async def create_style_profile(request: CreateProfileRequest, user=Depends(requi
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    supabase.table("style_profiles").insert(profile_data).execute()
+    await db_execute(supabase.table("style_profiles").insert(profile_data))
     
     fp = fingerprint
     return ProfileResponse(
@@ -275,7 +270,7 @@ async def create_style_profile(request: CreateProfileRequest, user=Depends(requi
 @router.get("/{profile_id}")
 async def get_profile(profile_id: str, user=Depends(require_auth), supabase=Depends(get_supabase), account_id: str = Depends(get_active_account)):
     """Get full profile"""
-    result = supabase.table("style_profiles").select("*").eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    result = await db_execute(supabase.table("style_profiles").select("*").eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Profil bulunamadı")
     return result.data[0]
@@ -284,7 +279,7 @@ async def get_profile(profile_id: str, user=Depends(require_auth), supabase=Depe
 @router.get("/{profile_id}/prompt")
 async def get_style_prompt(profile_id: str, user=Depends(require_auth), supabase=Depends(get_supabase), account_id: str = Depends(get_active_account)):
     """Get the style prompt for generation"""
-    result = supabase.table("style_profiles").select("*").eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    result = await db_execute(supabase.table("style_profiles").select("*").eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Profil bulunamadı")
     
@@ -307,7 +302,7 @@ async def delete_profile(profile_id: str, user=Depends(require_auth), supabase=D
     """Delete a style profile"""
     if profile_id in PROTECTED_PROFILE_IDS:
         raise HTTPException(status_code=403, detail="Bu profil sistem tarafından korunuyor ve silinemez")
-    result = supabase.table("style_profiles").delete().eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    result = await db_execute(supabase.table("style_profiles").delete().eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Profil bulunamadı")
     return {"success": True}
@@ -316,7 +311,7 @@ async def delete_profile(profile_id: str, user=Depends(require_auth), supabase=D
 @router.post("/{profile_id}/refresh")
 async def refresh_style_profile(profile_id: str, user=Depends(require_auth), supabase=Depends(get_supabase), account_id: str = Depends(get_active_account)):
     """Refresh: re-fetch tweets and re-analyze"""
-    result = supabase.table("style_profiles").select("*").eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    result = await db_execute(supabase.table("style_profiles").select("*").eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Profil bulunamadı")
     
@@ -327,7 +322,7 @@ async def refresh_style_profile(profile_id: str, user=Depends(require_auth), sup
     
     if not username and source_ids:
         # Legacy profile: get username from source
-        src = supabase.table("style_sources").select("twitter_username").eq("id", source_ids[0]).execute()
+        src = await db_execute(supabase.table("style_sources").select("twitter_username").eq("id", source_ids[0]))
         if src.data:
             username = src.data[0].get('twitter_username', '')
     
@@ -349,9 +344,6 @@ async def refresh_style_profile(profile_id: str, user=Depends(require_auth), sup
     if tweets:
         source_id = source_ids[0] if source_ids else str(uuid.uuid4())
         
-        # Delete old tweets
-        supabase.table("source_tweets").delete().eq("source_id", source_id).execute()
-        
         tweet_records = []
         for tweet in tweets:
             tweet_records.append({
@@ -368,31 +360,28 @@ async def refresh_style_profile(profile_id: str, user=Depends(require_auth), sup
                 "created_at": datetime.now(timezone.utc).isoformat()
             })
         
-        for i in range(0, len(tweet_records), 50):
-            batch = tweet_records[i:i+50]
-            try:
-                supabase.table("source_tweets").insert(batch).execute()
-            except Exception as e:
-                logger.error(f"Batch insert error: {e}")
+        # Upsert + eskileri sil (mevcut tweet'lerin embedding'leri korunur)
+        await replace_source_tweets(supabase, source_id, tweet_records)
         
         all_tweets = tweet_records
         
-        supabase.table("style_sources").update({
+        await db_execute(supabase.table("style_sources").update({
             "tweet_count": len(tweet_records),
             "last_scraped_at": datetime.now(timezone.utc).isoformat()
-        }).eq("id", source_id).execute()
+        }).eq("id", source_id))
         
         # Auto-embed
         try:
             from embed_tweets import embed_tweets_for_source_sync
-            embed_tweets_for_source_sync(source_id)
+            embedding_stats = await asyncio.to_thread(embed_tweets_for_source_sync, source_id)
+            logger.info(f"[StyleLab] Refresh embeddings for @{username}: {embedding_stats}")
         except Exception as e:
             logger.warning(f"Auto-embed skipped: {e}")
     else:
         errors.append(f"@{username}: tweet çekilemedi")
         # Use existing tweets
         if source_ids:
-            existing = supabase.table("source_tweets").select("*").eq("source_id", source_ids[0]).execute()
+            existing = await db_execute(supabase.table("source_tweets").select("*").eq("source_id", source_ids[0]))
             all_tweets = existing.data or []
     
     if not all_tweets:
@@ -414,12 +403,12 @@ async def refresh_style_profile(profile_id: str, user=Depends(require_auth), sup
         logger.warning(f"AI analysis skipped: {e}")
     
     # Update profile
-    supabase.table("style_profiles").update({
+    await db_execute(supabase.table("style_profiles").update({
         "style_fingerprint": fingerprint,
         "example_tweets": fingerprint.get('example_tweets', []),
         "tweet_count": len(all_tweets),
         "updated_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    }).eq("id", profile_id).eq("user_id", user.id).eq("account_id", account_id))
     
     return {
         "success": True,
@@ -432,11 +421,11 @@ async def refresh_style_profile(profile_id: str, user=Depends(require_auth), sup
 @router.post("/analyze-source/{source_id}")
 async def analyze_source(source_id: str, user=Depends(require_auth), supabase=Depends(get_supabase), account_id: str = Depends(get_active_account)):
     """Analyze a single source (legacy)"""
-    source_check = supabase.table("style_sources").select("id").eq("id", source_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    source_check = await db_execute(supabase.table("style_sources").select("id").eq("id", source_id).eq("user_id", user.id).eq("account_id", account_id))
     if not source_check.data:
         raise HTTPException(status_code=404, detail="Kaynak bulunamadı")
     
-    result = supabase.table("source_tweets").select("*").eq("source_id", source_id).execute()
+    result = await db_execute(supabase.table("source_tweets").select("*").eq("source_id", source_id))
     if not result.data:
         raise HTTPException(status_code=404, detail="Tweet bulunamadı")
     
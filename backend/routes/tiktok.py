@@ -6,6 +6,8 @@ GET /api/meta/tiktok/formats - TikTok formatları
 from fastapi import APIRouter, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.generation_stream import streamable
+from services.single_flight import single_flight
 from pydantic import BaseModel
 from typing import Optional, List
 import logging
@@ -46,6 +48,8 @@ def _lang(lang: str) -> str:
 
 
 @router.post("/generate/tiktok/script", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_tiktok_script(request: TikTokScriptRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """TikTok video scripti üret"""
     try:
@@ -58,7 +62,7 @@ async def generate_tiktok_script(request: TikTokScriptRequest, _=Depends(rate_li
 
         system_prompt = f"{TIKTOK_SYSTEM_PROMPT}\n\n{BANNED_PATTERNS}\n\n{format_prompt}\n\n## DİL\n{_lang(request.language)}\n\n{'## EK BAĞLAM' + chr(10) + request.additional_context if request.additional_context else ''}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "TikTok scriptini üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "TikTok scriptini üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -67,6 +71,8 @@ async def generate_tiktok_script(request: TikTokScriptRequest, _=Depends(rate_li
 
 
 @router.post("/generate/tiktok/caption", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_tiktok_caption(request: TikTokCaptionRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """TikTok caption + hashtag üret"""
     try:
@@ -78,7 +84,7 @@ async def generate_tiktok_caption(request: TikTokCaptionRequest, _=Depends(rate_
 
         system_prompt = f"{TIKTOK_SYSTEM_PROMPT}\n\n{format_prompt}{video_ctx}\n\n## DİL\n{_lang(request.language)}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Caption ve hashtag'leri üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Caption ve hashtag'leri üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
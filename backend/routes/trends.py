@@ -10,11 +10,14 @@ POST /api/trends/{id}/generate - Trend'den içerik üret
 from fastapi import APIRouter, HTTPException, Query, Depends, Header, Request
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.generation_stream import streamable
+from services.single_flight import single_flight
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
 import os
 import logging
+from services.db import db_call, db_execute
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/trends", tags=["trends"])
@@ -152,12 +155,12 @@ async def list_trends(
             cutoff = (datetime.now(timezone.utc) - SINCE_DELTAS[since]).isoformat()
             query = query.gte("created_at", cutoff)
 
-        result = query.execute()
+        result = await db_execute(query)
         trends = result.data or []
         
         # Niche filtering (OR: trend matches ANY user niche keyword)
         if niche_filter:
-            niche_kws = _get_niche_keywords(user.id, sb)
+            niche_kws = await db_call(_get_niche_keywords, user.id, sb)
             if niche_kws:
                 niche_kws_lower = [kw.lower() for kw in niche_kws]
                 def matches_niche(t):
@@ -182,7 +185,7 @@ async def archive_old_trends(user=Depends(require_auth)):
     """48 saatten eski trendleri arşivle."""
     sb = get_supabase()
     cutoff = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat()
-    result = sb.table("trends").update({"is_archived": True}).lt("created_at", cutoff).eq("is_archived", False).execute()
+    result = await db_execute(sb.table("trends").update({"is_archived": True}).lt("created_at", cutoff).eq("is_archived", False))
     count = len(result.data) if result.data else 0
     return {"archived": count, "cutoff": cutoff}
 
@@ -241,7 +244,7 @@ async def get_trend(trend_id: str, user=Depends(require_auth)):
     """Trend detayı."""
     try:
         sb = get_supabase()
-        result = sb.table("trends").select("*").eq("id", trend_id).execute()
+        result = await db_execute(sb.table("trends").select("*").eq("id", trend_id))
         if not result.data:
             raise HTTPException(status_code=404, detail="Trend bulunamadı")
         return result.data[0]
@@ -253,6 +256,8 @@ async def get_trend(trend_id: str, user=Depends(require_auth)):
 
 
 @router.post("/{trend_id}/generate", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_from_trend(trend_id: str, request: TrendGenerateRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """Trend'den içerik üret. raw_content varsa daha zengin context sağlar."""
     try:
@@ -260,7 +265,7 @@ async def generate_from_trend(trend_id: str, request: TrendGenerateRequest, _=De
         from prompts.quality import BANNED_PATTERNS
 
         sb = get_supabase()
-        result = sb.table("trends").select("*").eq("id", trend_id).execute()
+        result = await db_execute(sb.table("trends").select("*").eq("id", trend_id))
         if not result.data:
             raise HTTPException(status_code=404, detail="Trend bulunamadı")
 
@@ -319,7 +324,7 @@ Emoji kullanma. AI template kalıpları kullanma. Doğal ve özgün yaz.
         # Veritabanına kaydet (geçmişte görünsün)
         gen_id = None
         try:
-            gen_result = sb.table("generations").insert({
+            gen_result = await db_execute(sb.table("generations").insert({
                 "type": request.platform,
                 "user_id": user.id,
                 "topic": trend["topic"],
@@ -330,7 +335,7 @@ Emoji kullanma. AI template kalıpları kullanma. Doğal ve özgün yaz.
                 "variant_count": 1,
                 "variants": [v.model_dump(mode="json") for v in variants],
                 "created_at": datetime.now(timezone.utc).isoformat()
-            }).execute()
+            }))
             gen_id = gen_result.data[0]["id"] if gen_result.data else None
         except Exception as save_err:
             logger.warning(f"Trend generation DB save failed (content still returned): {save_err}")
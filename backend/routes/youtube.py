@@ -8,6 +8,8 @@ GET /api/meta/youtube/formats - YouTube formatları
 from fastapi import APIRouter, Depends
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
+from services.generation_stream import streamable
+from services.single_flight import single_flight
 from pydantic import BaseModel
 from typing import Optional, List
 import logging
@@ -63,6 +65,8 @@ def _lang_instruction(lang: str) -> str:
 
 
 @router.post("/generate/youtube/idea", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_youtube_idea(request: YouTubeIdeaRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """YouTube video fikirleri üret"""
     try:
@@ -71,7 +75,7 @@ async def generate_youtube_idea(request: YouTubeIdeaRequest, _=Depends(rate_limi
 
         system_prompt = f"{YOUTUBE_SYSTEM_PROMPT}\n\n{YOUTUBE_FORMAT_PROMPTS['idea']}\n\nFikir sayısı: {request.count}\n\n## DİL\n{_lang_instruction(request.language)}\n\n{'## EK BAĞLAM' + chr(10) + request.additional_context if request.additional_context else ''}\n\n## NİŞ/KONU\n{request.niche}"
 
-        contents = await generate_with_openai(system_prompt, "Video fikirlerini üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Video fikirlerini üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -80,6 +84,8 @@ async def generate_youtube_idea(request: YouTubeIdeaRequest, _=Depends(rate_limi
 
 
 @router.post("/generate/youtube/script", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_youtube_script(request: YouTubeScriptRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """YouTube video scripti üret"""
     try:
@@ -89,7 +95,7 @@ async def generate_youtube_script(request: YouTubeScriptRequest, _=Depends(rate_
 
         system_prompt = f"{YOUTUBE_SYSTEM_PROMPT}\n\n{BANNED_PATTERNS}\n\n{YOUTUBE_FORMAT_PROMPTS['script']}\n\nHedef süre: ~{request.duration_minutes} dakika\nStil: {request.style}\n\n## DİL\n{_lang_instruction(request.language)}\n\n{'## EK BAĞLAM' + chr(10) + request.additional_context if request.additional_context else ''}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Video scriptini yaz.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Video scriptini yaz.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -98,6 +104,8 @@ async def generate_youtube_script(request: YouTubeScriptRequest, _=Depends(rate_
 
 
 @router.post("/generate/youtube/title", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_youtube_title(request: YouTubeTitleRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """YouTube başlıkları üret"""
     try:
@@ -106,7 +114,7 @@ async def generate_youtube_title(request: YouTubeTitleRequest, _=Depends(rate_li
 
         system_prompt = f"{YOUTUBE_SYSTEM_PROMPT}\n\n{YOUTUBE_FORMAT_PROMPTS['title']}\n\nBaşlık sayısı: {request.count}\n\n## DİL\n{_lang_instruction(request.language)}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Başlıkları üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Başlıkları üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -115,6 +123,8 @@ async def generate_youtube_title(request: YouTubeTitleRequest, _=Depends(rate_li
 
 
 @router.post("/generate/youtube/description", response_model=GenerationResponse)
+@streamable
+@single_flight
 async def generate_youtube_description(request: YouTubeDescriptionRequest, _=Depends(rate_limit), user=Depends(require_auth)):
     """YouTube açıklama + taglar üret"""
     try:
@@ -126,7 +136,7 @@ async def generate_youtube_description(request: YouTubeDescriptionRequest, _=Dep
 
         system_prompt = f"{YOUTUBE_SYSTEM_PROMPT}\n\n{YOUTUBE_FORMAT_PROMPTS['description']}{title_ctx}{keyword_ctx}\n\n## DİL\n{_lang_instruction(request.language)}\n\n## KONU\n{request.topic}"
 
-        contents = await generate_with_openai(system_prompt, "Açıklama ve tagları üret.", 1)
+        contents, _ = await generate_with_openai(system_prompt, "Açıklama ve tagları üret.", 1)
         variants = [GeneratedContent(content=contents[0], variant_index=0, character_count=len(contents[0]))]
         return GenerationResponse(success=True, variants=variants)
     except Exception as e:
@@ -12,11 +12,11 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel, Field
-from openai import OpenAI
 
 from middleware.auth import require_auth
 from middleware.rate_limit import rate_limit
 from services.youtube_api import YouTubeAPIService, get_youtube_service
+from services.llm_gateway import llm_gateway
 
 from prompts.youtube_studio.channel_analysis import get_channel_analysis_prompt
 from prompts.youtube_studio.video_analysis import get_video_analysis_prompt
@@ -33,17 +33,16 @@ router = APIRouter(prefix="/youtube-studio", tags=["youtube-studio"])
 
 # ── Helpers ──────────────────────────────────────────────
 
-def _openai():
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
+def _require_openai_key():
+    if not os.getenv("OPENAI_API_KEY"):
         raise HTTPException(500, "OpenAI API key not configured")
-    return OpenAI(api_key=key)
 
 
-def _ai_json(system: str, user: str = "Analiz et.", model: str = "gpt-4o", temperature: float = 0.7) -> dict:
-    """Call OpenAI and parse JSON response."""
-    client = _openai()
-    resp = client.chat.completions.create(
+async def _ai_json(system: str, user: str = "Analiz et.", model: str = "gpt-4o", temperature: float = 0.7) -> dict:
+    """Call OpenAI (via LLM gateway) and parse JSON response."""
+    _require_openai_key()
+    resp = await llm_gateway.chat(
+        "openai",
         model=model,
         temperature=temperature,
         response_format={"type": "json_object"},
@@ -64,10 +63,11 @@ def _ai_json(system: str, user: str = "Analiz et.", model: str = "gpt-4o", tempe
         raise HTTPException(500, "AI yanıtı JSON olarak parse edilemedi")
 
 
-def _ai_vision(image_b64: str, prompt: str) -> dict:
+async def _ai_vision(image_b64: str, prompt: str) -> dict:
     """Call GPT-4o Vision with base64 image."""
-    client = _openai()
-    resp = client.chat.completions.create(
+    _require_openai_key()
+    resp = await llm_gateway.chat(
+        "openai",
         model="gpt-4o",
         temperature=0.7,
         response_format={"type": "json_object"},
@@ -255,7 +255,7 @@ async def channel_analyze(req: ChannelAnalyzeRequest, user=Depends(require_auth)
         metrics = _calc_channel_metrics(channel, videos)
 
         prompt = get_channel_analysis_prompt(channel, videos, metrics, req.language)
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
 
         return {
             "success": True,
@@ -284,7 +284,7 @@ async def video_analyze(req: VideoAnalyzeRequest, user=Depends(require_auth), _r
         metrics = _calc_video_metrics(video)
 
         prompt = get_video_analysis_prompt(video, metrics, req.language)
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
 
         return {
             "success": True,
@@ -317,13 +317,13 @@ async def comments_analyze(req: CommentAnalyzeRequest, user=Depends(require_auth
         for i in range(0, len(comments), batch_size):
             batch = comments[i:i+batch_size]
             prompt = get_comment_categorization_prompt(batch, req.language)
-            result = _ai_json(prompt)
+            result = await _ai_json(prompt)
             cats = result.get("categorized_comments", [])
             all_categorized.extend(cats)
 
         # Summary
         summary_prompt = get_comment_summary_prompt(all_categorized, len(comments), req.language)
-        summary = _ai_json(summary_prompt)
+        summary = await _ai_json(summary_prompt)
 
         return {
             "success": True,
@@ -366,7 +366,7 @@ async def competitor_analyze(req: CompetitorAnalyzeRequest, user=Depends(require
                 competitors.append({"channel": {"title": url, "error": str(e)}, "metrics": {}})
 
         prompt = get_competitor_analysis_prompt(my_ch, my_metrics, competitors, req.language)
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
 
         return {
             "success": True,
@@ -418,7 +418,7 @@ async def thumbnail_analyze(
             raise ValueError("image dosyası veya youtube_url gerekli")
 
         prompt = get_thumbnail_analysis_prompt(language)
-        ai = _ai_vision(image_b64, prompt)
+        ai = await _ai_vision(image_b64, prompt)
 
         result = {
             "success": True,
@@ -455,7 +455,7 @@ async def ideas_generate(req: IdeaGenerateRequest, user=Depends(require_auth), _
             count=req.count, channel_data=channel_data,
             trending_data=trending_data, language=req.language,
         )
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
 
         return {"success": True, **ai}
     except Exception as e:
@@ -471,7 +471,7 @@ async def niche_analyze(req: NicheAnalyzeRequest, user=Depends(require_auth), _r
             req.time_availability, req.target_audience,
             req.content_language, req.language,
         )
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
         return {"success": True, **ai}
     except Exception as e:
         logger.error(f"Niche analyze error: {e}")
@@ -520,7 +520,7 @@ Yanıtını SADECE JSON formatında ver:
     "prediction": "{current_year} için tahmin"
 }}"""
 
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
         return {"success": True, "region": region, **ai}
     except Exception as e:
         logger.error(f"Rising trends error: {e}")
@@ -531,7 +531,7 @@ Yanıtını SADECE JSON formatında ver:
 async def keywords_analyze(req: KeywordAnalyzeRequest, user=Depends(require_auth), _rl=Depends(rate_limit)):
     try:
         prompt = get_keyword_trends_prompt(req.niche, req.keywords, req.language)
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
         return {"success": True, **ai}
     except Exception as e:
         logger.error(f"Keyword analyze error: {e}")
@@ -542,7 +542,7 @@ async def keywords_analyze(req: KeywordAnalyzeRequest, user=Depends(require_auth
 async def translate(req: TranslateRequest, user=Depends(require_auth), _rl=Depends(rate_limit)):
     try:
         prompt = get_transflow_prompt(req.type, req.source_text, req.source_lang, req.target_lang, req.language)
-        ai = _ai_json(prompt)
+        ai = await _ai_json(prompt)
         return {"success": True, **ai}
     except Exception as e:
         logger.error(f"Translate error: {e}")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+DB Concurrency Benchmark — tek uvicorn worker'da sync vs async supabase erişimi
+================================================================================
+Aynı sorguyu iki endpoint'ten çalıştırır:
+  /sync   → async handler içinde direkt `query.execute()` (eski davranış, loop bloklanır)
+  /async  → `await db_execute(query)` (services/db thread pool'u)
+
+Varsayılan olarak PostgREST'i taklit eden lokal bir stub server kullanılır
+(her istek --delay-ms kadar bekler), böylece sonuç ağdan bağımsızdır.
+--real verilirse SUPABASE_URL / SUPABASE_SERVICE_KEY ile gerçek projeye gider.
+
+Kullanım:
+    python scripts/bench_db_concurrency.py                          # stub, 50ms gecikme
+    python scripts/bench_db_concurrency.py --delay-ms 120 --concurrency 1 10 50 100
+    python scripts/bench_db_concurrency.py --real --table generations
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+# Proje root'unu path'e ekle
+SCRIPT_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = SCRIPT_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Stub için JWT formatında sahte key (supabase client key formatını kontrol ediyor)
+STUB_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.c3R1Yg"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_postgrest(delay_ms: float) -> str:
+    """Her isteğe delay_ms sonra `[{"id": 1}]` dönen stub server'ı ayrı thread'de başlat.
+
+    Kendi event loop'unda çalışır, yani gecikme istekler arasında paralel geçer
+    (darboğaz stub değil, ölçülen uygulama olsun).
+    """
+    body = json.dumps([{"id": 1}]).encode()
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+    )
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:  # keep-alive: bağlantı kapanana kadar istekleri sırayla cevapla
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                await asyncio.sleep(delay_ms / 1000)
+                writer.write(response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    port = _free_port()
+    started = threading.Event()
+
+    def serve():
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+            started.set()
+            await server.serve_forever()
+        asyncio.run(run())
+
+    threading.Thread(target=serve, daemon=True).start()
+    started.wait(5)
+    return f"http://127.0.0.1:{port}"
+
+
+def build_app(supabase_url: str, supabase_key: str, table: str):
+    from fastapi import FastAPI
+    from supabase import create_client
+    from services.db import db_execute
+
+    supabase = create_client(supabase_url, supabase_key)
+    app = FastAPI()
+
+    def query():
+        return supabase.table(table).select("id").limit(1)
+
+    @app.get("/sync")
+    async def sync_endpoint():
+        return {"rows": len(query().execute().data)}
+
+    @app.get("/async")
+    async def async_endpoint():
+        result = await db_execute(query())
+        return {"rows": len(result.data)}
+
+    return app
+
+
+def start_uvicorn(app) -> str:
+    import uvicorn
+
+    port = _free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, workers=1, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_level(base_url: str, path: str, concurrency: int, total: int) -> dict:
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one():
+            async with sem:
+                started = time.perf_counter()
+                r = await client.get(path)
+                r.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await one()  # warmup (bağlantı + client init)
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Sync vs async supabase erişimi benchmark'ı")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 25, 50])
+    parser.add_argument("--requests", type=int, default=200, help="Seviye başına toplam istek")
+    parser.add_argument("--delay-ms", type=float, default=50, help="Stub PostgREST gecikmesi")
+    parser.add_argument("--real", action="store_true", help="SUPABASE_URL'deki gerçek projeye git")
+    parser.add_argument("--table", default="generations")
+    args = parser.parse_args()
+
+    if args.real:
+        url = os.environ["SUPABASE_URL"]
+        key = os.environ["SUPABASE_SERVICE_KEY"]
+        target = url
+    else:
+        url, key = start_stub_postgrest(args.delay_ms), STUB_KEY
+        target = f"stub ({args.delay_ms:.0f}ms/query)"
+
+    base_url = start_uvicorn(build_app(url, key, args.table))
+    print(f"Target: {target} | 1 uvicorn worker | {args.requests} requests/level\n")
+    print(f"{'conc':>5} | {'sync rps':>9} {'p50':>8} {'p95':>8} | {'async rps':>9} {'p50':>8} {'p95':>8} | {'speedup':>7}")
+    print("-" * 80)
+
+    for concurrency in args.concurrency:
+        before = await run_level(base_url, "/sync", concurrency, args.requests)
+        after = await run_level(base_url, "/async", concurrency, args.requests)
+        print(
+            f"{concurrency:>5} | "
+            f"{before['rps']:>9.1f} {before['p50']:>6.0f}ms {before['p95']:>6.0f}ms | "
+            f"{after['rps']:>9.1f} {after['p50']:>6.0f}ms {after['p95']:>6.0f}ms | "
+            f"{after['rps'] / before['rps']:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
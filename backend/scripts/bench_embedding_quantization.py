@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Embedding Quantization Benchmark — float32 vs halfvec / halfvec512 / binary (+ float32 rescoring)
+================================================================================================
+Her source için float32 exact top-k'yı ground truth alır ve quantized modların recall@k'sını ölçer:
+  float32     vector(1536)                       6144 B/vektör
+  halfvec     embedding::halfvec(1536)           3072 B
+  halfvec512  subvector(embedding,1,512)::halfvec 1024 B  (text-embedding-3 Matryoshka prefix)
+  binary      binary_quantize(embedding)          192 B   (hamming)
+"rescored" sütunu: quantized sıralamadan --candidates aday alınıp float32 cosine ile yeniden
+sıralanmış sonuç (match_source_tweets_quantized'in yaptığı). "numpy" gecikmesi in-process
+referanstır; --db ile aynı sorgular gerçek RPC'lere de gönderilir (migration 017 gerekli;
+017 sadece seçilen modun index'ini kurar, index'i olmayan modların db p50'si index'siz tam taramadır).
+
+Varsayılan veri sentetiktir (kümelenmiş vektörler, sadece kabaca fikir verir);
+gerçek kararlar için --real ile source_tweets.embedding kullanın.
+Sorgular: aynı source'tan rastgele iki tweet'in ortalaması (corpus'ta birebir bulunmayan "topic").
+
+Kullanım:
+    python scripts/bench_embedding_quantization.py                          # sentetik 200/1000/5000
+    python scripts/bench_embedding_quantization.py --real --sources 5       # en büyük 5 source
+    python scripts/bench_embedding_quantization.py --real --db --source-id <uuid> --k 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Proje root'unu path'e ekle
+SCRIPT_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = SCRIPT_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+MODES = ("float32", "halfvec", "halfvec512", "binary")
+BYTES_PER_VECTOR = {"float32": 1536 * 4, "halfvec": 1536 * 2, "halfvec512": 512 * 2, "binary": 1536 // 8}
+PAGE_SIZE = 1000
+
+
+# ============================================================
+# Data
+# ============================================================
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def synthetic_source(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Kümelenmiş vektörler; ilk boyutlara daha çok enerji (Matryoshka benzeri)."""
+    weights = 1.0 / np.sqrt(1.0 + np.arange(dim) / 256.0)
+    centers = rng.standard_normal((max(1, n // 25), dim))
+    points = centers[rng.integers(0, len(centers), n)] * 0.7 + rng.standard_normal((n, dim)) * 0.5
+    return _normalize(points * weights)
+
+
+def fetch_source_embeddings(client, source_id: str):
+    """Returns (tweet id'leri, normalize float32 matris)."""
+    from services.embedding_store import parse_vector
+
+    ids, vectors, offset = [], [], 0
+    while True:
+        page = client.table("source_tweets") \
+            .select("id, embedding") \
+            .eq("source_id", source_id) \
+            .not_.is_("embedding", "null") \
+            .order("id") \
+            .range(offset, offset + PAGE_SIZE - 1) \
+            .execute().data or []
+        ids.extend(row["id"] for row in page)
+        vectors.extend(parse_vector(row["embedding"]) for row in page)
+        if len(page) < PAGE_SIZE:
+            return ids, _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
+        offset += PAGE_SIZE
+
+
+def make_queries(corpus: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    pairs = rng.integers(0, len(corpus), (count, 2))
+    return _normalize(corpus[pairs[:, 0]] + corpus[pairs[:, 1]])
+
+
+# ============================================================
+# Quantized search (numpy) — migration 017'deki sıralamaların karşılığı
+# ============================================================
+
+def quantize(mode: str, matrix: np.ndarray):
+    if mode == "halfvec":
+        return matrix.astype(np.float16)
+    if mode == "halfvec512":
+        return _normalize(matrix[..., :512]).astype(np.float16)
+    if mode == "binary":
+        return np.packbits(matrix > 0, axis=-1)
+    return matrix
+
+
+def quantized_order(mode: str, stored, query: np.ndarray, limit: int) -> np.ndarray:
+    """En iyi `limit` satırın index'leri (quantized skora göre, sıralı)."""
+    q = quantize(mode, query)
+    if mode == "binary":
+        scores = -np.bitwise_count(stored ^ q).sum(axis=1).astype(np.float32)
+    else:
+        scores = stored.astype(np.float32) @ q.astype(np.float32)
+    limit = min(limit, len(scores))
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    return top[np.argsort(-scores[top])]
+
+
+def rescore(corpus: np.ndarray, candidates: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = corpus[candidates] @ query
+    return candidates[np.argsort(-scores)[:k]]
+
+
+def recall(found, truth) -> float:
+    return len(set(found) & set(truth)) / max(1, len(truth))
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+
+def bench_numpy(corpus: np.ndarray, queries: np.ndarray, k: int, candidates: int):
+    truth = [quantized_order("float32", corpus, q, k) for q in queries]
+    results = {}
+    for mode in MODES:
+        stored = quantize(mode, corpus)
+        plain, rescored, latencies = [], [], []
+        for q, expected in zip(queries, truth):
+            started = time.perf_counter()
+            top = quantized_order(mode, stored, q, max(candidates, k))
+            final = rescore(corpus, top, q, k) if mode != "float32" else top[:k]
+            latencies.append((time.perf_counter() - started) * 1000)
+            plain.append(recall(top[:k], expected))
+            rescored.append(recall(final, expected))
+        results[mode] = {
+            "recall": statistics.mean(plain),
+            "recall_rescored": statistics.mean(rescored),
+            "numpy_p50": statistics.median(latencies),
+        }
+    return results, truth
+
+
+def bench_db(client, source_id: str, ids: list, queries: np.ndarray, truth: list, k: int, candidates: int) -> dict:
+    """Aynı sorgular gerçek RPC'lerle: recall (numpy float32 ground truth'a göre) + gecikme."""
+    results = {}
+    for mode in MODES:
+        found_recall, latencies = [], []
+        for q, expected in zip(queries, truth):
+            params = {"query_embedding": q.tolist()}
+            started = time.perf_counter()
+            if mode == "float32":
+                rows = client.rpc("match_source_tweets", {
+                    **params, "source_id_param": source_id, "match_count": k,
+                }).execute().data or []
+            else:
+                rows = client.rpc("match_source_tweets_quantized", {
+                    **params, "source_ids": [source_id], "match_count": k,
+                    "p_mode": mode, "p_candidates": candidates,
+                }).execute().data or []
+            latencies.append((time.perf_counter() - started) * 1000)
+            found_recall.append(recall([r["id"] for r in rows], [ids[i] for i in expected]))
+        results[mode] = {"db_recall": statistics.mean(found_recall), "db_p50": statistics.median(latencies)}
+    return results
+
+
+def print_table(title: str, n: int, numpy_results: dict, db_results: dict = None):
+    print(f"\n{title} — {n} vectors")
+    header = f"{'mode':>11} | {'B/vec':>6} {'data MB':>8} | {'recall@k':>8} {'rescored':>8} {'numpy p50':>9}"
+    if db_results:
+        header += f" | {'db recall':>9} {'db p50':>8}"
+    print(header)
+    print("-" * len(header))
+    for mode in MODES:
+        r = numpy_results[mode]
+        line = (
+            f"{mode:>11} | {BYTES_PER_VECTOR[mode]:>6} {BYTES_PER_VECTOR[mode] * n / 1024 / 1024:>8.2f} | "
+            f"{r['recall']:>8.3f} {r['recall_rescored']:>8.3f} {r['numpy_p50']:>7.2f}ms"
+        )
+        if db_results:
+            d = db_results[mode]
+            line += f" | {d['db_recall']:>9.3f} {d['db_p50']:>6.0f}ms"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="float32 vs quantized embedding recall/latency benchmark'ı")
+    parser.add_argument("--real", action="store_true", help="source_tweets.embedding kullan (SUPABASE_URL)")
+    parser.add_argument("--db", action="store_true", help="Sorguları gerçek RPC'lere de gönder (--real gerekli)")
+    parser.add_argument("--source-id", action="append", default=[], help="Source id (tekrarlanabilir)")
+    parser.add_argument("--sources", type=int, default=3, help="--source-id yoksa en çok tweet'i olan N source")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000], help="Sentetik source boyutları")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=100, help="Rescoring için quantized aday sayısı")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"k={args.k} | candidates={args.candidates} | {args.queries} queries/source")
+
+    if not args.real:
+        if args.db:
+            parser.error("--db requires --real")
+        for n in args.sizes:
+            corpus = synthetic_source(n, 1536, rng)
+            numpy_results, _ = bench_numpy(corpus, make_queries(corpus, args.queries, rng), args.k, args.candidates)
+            print_table("synthetic", n, numpy_results)
+        return
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv(BACKEND_DIR / ".env")
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"])
+
+    source_ids = args.source_id
+    if not source_ids:
+        result = client.table("style_sources").select("id").order("tweet_count", desc=True).limit(args.sources).execute()
+        source_ids = [row["id"] for row in (result.data or [])]
+
+    for source_id in source_ids:
+        ids, corpus = fetch_source_embeddings(client, source_id)
+        if len(corpus) < args.k:
+            print(f"\nsource {source_id}: {len(corpus)} embedded tweets, skipped")
+            continue
+        queries = make_queries(corpus, args.queries, rng)
+        numpy_results, truth = bench_numpy(corpus, queries, args.k, args.candidates)
+        db_results = bench_db(client, source_id, ids, queries, truth, args.k, args.candidates) if args.db else None
+        print_table(f"source {source_id}", len(corpus), numpy_results, db_results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from supabase import create_client, Client
@@ -6,12 +6,16 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Callable, List, Optional
 import uuid
 import re
+import json
+import time
+import base64
+import asyncio
 import httpx
 from datetime import datetime, timezone, timedelta
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -28,17 +32,63 @@ supabase_url = os.environ['SUPABASE_URL']
 supabase_key = os.environ['SUPABASE_SERVICE_KEY']
 supabase: Client = create_client(supabase_url, supabase_key)
 
-# OpenAI client
+# OpenAI client (paylaşılan connection pool'u LLM gateway yönetir)
+from services.llm_gateway import llm_gateway, CircuitOpenError, LLM_RETRIES
+from services.model_router import V2_CALL_TIMEOUT, model_router
+
 openai_api_key = os.environ.get('OPENAI_API_KEY')
 openai_client = None
+openai_async_client = None
 if openai_api_key:
-    openai_client = OpenAI(api_key=openai_api_key)
+    openai_client = llm_gateway.sync_client("openai")
+    openai_async_client = llm_gateway.async_client("openai")
 
 # Model config (env'den okunur, kod değiştirmeden swap edilebilir)
 MODEL_CONTENT = os.environ.get('MODEL_CONTENT', 'gpt-4o')       # İçerik üretimi (tweet, post, article)
 MODEL_VISION = os.environ.get('MODEL_VISION', 'gpt-4o')         # Görsel analiz
 MODEL_ANALYSIS = os.environ.get('MODEL_ANALYSIS', 'gpt-4o-mini')  # Trend analizi, skorlama
 
+# Multi-variant üretim modu:
+#   per_variant → her variant ayrı chat completion (varsayılan)
+#   n           → tek istek, API'nin `n` parametresi ile N choice
+#   json        → tek istek, {"variants": [{"content": ...}]} JSON listesi (/evolve gibi)
+# Tek-istek modları eksik variant dönerse kalanlar per_variant ile tamamlanır.
+VARIANT_MODES = ("per_variant", "n", "json")
+VARIANT_MODE_DEFAULT = os.environ.get('VARIANT_MODE', 'per_variant')
+# Route bazlı override, ör: VARIANT_MODE_BY_ROUTE='{"tweet": "n", "v2_tweet": "json"}'
+try:
+    VARIANT_MODE_BY_ROUTE = json.loads(os.environ.get('VARIANT_MODE_BY_ROUTE') or '{}')
+    if not isinstance(VARIANT_MODE_BY_ROUTE, dict):
+        raise ValueError("expected a JSON object")
+except ValueError as e:
+    # logger aşağıda tanımlanıyor
+    logging.getLogger(__name__).error(f"Invalid VARIANT_MODE_BY_ROUTE, ignoring route overrides: {e}")
+    VARIANT_MODE_BY_ROUTE = {}
+
+# json modunda tek cevap tüm variant'ları taşır (max_tokens × variant); modelin çıktı limitini aşamaz
+MODEL_MAX_OUTPUT_TOKENS = {
+    "gpt-4o": 16384,
+    "gpt-4o-mini": 16384,
+    "google/gemini-3-flash-preview": 65536,
+    "google/gemini-2.5-flash": 65535,
+    "anthropic/claude-sonnet-4.6": 64000,
+    "anthropic/claude-sonnet-4.5": 64000,
+}
+# Tabloda olmayan modeller için
+MODEL_MAX_OUTPUT_TOKENS_DEFAULT = int(os.environ.get('MODEL_MAX_OUTPUT_TOKENS_DEFAULT', '8192'))
+
+# Style Lab multi-shot ranking:
+#   incremental → variant'lar geldikçe skorlanır, yeterince iyi variant birikince kalanlar iptal edilir
+#   batch       → tüm variant'lar beklenir, sonra StyleRanker.rank
+STYLE_RANKING_MODE = os.environ.get('STYLE_RANKING_MODE', 'incremental')
+STYLE_EARLY_EXIT_SCORE = float(os.environ.get('STYLE_EARLY_EXIT_SCORE', '0.7'))
+
+
+def _resolve_variant_mode(route: str, override: Optional[str] = None) -> str:
+    """Route için variant modunu seç: query override > route config > global default."""
+    mode = override or VARIANT_MODE_BY_ROUTE.get(route) or VARIANT_MODE_DEFAULT
+    return mode if mode in VARIANT_MODES else "per_variant"
+
 # Create the main app
 app = FastAPI(docs_url=None if not os.environ.get("DEBUG") else "/docs", redoc_url=None)
 
@@ -66,17 +116,22 @@ from prompts.builder import (
     REPLY_MODES,
     ARTICLE_STYLES
 )
-from prompts.builder_v3 import build_final_prompt_v3
+from prompts.builder_v3 import build_final_prompt_v3, build_final_prompt_v3_cached
 
 def _select_builder(engine: str = "v3"):
-    """Return the appropriate prompt builder based on engine param."""
+    """Return the appropriate prompt builder based on engine param.
+
+    v3_cached: v3 ile aynı içerik, ama statik bölümler önde (provider prefix cache için).
+    """
     if engine == "v3":
         return build_final_prompt_v3
+    if engine == "v3_cached":
+        return build_final_prompt_v3_cached
     return build_final_prompt
 
 
-async def _get_brand_voice(user_id: str) -> dict:
-    """Fetch brand_voice from user_settings for prompt injection."""
+def _load_brand_voice(user_id: str) -> dict:
+    """Fetch brand_voice from user_settings for prompt injection (blocking)."""
     try:
         result = supabase.table("user_settings").select("brand_voice").eq("user_id", user_id).limit(1).execute()
         if result.data and result.data[0].get("brand_voice"):
@@ -85,12 +140,21 @@ async def _get_brand_voice(user_id: str) -> dict:
         pass
     return None
 
+async def _get_brand_voice(user_id: str) -> dict:
+    """Fetch brand_voice from user_settings for prompt injection."""
+    return await asyncio.to_thread(_load_brand_voice, user_id)
+
 # ==================== AUTH ====================
 from middleware.auth import require_auth, optional_auth
 from middleware.rate_limit import rate_limit
 from middleware.input_sanitizer import sanitize_generation_request
 from middleware.token_tracker import check_token_budget, record_token_usage
 from middleware.active_account import get_active_account
+from services.generation_stream import streamable, is_streaming, emit_token, suppressed_token_stream
+from services.generation_cache import generation_cache
+from services.single_flight import single_flight
+from services.stage_pipeline import Stage, StagePipeline, PipelineRun
+from services.db import db_call, db_execute, shutdown_db_executor
 
 # ==================== MODELS ====================
 
@@ -178,11 +242,11 @@ class GenerationResponse(BaseModel):
 
 async def analyze_image_with_vision(image_base64: str) -> str:
     """Analyze an uploaded image with GPT-4o vision and return a description."""
-    if not openai_client or not image_base64:
+    if not openai_async_client or not image_base64:
         return ""
     
     try:
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.run("openai", MODEL_VISION, lambda: openai_async_client.chat.completions.create(
             model=MODEL_VISION,
             messages=[
                 {
@@ -200,56 +264,239 @@ async def analyze_image_with_vision(image_base64: str) -> str:
                 }
             ],
             max_tokens=200
-        )
+        ))
         return response.choices[0].message.content.strip()
     except Exception as e:
         logger.error(f"Vision analysis error: {str(e)}")
         return ""
 
-async def generate_with_openai(system_prompt: str, user_prompt: str, variants: int = 1, user_id: str = None) -> tuple[List[str], int]:
-    """Generate content using OpenAI API. Returns (results, total_tokens_used)."""
-    if not openai_client:
+def _accumulate_usage(acc: Optional[dict], usage) -> None:
+    """Usage block'taki prompt/cached token sayılarını acc'a ekle (provider prompt caching telemetrisi)."""
+    if acc is None or usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    acc["prompt_tokens"] = acc.get("prompt_tokens", 0) + (getattr(usage, "prompt_tokens", 0) or 0)
+    acc["cached_tokens"] = acc.get("cached_tokens", 0) + ((getattr(details, "cached_tokens", 0) or 0) if details else 0)
+
+
+async def _chat_completion(
+    client,
+    stream_index: Optional[int] = None,
+    usage: Optional[dict] = None,
+    on_text: Optional[Callable[[int], None]] = None,
+    **params,
+) -> tuple[Optional[str], int]:
+    """Tek chat completion çağrısı. Returns (raw_content, total_tokens).
+
+    SSE stream aktifse ve stream_index verildiyse token'lar geldikçe stream'e yollanır.
+    on_text verilirse cevap (SSE olmasa da) stream edilir ve her parçada o ana kadarki
+    karakter sayısıyla çağrılır (uzunluk aşımını cevap bitmeden görmek için).
+    usage verilirse prompt/cached token sayıları ona eklenir.
+    """
+    emit = stream_index is not None and is_streaming()
+    if not emit and on_text is None:
+        response = await client.chat.completions.create(**params)
+        _accumulate_usage(usage, response.usage)
+        return response.choices[0].message.content, (response.usage.total_tokens if response.usage else 0)
+
+    stream = await client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **params)
+    parts = []
+    chars = 0
+    total_tokens = 0
+    async for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if emit:
+                    emit_token(stream_index, delta)
+                if on_text is not None:
+                    chars += len(delta)
+                    on_text(chars)
+        if chunk.usage:
+            total_tokens = chunk.usage.total_tokens
+            _accumulate_usage(usage, chunk.usage)
+    return "".join(parts), total_tokens
+
+async def _generate_variants_single_call(
+    client,
+    mode: str,
+    count: int,
+    system_prompt: str,
+    user_prompt: str,
+    usage: Optional[dict] = None,
+    **params,
+) -> tuple[List[str], int]:
+    """Tüm variant'ları tek istekte üret (mode: "n" veya "json"). Returns (raw_contents, total_tokens).
+
+    Dönen liste `count`'tan kısa olabilir; eksikleri çağıran taraf per-variant tamamlar.
+    """
+    if mode == "n":
+        response = await client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            n=count,
+            **params,
+        )
+        contents = [c.message.content for c in response.choices if c.message.content]
+    else:
+        batch_prompt = (
+            f"{user_prompt}\n\n{count} farklı varyant üret. Aynı konu, aynı ayarlar ama her varyantta farklı bir ifade ve hook kullan. "
+            'Sadece JSON döndür: {"variants": [{"content": "..."}]}'
+        )
+        output_limit = MODEL_MAX_OUTPUT_TOKENS.get(params.get("model"), MODEL_MAX_OUTPUT_TOKENS_DEFAULT)
+        params["max_tokens"] = min(params.get("max_tokens", 1024) * count, output_limit)
+        response = await client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": batch_prompt}
+            ],
+            response_format={"type": "json_object"},
+            **params,
+        )
+        parsed = json.loads(response.choices[0].message.content or "{}")
+        contents = [
+            v.get("content", "") if isinstance(v, dict) else str(v)
+            for v in parsed.get("variants", [])
+        ]
+        contents = [c for c in contents if c]
+
+    _accumulate_usage(usage, response.usage)
+    return contents[:count], (response.usage.total_tokens if response.usage else 0)
+
+
+async def generate_with_openai(
+    system_prompt: str,
+    user_prompt: str,
+    variants: int = 1,
+    user_id: str = None,
+    variant_mode: Optional[str] = None,
+    cache: bool = False,
+    usage: Optional[dict] = None,
+    accept: Optional[Callable[[str], bool]] = None,
+) -> tuple[List[str], int]:
+    """Generate content using OpenAI API. Returns (results, total_tokens_used).
+
+    Variant'lar paralel çalışır (LLM_MAX_CONCURRENCY ile sınırlı), yani N variant ~1 model latency sürer.
+    variant_mode "n"/"json" ise tüm variant'lar tek istekte istenir (bkz. VARIANT_MODES).
+    cache=True ise aynı prompt fingerprint'i için generation_cache'ten döner (tokens_used=0).
+    usage dict verilirse prompt_tokens / cached_tokens (provider prefix cache hit) ile doldurulur.
+    accept verilirse her variant tamamlandıkça (bitiş sırasıyla) çağrılır; True dönerse
+    kalan istekler iptal edilir ve sadece tamamlanan variant'lar döner (early-exit ranking).
+    """
+    if not openai_async_client:
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
 
+    mode = variant_mode if variant_mode in VARIANT_MODES else VARIANT_MODE_DEFAULT
+
+    cache_key = None
+    if cache:
+        cache_key = generation_cache.make_key(
+            user_id, MODEL_CONTENT, system_prompt, user_prompt,
+            [0.8 + (i * 0.05) for i in range(variants)], variants, extra=mode,
+        )
+        cached = generation_cache.get(cache_key)
+        if cached:
+            results, saved_tokens = cached
+            logger.info(f"Generation cache hit: model={MODEL_CONTENT} variants={variants} saved_tokens={saved_tokens}")
+            if accept is not None:
+                for content in results:
+                    accept(content)
+            return results, 0
+
     # Check token budget if user_id provided
     if user_id:
         check_token_budget(user_id)
 
-    results = []
+    started = time.monotonic()
+
+    results: List[str] = []
     total_tokens = 0
 
-    for i in range(variants):
+    if variants > 1 and mode in ("n", "json"):
         try:
-            variant_prompt = user_prompt
-            if variants > 1:
-                variant_prompt += f"\n\nBu {i+1}. varyant. Aynı konu, aynı ton, aynı karakter ama farklı bir ifade ve hook kullan. Önceki varyantlardan farklı kelimeler ve cümle yapıları seç."
+            batch, total_tokens = await llm_gateway.run("openai", MODEL_CONTENT, lambda: _generate_variants_single_call(
+                openai_async_client, mode, variants, system_prompt, user_prompt, usage=usage,
+                model=MODEL_CONTENT, temperature=0.85, max_tokens=3000,
+            ))
+            results = [c.strip() for c in batch]
+        except Exception as e:
+            logger.warning(f"Single-call variant generation failed (mode={mode}), falling back to per-variant: {e}")
+
+    async def _generate_variant(i: int) -> tuple[str, int]:
+        variant_prompt = user_prompt
+        if variants > 1:
+            variant_prompt += f"\n\nBu {i+1}. varyant. Aynı konu, aynı ton, aynı karakter ama farklı bir ifade ve hook kullan. Önceki varyantlardan farklı kelimeler ve cümle yapıları seç."
+
+        raw_content, tokens = await llm_gateway.run("openai", MODEL_CONTENT, lambda: _chat_completion(
+            openai_async_client,
+            stream_index=i,
+            usage=usage,
+            model=MODEL_CONTENT,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": variant_prompt}
+            ],
+            temperature=0.8 + (i * 0.05),
+            max_tokens=3000
+        ), retries=0 if is_streaming() else LLM_RETRIES)  # yarıda kesilen stream tekrarlanmaz
 
-            response = openai_client.chat.completions.create(
-                model=MODEL_CONTENT,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": variant_prompt}
-                ],
-                temperature=0.8 + (i * 0.05),
-                max_tokens=3000
-            )
+        content = raw_content.strip() if raw_content else ""
+        return content, tokens
 
-            raw_content = response.choices[0].message.content
-            content = raw_content.strip() if raw_content else ""
-            results.append(content)
+    batched = len(results)
 
-            # Track token usage
-            if response.usage:
-                total_tokens += response.usage.total_tokens
+    satisfied = False
+    if accept is not None:
+        for content in results:
+            satisfied = accept(content)
+            if satisfied:
+                break
 
-        except Exception as e:
-            logger.error(f"OpenAI API error (internal)")
-            raise HTTPException(status_code=500, detail="AI üretimi başarısız oldu")
+    # Tek-istek modunda eksik kalan (veya per_variant'ta tüm) variant'lar
+    tasks = [] if satisfied else [asyncio.create_task(_generate_variant(i)) for i in range(len(results), variants)]
+    try:
+        if accept is None:
+            outputs = await asyncio.gather(*tasks)
+        else:
+            outputs = []
+            for next_done in asyncio.as_completed(tasks):
+                content, tokens = await next_done
+                outputs.append((content, tokens))
+                if accept(content):
+                    break
+            skipped = len(tasks) - len(outputs)
+            for task in tasks:
+                task.cancel()
+            if skipped:
+                logger.info(f"OpenAI generate: early exit, {skipped}/{variants} variant iptal edildi")
+    except CircuitOpenError as e:
+        for task in tasks:
+            task.cancel()
+        logger.error(f"OpenAI circuit open: {e}")
+        raise HTTPException(status_code=503, detail="AI servisi geçici olarak kullanılamıyor, lütfen biraz sonra tekrar deneyin")
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        logger.error(f"OpenAI API error (internal)")
+        raise HTTPException(status_code=500, detail="AI üretimi başarısız oldu")
+
+    # accept yoksa sıra korunur (gather variant index sırasıyla döner); accept varsa bitiş sırası
+    results += [content for content, _ in outputs]
+    total_tokens += sum(tokens for _, tokens in outputs)
+
+    logger.info(f"OpenAI generate: mode={mode} variants={variants} batched={batched} tokens={total_tokens} cached_tokens={(usage or {}).get('cached_tokens', 0)} elapsed={int((time.monotonic() - started) * 1000)}ms")
 
     # Record token usage
     if user_id and total_tokens > 0:
         record_token_usage(user_id, total_tokens)
 
+    # Early exit ile yarıda kesilen run tam run gibi cache'lenmez
+    if cache_key and len(results) == variants:
+        generation_cache.put(cache_key, results, total_tokens)
+
     return results, total_tokens
 
 # ==================== ROUTES ====================
@@ -283,17 +530,17 @@ async def get_models():
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate, user=Depends(require_auth)):
     status_obj = StatusCheck(client_name=input.client_name)
-    supabase.table("status_checks").insert({
+    await db_execute(supabase.table("status_checks").insert({
         "id": status_obj.id,
         "client_name": status_obj.client_name,
         "timestamp": status_obj.timestamp.isoformat(),
         "user_id": user.id
-    }).execute()
+    }))
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks(user=Depends(require_auth)):
-    result = supabase.table("status_checks").select("*").eq("user_id", user.id).limit(100).execute()
+    result = await db_execute(supabase.table("status_checks").select("*").eq("user_id", user.id).limit(100))
     return result.data
 
 # ==================== METADATA ROUTES ====================
@@ -428,261 +675,212 @@ async def find_similar_tweets(request: SimilarTweetsRequest, user=Depends(requir
     
     # If style_profile_id provided, get source_ids from profile
     if request.style_profile_id and not source_ids:
-        profile = supabase.table("style_profiles").select("source_ids").eq("id", request.style_profile_id).eq("user_id", user.id).execute()
+        profile = await db_execute(supabase.table("style_profiles").select("source_ids").eq("id", request.style_profile_id).eq("user_id", user.id))
         if profile.data:
             source_ids = profile.data[0].get("source_ids", [])
     
     # If still no source_ids, get all user's sources
     if not source_ids:
-        sources = supabase.table("style_sources").select("id").eq("user_id", user.id).execute()
+        sources = await db_execute(supabase.table("style_sources").select("id").eq("user_id", user.id))
         source_ids = [s["id"] for s in (sources.data or [])]
     
     if not source_ids:
         return {"tweets": [], "count": 0}
     
-    tweets = get_similar_tweets(request.query, source_ids, limit=request.limit)
+    # Sync: cache lookup + OpenAI embed + (gerekirse) vector index build → loop dışında
+    tweets = await asyncio.to_thread(get_similar_tweets, request.query, source_ids, limit=request.limit)
     return {"tweets": tweets, "count": len(tweets)}
 
 # ==================== CONTENT GENERATION ROUTES ====================
 
-@api_router.post("/generate/tweet", response_model=GenerationResponse)
-async def generate_tweet(request: TweetGenerateRequest, engine: str = "v3", _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
-    """Generate tweet content"""
-    try:
-        _brand_voice = await _get_brand_voice(user.id)
-        # Input sanitization
-        sanitize_generation_request(request)
-
-        # Analyze image if provided
-        image_context = None
-        if request.image_base64:
-            image_description = await analyze_image_with_vision(request.image_base64)
-            if image_description:
-                image_context = f"Kullanıcı bir görsel ekledi. Görselde: {image_description}. Bu görselle uyumlu, görseli referans alan bir tweet yaz."
-        
-        # Combine additional context with image context
-        combined_context = request.additional_context or ""
-        if image_context:
-            combined_context = f"{combined_context}\n\n{image_context}" if combined_context else image_context
-
-        # ── Style Lab v2 pipeline ──
-        if request.style_profile_id:
-            result = supabase.table("style_profiles").select("*").eq("id", request.style_profile_id).eq("user_id", user.id).execute()
-            if result.data:
-                fingerprint = result.data[0].get('style_fingerprint', {})
-                viral_patterns = result.data[0].get('viral_patterns', {})
-                source_ids = result.data[0].get('source_ids', [])
-
-                # Constraint engine
-                from services.style_constraints import StyleConstraints
-                constraints = StyleConstraints(fingerprint, viral_patterns)
-
-                # Smart RAG (async)
-                reference_tweets = []
-                try:
-                    from services.style_rag import get_style_examples
-                    import openai as _openai
-                    openai_async = _openai.AsyncOpenAI()
-                    reference_tweets = await get_style_examples(
-                        topic=request.topic,
-                        source_id=source_ids[0] if source_ids else None,
-                        supabase_client=supabase,
-                        openai_client=openai_async,
-                        limit=8,
-                        strategy="hybrid"
-                    )
-                    logger.info(f"Style RAG v2: {len(reference_tweets)} referans tweet bulundu")
-                except Exception as e:
-                    logger.warning(f"Style RAG v2 başarısız (devam ediliyor): {e}")
-
-                # Style-enhanced prompt
-                from prompts.style_prompt_v2 import build_style_enhanced_prompt
-                system_prompt = build_style_enhanced_prompt(
-                    content_type="tweet",
-                    topic=request.topic,
-                    style_fingerprint=fingerprint,
-                    viral_patterns=viral_patterns,
-                    constraints=constraints,
-                    reference_tweets=reference_tweets,
-                    persona=request.persona,
-                    tone=request.tone,
-                    knowledge=request.knowledge,
-                    length=request.length,
-                    language=request.language,
-                    additional_context=combined_context if combined_context else None,
-                    is_apex=(request.mode in ["ultra", "apex"]),
-                    image_context=image_context,
-                )
-
-                # Multi-shot: min 5 variant üret
-                gen_count = max(request.variants, 5)
-                contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", gen_count, user_id=user.id)
-
-                # Ranking
-                from services.style_ranker import StyleRanker
-                ranker = StyleRanker()
-                ranked = ranker.rank(contents, fingerprint, constraints, reference_tweets)
-                top = ranker.get_top_variants(ranked, count=max(request.variants, 3))
-
-                variants = []
-                for i, (text, score, breakdown) in enumerate(top):
-                    variants.append(GeneratedContent(content=text, variant_index=i, character_count=len(text)))
-                logger.info(f"Style v2 tweet: {gen_count} üretildi, {len(top)} seçildi (top score: {top[0][1] if top else 0})")
-            else:
-                # Profile bulunamadı, v1'e fallback
-                logger.warning(f"Style profile {request.style_profile_id} bulunamadı, v1 pipeline kullanılıyor")
-                system_prompt = _select_builder(engine)(
-                    content_type="tweet", topic=request.topic, persona=request.persona,
-                    tone=request.tone, knowledge=request.knowledge, length=request.length,
-                    language=request.language, additional_context=combined_context if combined_context else None,
-                    is_apex=(request.mode in ["ultra", "apex"]), platform="twitter"
-                )
-                contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id)
-                variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
-        else:
-            # ── v1 pipeline (style profile yok) ──
-            system_prompt = _select_builder(engine)(
-                content_type="tweet",
-                topic=request.topic,
-                persona=request.persona,
-                tone=request.tone,
-                knowledge=request.knowledge,
-                length=request.length,
-                language=request.language,
-                additional_context=combined_context if combined_context else None,
-                is_apex=(request.mode == "ultra" or request.mode == "apex"),
-                platform="twitter",
-                brand_voice=_brand_voice,
-            )
-            contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id)
-            variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
+# ── Tweet / quote / reply: ortak hazırlık pipeline'ı ──
+# brand_voice, görsel analizi ve style profile birbirinden bağımsız → aynı anda çalışır;
+# RAG referansları profile'a, prompt hepsine bağlı.
+
+def _stage_brand_voice(run: PipelineRun) -> Optional[dict]:
+    return _load_brand_voice(run.ctx["user_id"])
+
+async def _stage_image_context(run: PipelineRun) -> Optional[str]:
+    image_base64 = getattr(run.ctx["request"], "image_base64", None)
+    if not image_base64:
+        return None
+    image_description = await analyze_image_with_vision(image_base64)
+    if not image_description:
+        return None
+    return f"Kullanıcı bir görsel ekledi. Görselde: {image_description}. Bu görselle uyumlu, görseli referans alan bir tweet yaz."
+
+def _stage_style_profile(run: PipelineRun) -> Optional[dict]:
+    request = run.ctx["request"]
+    if not request.style_profile_id:
+        return None
+    result = supabase.table("style_profiles").select("*").eq("id", request.style_profile_id).eq("user_id", run.ctx["user_id"]).execute()
+    if not result.data:
+        # Profile bulunamadı, v1'e fallback
+        logger.warning(f"Style profile {request.style_profile_id} bulunamadı, v1 pipeline kullanılıyor")
+        return None
+    return result.data[0]
+
+async def _stage_reference_tweets(run: PipelineRun) -> list:
+    profile = run["style_profile"]
+    if not profile:
+        return []
+    from services.style_rag import get_style_examples
+    source_ids = profile.get('source_ids', [])
+    reference_tweets = await get_style_examples(
+        topic=run.ctx["style_topic"],
+        source_id=source_ids[0] if source_ids else None,
+        supabase_client=supabase,
+        openai_client=openai_async_client,
+        limit=8,
+        strategy="hybrid"
+    )
+    logger.info(f"Style RAG v2 ({run.ctx['content_type']}): {len(reference_tweets)} referans tweet bulundu")
+    return reference_tweets
 
-        # Log to database
-        gen_result = supabase.table("generations").insert({
-            "type": "tweet",
-            "user_id": user.id,
-            "account_id": account_id,
-            "topic": request.topic,
-            "mode": request.mode,
-            "length": request.length,
-            "persona": request.persona,
-            "tone": request.tone,
-            "knowledge": request.knowledge,
-            "language": request.language,
-            "additional_context": request.additional_context,
-            "is_ultra": request.mode in ["ultra", "apex"],
-            "variant_count": request.variants,
-            "variants": [v.model_dump(mode="json") for v in variants],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
-        gen_id = gen_result.data[0]["id"] if gen_result.data else None
+def _stage_prompt(run: PipelineRun) -> dict:
+    """System prompt'u kur. Returns {"system_prompt", "style": (fingerprint, constraints, reference_tweets) | None}."""
+    content_type = run.ctx["content_type"]
+    request = run.ctx["request"]
+    image_context = run["image_context"]
 
-        return GenerationResponse(success=True, variants=variants, generation_id=gen_id)
+    context = request.additional_context or ""
+    if content_type == "tweet":
+        if image_context:
+            context = f"{context}\n\n{image_context}" if context else image_context
+        is_apex = request.mode in ["ultra", "apex"]
+    else:
+        # Direction varsa additional_context'e ekle
+        if request.direction:
+            direction_text = f"\n\nKullanıcının yönlendirmesi: {request.direction}"
+            context = f"{context}{direction_text}" if context else request.direction
+        is_apex = False
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Tweet generation error: {str(e)}")
-        return GenerationResponse(success=False, variants=[], error="Bir hata oluştu. Lütfen tekrar deneyin.")
+    type_kwargs = {}
+    if content_type == "tweet":
+        type_kwargs["topic"] = request.topic
+    else:
+        type_kwargs["original_tweet"] = request.tweet_content
+    if content_type == "reply":
+        type_kwargs["reply_mode"] = request.reply_mode
+
+    common = dict(
+        persona=request.persona,
+        tone=request.tone,
+        knowledge=request.knowledge,
+        length=request.length,
+        language=request.language,
+        additional_context=context if context else None,
+        is_apex=is_apex,
+    )
 
-@api_router.post("/generate/quote", response_model=GenerationResponse)
-async def generate_quote(request: QuoteGenerateRequest, engine: str = "v3", _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
-    """Generate quote tweet content"""
+    profile = run["style_profile"]
+    if profile:
+        # ── Style Lab v2 ──
+        from services.style_constraints import StyleConstraints
+        from prompts.style_prompt_v2 import build_style_enhanced_prompt
+        fingerprint = profile.get('style_fingerprint', {})
+        viral_patterns = profile.get('viral_patterns', {})
+        constraints = StyleConstraints(fingerprint, viral_patterns)
+        reference_tweets = run["reference_tweets"]
+        style_kwargs = dict(type_kwargs, topic=run.ctx["style_topic"])
+        if content_type == "tweet":
+            style_kwargs["image_context"] = image_context
+        system_prompt = build_style_enhanced_prompt(
+            content_type=content_type,
+            style_fingerprint=fingerprint,
+            viral_patterns=viral_patterns,
+            constraints=constraints,
+            reference_tweets=reference_tweets,
+            **style_kwargs,
+            **common,
+        )
+        return {"system_prompt": system_prompt, "style": (fingerprint, constraints, reference_tweets)}
+
+    # ── v1 pipeline ──
+    # Style profile istenip bulunamadıysa (fallback) brand_voice eklenmez — eski davranış
+    v1_kwargs = {} if request.style_profile_id else {"brand_voice": run["brand_voice"]}
+    system_prompt = _select_builder(run.ctx["engine"])(
+        content_type=content_type,
+        platform="twitter",
+        **v1_kwargs,
+        **type_kwargs,
+        **common,
+    )
+    return {"system_prompt": system_prompt, "style": None}
+
+_TWITTER_PREP_PIPELINE = StagePipeline([
+    Stage("brand_voice", _stage_brand_voice),
+    Stage("image_context", _stage_image_context),
+    Stage("style_profile", _stage_style_profile),
+    Stage("reference_tweets", _stage_reference_tweets, deps=("style_profile",), optional=True, default=[]),
+    Stage("prompt", _stage_prompt, deps=("brand_voice", "image_context", "style_profile", "reference_tweets")),
+])
+
+
+async def _generate_twitter_content(
+    content_type: str,
+    request,
+    engine: str,
+    variant_mode: Optional[str],
+    regenerate: bool,
+    user,
+    account_id: str,
+) -> GenerationResponse:
+    """generate_tweet / generate_quote / generate_reply ortak gövdesi."""
     try:
-        _brand_voice = await _get_brand_voice(user.id)
+        gen_usage = {}
         sanitize_generation_request(request)
 
-        if not request.tweet_content:
+        if content_type != "tweet" and not request.tweet_content:
             return GenerationResponse(
                 success=False,
                 variants=[],
                 error="Tweet içeriği gerekli. Lütfen tweet'i çekin."
             )
 
-        # Direction varsa additional_context'e ekle
-        quote_context = request.additional_context or ""
-        if request.direction:
-            direction_text = f"\n\nKullanıcının yönlendirmesi: {request.direction}"
-            quote_context = f"{quote_context}{direction_text}" if quote_context else request.direction
-
-        # ── Style Lab v2 pipeline (quote) ──
-        if request.style_profile_id:
-            result = supabase.table("style_profiles").select("*").eq("id", request.style_profile_id).eq("user_id", user.id).execute()
-            if result.data:
-                fingerprint = result.data[0].get('style_fingerprint', {})
-                viral_patterns = result.data[0].get('viral_patterns', {})
-                source_ids = result.data[0].get('source_ids', [])
-
-                from services.style_constraints import StyleConstraints
-                constraints = StyleConstraints(fingerprint, viral_patterns)
-
-                reference_tweets = []
-                try:
-                    from services.style_rag import get_style_examples
-                    import openai as _openai
-                    openai_async = _openai.AsyncOpenAI()
-                    reference_tweets = await get_style_examples(
-                        topic=request.tweet_content or "",
-                        source_id=source_ids[0] if source_ids else None,
-                        supabase_client=supabase, openai_client=openai_async,
-                        limit=8, strategy="hybrid"
-                    )
-                except Exception as e:
-                    logger.warning(f"Style RAG v2 (quote) başarısız: {e}")
-
-                from prompts.style_prompt_v2 import build_style_enhanced_prompt
-                system_prompt = build_style_enhanced_prompt(
-                    content_type="quote",
-                    topic=request.tweet_content or "",
-                    style_fingerprint=fingerprint,
-                    viral_patterns=viral_patterns,
-                    constraints=constraints,
-                    reference_tweets=reference_tweets,
-                    persona=request.persona, tone=request.tone,
-                    knowledge=request.knowledge, length=request.length,
-                    language=request.language,
-                    original_tweet=request.tweet_content,
-                    additional_context=quote_context if quote_context else None,
-                    is_apex=False,
-                )
-
-                gen_count = max(request.variants, 5)
-                contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", gen_count, user_id=user.id)
-
-                from services.style_ranker import StyleRanker
-                ranker = StyleRanker()
-                ranked = ranker.rank(contents, fingerprint, constraints, reference_tweets)
-                top = ranker.get_top_variants(ranked, count=max(request.variants, 3))
-                variants = [GeneratedContent(content=text, variant_index=i, character_count=len(text)) for i, (text, score, breakdown) in enumerate(top)]
-                logger.info(f"Style v2 quote: {gen_count} üretildi, {len(top)} seçildi")
-            else:
-                system_prompt = _select_builder(engine)(
-                    content_type="quote", persona=request.persona, tone=request.tone,
-                    knowledge=request.knowledge, length=request.length, language=request.language,
-                    original_tweet=request.tweet_content, additional_context=quote_context if quote_context else None, platform="twitter"
-                )
-                contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id)
-                variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
+        prep = await _TWITTER_PREP_PIPELINE.run({
+            "content_type": content_type,
+            "request": request,
+            "engine": engine,
+            "user_id": user.id,
+            "style_topic": request.topic if content_type == "tweet" else (request.tweet_content or ""),
+        })
+        logger.info(f"Generate {content_type} prep: {prep.timings_str()}")
+        system_prompt = prep["prompt"]["system_prompt"]
+        style = prep["prompt"]["style"]
+        resolved_mode = _resolve_variant_mode(content_type, variant_mode)
+
+        if style:
+            fingerprint, constraints, reference_tweets = style
+            # Multi-shot: en fazla max(variants, 5) variant üret, en iyi max(variants, 3) döner
+            gen_count = max(request.variants, 5)
+            top_count = max(request.variants, 3)
+            from services.style_ranker import StyleRanker
+            ranker = StyleRanker()
+
+            # Aday variant'lar elenip yeniden index'lenir → token stream'i yok, stream'de sadece `done`
+            with suppressed_token_stream():
+                if STYLE_RANKING_MODE == "incremental":
+                    # Döndürülecek top_count variant threshold'u geçince kalan istekler iptal
+                    ranking = ranker.incremental(fingerprint, constraints, reference_tweets, needed=top_count, threshold=STYLE_EARLY_EXIT_SCORE)
+                    contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", gen_count, user_id=user.id, variant_mode=resolved_mode, cache=not regenerate, usage=gen_usage, accept=ranking.add)
+                    ranked = ranking.ranked()
+                else:
+                    contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", gen_count, user_id=user.id, variant_mode=resolved_mode, cache=not regenerate, usage=gen_usage)
+                    ranked = ranker.rank(contents, fingerprint, constraints, reference_tweets)
+
+            top = ranker.get_top_variants(ranked, count=top_count)
+            variants = [GeneratedContent(content=text, variant_index=i, character_count=len(text)) for i, (text, score, breakdown) in enumerate(top)]
+            logger.info(f"Style v2 {content_type}: {len(contents)}/{gen_count} üretildi, {len(top)} seçildi (top score: {top[0][1] if top else 0})")
         else:
-            # ── v1 pipeline ──
-            system_prompt = _select_builder(engine)(
-                content_type="quote",
-                persona=request.persona, tone=request.tone,
-                knowledge=request.knowledge, length=request.length,
-                language=request.language, original_tweet=request.tweet_content,
-                additional_context=quote_context if quote_context else None,
-                platform="twitter",
-                brand_voice=_brand_voice,
-            )
-            contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id)
+            contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id, variant_mode=resolved_mode, cache=not regenerate, usage=gen_usage)
             variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
 
-        gen_result = supabase.table("generations").insert({
-            "type": "quote",
+        # Log to database
+        row = {
+            "type": content_type,
             "user_id": user.id,
             "account_id": account_id,
-            "tweet_url": request.tweet_url,
-            "tweet_content": request.tweet_content,
             "length": request.length,
             "persona": request.persona,
             "tone": request.tone,
@@ -691,8 +889,18 @@ async def generate_quote(request: QuoteGenerateRequest, engine: str = "v3", _=De
             "additional_context": request.additional_context,
             "variant_count": request.variants,
             "variants": [v.model_dump(mode="json") for v in variants],
+            "tokens_used": tokens_used,
+            "cached_tokens": gen_usage.get("cached_tokens", 0),
+            "prompt_engine": engine,
             "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
+        }
+        if content_type == "tweet":
+            row.update({"topic": request.topic, "mode": request.mode, "is_ultra": request.mode in ["ultra", "apex"]})
+        else:
+            row.update({"tweet_url": request.tweet_url, "tweet_content": request.tweet_content})
+        if content_type == "reply":
+            row["reply_mode"] = request.reply_mode
+        gen_result = await db_execute(supabase.table("generations").insert(row))
         gen_id = gen_result.data[0]["id"] if gen_result.data else None
 
         return GenerationResponse(success=True, variants=variants, generation_id=gen_id)
@@ -700,135 +908,38 @@ async def generate_quote(request: QuoteGenerateRequest, engine: str = "v3", _=De
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Quote generation error: {str(e)}")
+        logger.error(f"{content_type.capitalize()} generation error: {str(e)}")
         return GenerationResponse(success=False, variants=[], error="Bir hata oluştu. Lütfen tekrar deneyin.")
 
-@api_router.post("/generate/reply", response_model=GenerationResponse)
-async def generate_reply(request: ReplyGenerateRequest, engine: str = "v3", _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
-    """Generate reply content"""
-    try:
-        _brand_voice = await _get_brand_voice(user.id)
-        sanitize_generation_request(request)
-
-        if not request.tweet_content:
-            return GenerationResponse(
-                success=False,
-                variants=[],
-                error="Tweet içeriği gerekli. Lütfen tweet'i çekin."
-            )
-
-        # Direction varsa additional_context'e ekle
-        reply_context = request.additional_context or ""
-        if request.direction:
-            direction_text = f"\n\nKullanıcının yönlendirmesi: {request.direction}"
-            reply_context = f"{reply_context}{direction_text}" if reply_context else request.direction
-
-        # ── Style Lab v2 pipeline (reply) ──
-        if request.style_profile_id:
-            result = supabase.table("style_profiles").select("*").eq("id", request.style_profile_id).eq("user_id", user.id).execute()
-            if result.data:
-                fingerprint = result.data[0].get('style_fingerprint', {})
-                viral_patterns = result.data[0].get('viral_patterns', {})
-                source_ids = result.data[0].get('source_ids', [])
-
-                from services.style_constraints import StyleConstraints
-                constraints = StyleConstraints(fingerprint, viral_patterns)
-
-                reference_tweets = []
-                try:
-                    from services.style_rag import get_style_examples
-                    import openai as _openai
-                    openai_async = _openai.AsyncOpenAI()
-                    reference_tweets = await get_style_examples(
-                        topic=request.tweet_content or "",
-                        source_id=source_ids[0] if source_ids else None,
-                        supabase_client=supabase, openai_client=openai_async,
-                        limit=8, strategy="hybrid"
-                    )
-                except Exception as e:
-                    logger.warning(f"Style RAG v2 (reply) başarısız: {e}")
-
-                from prompts.style_prompt_v2 import build_style_enhanced_prompt
-                system_prompt = build_style_enhanced_prompt(
-                    content_type="reply",
-                    topic=request.tweet_content or "",
-                    style_fingerprint=fingerprint,
-                    viral_patterns=viral_patterns,
-                    constraints=constraints,
-                    reference_tweets=reference_tweets,
-                    persona=request.persona, tone=request.tone,
-                    knowledge=request.knowledge, length=request.length,
-                    language=request.language,
-                    original_tweet=request.tweet_content,
-                    reply_mode=request.reply_mode,
-                    additional_context=reply_context if reply_context else None,
-                    is_apex=False,
-                )
-
-                gen_count = max(request.variants, 5)
-                contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", gen_count, user_id=user.id)
-
-                from services.style_ranker import StyleRanker
-                ranker = StyleRanker()
-                ranked = ranker.rank(contents, fingerprint, constraints, reference_tweets)
-                top = ranker.get_top_variants(ranked, count=max(request.variants, 3))
-                variants = [GeneratedContent(content=text, variant_index=i, character_count=len(text)) for i, (text, score, breakdown) in enumerate(top)]
-                logger.info(f"Style v2 reply: {gen_count} üretildi, {len(top)} seçildi")
-            else:
-                system_prompt = _select_builder(engine)(
-                    content_type="reply", persona=request.persona, tone=request.tone,
-                    knowledge=request.knowledge, length=request.length, language=request.language,
-                    original_tweet=request.tweet_content, reply_mode=request.reply_mode,
-                    additional_context=reply_context if reply_context else None, platform="twitter"
-                )
-                contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id)
-                variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
-        else:
-            # ── v1 pipeline ──
-            system_prompt = _select_builder(engine)(
-                content_type="reply",
-                persona=request.persona, tone=request.tone,
-                knowledge=request.knowledge, length=request.length,
-                language=request.language, original_tweet=request.tweet_content,
-                reply_mode=request.reply_mode,
-                additional_context=reply_context if reply_context else None,
-                platform="twitter",
-                brand_voice=_brand_voice,
-            )
-            contents, tokens_used = await generate_with_openai(system_prompt, "İçeriği üret.", request.variants, user_id=user.id)
-            variants = [GeneratedContent(content=c, variant_index=i, character_count=len(c)) for i, c in enumerate(contents)]
 
-        gen_result = supabase.table("generations").insert({
-            "type": "reply",
-            "user_id": user.id,
-            "account_id": account_id,
-            "tweet_url": request.tweet_url,
-            "tweet_content": request.tweet_content,
-            "reply_mode": request.reply_mode,
-            "length": request.length,
-            "persona": request.persona,
-            "tone": request.tone,
-            "knowledge": request.knowledge,
-            "language": request.language,
-            "additional_context": request.additional_context,
-            "variant_count": request.variants,
-            "variants": [v.model_dump(mode="json") for v in variants],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
-        gen_id = gen_result.data[0]["id"] if gen_result.data else None
+@api_router.post("/generate/tweet", response_model=GenerationResponse)
+@streamable
+@single_flight
+async def generate_tweet(request: TweetGenerateRequest, engine: str = "v3", variant_mode: Optional[str] = None, regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+    """Generate tweet content"""
+    return await _generate_twitter_content("tweet", request, engine, variant_mode, regenerate, user, account_id)
 
-        return GenerationResponse(success=True, variants=variants, generation_id=gen_id)
+@api_router.post("/generate/quote", response_model=GenerationResponse)
+@streamable
+@single_flight
+async def generate_quote(request: QuoteGenerateRequest, engine: str = "v3", variant_mode: Optional[str] = None, regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+    """Generate quote tweet content"""
+    return await _generate_twitter_content("quote", request, engine, variant_mode, regenerate, user, account_id)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Reply generation error: {str(e)}")
-        return GenerationResponse(success=False, variants=[], error="Bir hata oluştu. Lütfen tekrar deneyin.")
+@api_router.post("/generate/reply", response_model=GenerationResponse)
+@streamable
+@single_flight
+async def generate_reply(request: ReplyGenerateRequest, engine: str = "v3", variant_mode: Optional[str] = None, regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+    """Generate reply content"""
+    return await _generate_twitter_content("reply", request, engine, variant_mode, regenerate, user, account_id)
 
 @api_router.post("/generate/article", response_model=GenerationResponse)
-async def generate_article(request: ArticleGenerateRequest, engine: str = "v3", _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+@streamable
+@single_flight
+async def generate_article(request: ArticleGenerateRequest, engine: str = "v3", regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Generate X article content"""
     try:
+        gen_usage = {}
         _brand_voice = await _get_brand_voice(user.id)
         sanitize_generation_request(request)
 
@@ -849,7 +960,7 @@ async def generate_article(request: ArticleGenerateRequest, engine: str = "v3",
             platform="twitter"
         )
 
-        contents, tokens_used = await generate_with_openai(system_prompt, "Makaleyi yaz.", 1, user_id=user.id)
+        contents, tokens_used = await generate_with_openai(system_prompt, "Makaleyi yaz.", 1, user_id=user.id, cache=not regenerate, usage=gen_usage)
 
         variants = []
         for i, content in enumerate(contents):
@@ -859,7 +970,7 @@ async def generate_article(request: ArticleGenerateRequest, engine: str = "v3",
                 character_count=len(content)
             ))
 
-        gen_result = supabase.table("generations").insert({
+        gen_result = await db_execute(supabase.table("generations").insert({
             "type": "article",
             "user_id": user.id,
             "account_id": account_id,
@@ -872,8 +983,11 @@ async def generate_article(request: ArticleGenerateRequest, engine: str = "v3",
             "additional_context": request.additional_context,
             "variant_count": 1,
             "variants": [v.model_dump(mode="json") for v in variants],
+            "tokens_used": tokens_used,
+            "cached_tokens": gen_usage.get("cached_tokens", 0),
+            "prompt_engine": engine,
             "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
+        }))
         gen_id = gen_result.data[0]["id"] if gen_result.data else None
 
         return GenerationResponse(success=True, variants=variants, generation_id=gen_id)
@@ -884,28 +998,85 @@ async def generate_article(request: ArticleGenerateRequest, engine: str = "v3",
         logger.error(f"Article generation error: {str(e)}")
         return GenerationResponse(success=False, variants=[], error="Bir hata oluştu. Lütfen tekrar deneyin.")
 
-@api_router.get("/generations/calendar")
-async def get_generation_calendar(year: int = None, month: int = None, user=Depends(require_auth), account_id: str = Depends(get_active_account)):
-    """Get generation counts grouped by day for calendar view"""
+# Streak için geriye bakılan gün sayısı (ay sınırından bağımsız)
+STREAK_LOOKBACK_DAYS = 366
+
+
+def _month_bounds(y: int, m: int) -> tuple:
+    start = f"{y:04d}-{m:02d}-01"
+    end = f"{y + 1:04d}-01-01" if m == 12 else f"{y:04d}-{m + 1:02d}-01"
+    return start, end
+
+
+def _compute_streak(active_days: set, today) -> int:
+    """Bugünden geriye kesintisiz aktif gün sayısı (bugün boşsa dünden başlar)."""
+    from datetime import timedelta
+    streak = 0
+    check_date = today
+    while True:
+        if check_date.isoformat() in active_days:
+            streak += 1
+            check_date = check_date - timedelta(days=1)
+        else:
+            # If today has no generations, check if yesterday started a streak
+            if check_date == today and streak == 0:
+                check_date = check_date - timedelta(days=1)
+                continue
+            break
+    return streak
+
+
+async def _calendar_from_rollups(user_id: str, account_id: Optional[str], y: int, m: int) -> dict:
+    """generation_daily_rollups'tan (migration 012) calendar: ay + streak, O(gün) satır."""
+    from datetime import timedelta
+    today = datetime.now(timezone.utc).date()
+    start, end = _month_bounds(y, m)
+
+    month_q = (supabase.table("generation_daily_rollups")
+        .select("day, total, type_counts, previews")
+        .eq("user_id", user_id).eq("account_id", account_id)
+        .gte("day", start)
+        .lt("day", end))
+    streak_q = (supabase.table("generation_daily_rollups")
+        .select("day")
+        .eq("user_id", user_id).eq("account_id", account_id)
+        .gt("total", 0)
+        .gte("day", (today - timedelta(days=STREAK_LOOKBACK_DAYS)).isoformat())
+        .order("day", desc=True))
+    month_res, streak_res = await asyncio.gather(db_execute(month_q), db_execute(streak_q))
+
+    days = {}
+    for row in (month_res.data or []):
+        if row["total"] <= 0:
+            continue
+        days[row["day"]] = {
+            "count": row["total"],
+            "types": row.get("type_counts") or {},
+            "generations": row.get("previews") or [],
+        }
+
+    active_days = {row["day"] for row in (streak_res.data or [])}
+    return {
+        "year": y,
+        "month": m,
+        "days": days,
+        "streak": _compute_streak(active_days, today),
+        "total_this_month": sum(d["count"] for d in days.values())
+    }
+
+
+async def _calendar_from_generations(user_id: str, account_id: Optional[str], y: int, m: int) -> dict:
+    """Eski yol: ayın tüm generation'larını çekip Python'da grupla (rollup tablosu yoksa)."""
     from datetime import date
     today = date.today()
-    y = year or today.year
-    m = month or today.month
-
-    # Build date range for the month
-    start = f"{y:04d}-{m:02d}-01T00:00:00+00:00"
-    if m == 12:
-        end = f"{y + 1:04d}-01-01T00:00:00+00:00"
-    else:
-        end = f"{y:04d}-{m + 1:02d}-01T00:00:00+00:00"
+    start, end = _month_bounds(y, m)
 
-    result = supabase.table("generations") \
-        .select("id, type, topic, created_at, variants") \
-        .eq("user_id", user.id).eq("account_id", account_id) \
-        .gte("created_at", start) \
-        .lt("created_at", end) \
-        .order("created_at", desc=True) \
-        .execute()
+    result = await db_execute(supabase.table("generations")
+        .select("id, type, topic, created_at, variants")
+        .eq("user_id", user_id).eq("account_id", account_id)
+        .gte("created_at", f"{start}T00:00:00+00:00")
+        .lt("created_at", f"{end}T00:00:00+00:00")
+        .order("created_at", desc=True))
 
     # Group by day
     days = {}
@@ -933,140 +1104,253 @@ async def get_generation_calendar(year: int = None, month: int = None, user=Depe
                 preview["content"] = first[:150]
         days[day]["generations"].append(preview)
 
-    # Calculate streak
-    streak = 0
-    check_date = today
-    while True:
-        ds = check_date.isoformat()
-        if ds in days and days[ds]["count"] > 0:
-            streak += 1
-            check_date = check_date - __import__('datetime').timedelta(days=1)
-        else:
-            # If today has no generations, check if yesterday started a streak
-            if check_date == today and streak == 0:
-                check_date = check_date - __import__('datetime').timedelta(days=1)
-                continue
-            break
-
     return {
         "year": y,
         "month": m,
         "days": days,
-        "streak": streak,
+        "streak": _compute_streak({d for d, v in days.items() if v["count"] > 0}, today),
         "total_this_month": sum(d["count"] for d in days.values())
     }
 
+
+@api_router.get("/generations/calendar")
+async def get_generation_calendar(year: int = None, month: int = None, user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+    """Get generation counts grouped by day for calendar view"""
+    today = datetime.now(timezone.utc).date()
+    y = year or today.year
+    m = month or today.month
+    try:
+        return await _calendar_from_rollups(user.id, account_id, y, m)
+    except Exception as e:
+        logger.warning(f"Calendar rollups unavailable, falling back to generations scan: {e}")
+        return await _calendar_from_generations(user.id, account_id, y, m)
+
+# History listesi için hafif projeksiyon: variant gövdeleri yok, sadece ilk variant'tan önizleme.
+# Tam satır satır açılınca GET /generations/{id} ile çekilir.
+HISTORY_LIGHT_COLUMNS = (
+    "id, type, topic, title, mode, persona, tone, language, variant_count, "
+    "tweet_url, account_id, created_at, preview:variants->0->>content"
+)
+HISTORY_MAX_LIMIT = 100
+
+
+def _encode_history_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, gen_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Değerler PostgREST or_() filtresine string olarak girer → formatları zorunlu
+        datetime.fromisoformat(created_at)
+        uuid.UUID(gen_id)
+        return created_at, gen_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+
+
+async def _generation_counts_by_account(user_id: str, account_ids: list, content_type: Optional[str]) -> dict:
+    """Hesap başına generation sayıları — tek grouped RPC (migration 010)."""
+    try:
+        res = await db_execute(supabase.rpc("generation_counts_by_account", {
+            "p_user_id": user_id,
+            "p_account_ids": account_ids,
+            "p_type": content_type,
+        }))
+        counts = {acc_id: 0 for acc_id in account_ids}
+        for row in (res.data or []):
+            counts[row["account_id"]] = row["total"]
+        return counts
+    except Exception as e:
+        # Migration 010 henüz uygulanmadıysa eski yol (hesap başına count)
+        logger.warning(f"generation_counts_by_account RPC failed, falling back to per-account counts: {e}")
+        counts = {}
+        for acc_id in account_ids:
+            cnt_q = supabase.table("generations").select("id", count="exact").eq("user_id", user_id).eq("account_id", acc_id)
+            if content_type:
+                cnt_q = cnt_q.eq("type", content_type)
+            counts[acc_id] = (await db_execute(cnt_q)).count or 0
+        return counts
+
+
 @api_router.get("/generations/history")
 async def get_generation_history(
+    response: Response,
     limit: int = 50,
     content_type: Optional[str] = None,
     scope: str = "account",
     filter_account_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: str = "full",
     user=Depends(require_auth),
     account_id: str = Depends(get_active_account),
 ):
     """Get generation history with favorite status.
     scope=all: tüm hesaplar karışık, scope=account: sadece aktif hesap.
     filter_account_id: belirli bir hesaba filtrele (scope=all ile birlikte).
+    cursor: önceki sayfanın next_cursor'ı (keyset: created_at, id). scope=all'da
+        meta.next_cursor, scope=account'ta X-Next-Cursor header'ı ile döner.
+    fields=light: variant gövdeleri olmadan (preview alanı ile) liste.
     """
-    query = supabase.table("generations").select("*").eq("user_id", user.id)
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    columns = HISTORY_LIGHT_COLUMNS if fields == "light" else "*"
+    query = supabase.table("generations").select(columns).eq("user_id", user.id)
 
     if scope == "all":
         # Aktif hesapları çek (deleted hariç, detay dahil — account_map için de kullanılacak)
-        active_accs = supabase.table("connected_accounts") \
-            .select("id, platform, username, display_name") \
-            .eq("user_id", user.id) \
-            .is_("deleted_at", "null") \
-            .execute()
+        active_accs = await db_execute(supabase.table("connected_accounts")
+            .select("id, platform, username, display_name")
+            .eq("user_id", user.id)
+            .is_("deleted_at", "null"))
         active_ids = [a["id"] for a in (active_accs.data or [])]
 
         if not active_ids:
-            return {"generations": [], "meta": {"account_counts": {}, "total": 0}} if scope == "all" else []
+            return {"generations": [], "meta": {"account_counts": {}, "total": 0, "next_cursor": None}}
 
         if filter_account_id:
             # Belirli hesaba filtrele (ownership check: aktif mi?)
             if filter_account_id in active_ids:
                 query = query.eq("account_id", filter_account_id)
             else:
-                return {"generations": [], "meta": {"account_counts": {}, "total": 0}}
+                return {"generations": [], "meta": {"account_counts": {}, "total": 0, "next_cursor": None}}
         else:
             # Supabase'de .in_() ile sadece aktif hesapların verisini çek
             query = query.in_("account_id", active_ids)
     else:
         query = query.eq("account_id", account_id)
 
-    query = query.order("created_at", desc=True).limit(limit)
     if content_type:
         query = query.eq("type", content_type)
-    result = query.execute()
-    generations = result.data or []
-
-    if not generations:
-        return {"generations": [], "meta": {"account_counts": {}, "total": 0}} if scope == "all" else []
-
-    # Fetch favorites (scope=all ise tüm hesapların favorileri)
-    fav_query = supabase.table("favorites").select("id, generation_id, variant_index").eq("user_id", user.id).not_.is_("generation_id", "null").is_("deleted_at", "null")
-    if scope != "all":
-        fav_query = fav_query.eq("account_id", account_id)
-    fav_result = fav_query.execute()
-
-    # Build lookup: generation_id -> {variant_index: favorite_id}
-    fav_map = {}
-    for fav in (fav_result.data or []):
-        gid = fav["generation_id"]
-        if gid not in fav_map:
-            fav_map[gid] = {}
-        fav_map[gid][fav["variant_index"]] = fav["id"]
-
-    # scope=all: account_map'i active_accs'tan türet (ekstra sorgu yok)
-    account_map = {}
+    if cursor:
+        # Keyset: (created_at, id) < cursor — offset yok, derin sayfalar da index'ten okunur
+        created_at, gen_id = _decode_history_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{gen_id})')
+    # limit+1: bir sonraki sayfa var mı?
+    query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+    counts_task = None
     if scope == "all":
-        for acc in (active_accs.data or []):
-            account_map[acc["id"]] = {
-                "platform": acc["platform"],
-                "username": acc["username"],
-                "display_name": acc.get("display_name"),
-            }
+        # Sayılar sayfadan bağımsız → sayfa sorgusu ile paralel
+        counts_task = asyncio.create_task(
+            _generation_counts_by_account(user.id, active_ids, content_type)
+        )
 
-    # Attach favorite + account info to each generation
-    for gen in generations:
-        gen["favorited_variants"] = fav_map.get(gen["id"], {})
-        if scope == "all" and gen.get("account_id"):
-            gen["account_info"] = account_map.get(gen["account_id"])
-
-    # scope=all: gerçek toplam sayıları ekle (limit'ten bağımsız, pagination-safe)
-    if scope == "all" and account_map:
-        account_counts = {}
-        total = 0
-        for acc_id in account_map:
-            cnt_q = supabase.table("generations").select("id", count="exact").eq("user_id", user.id).eq("account_id", acc_id)
-            if content_type:
-                cnt_q = cnt_q.eq("type", content_type)
-            cnt = cnt_q.execute().count or 0
-            account_counts[acc_id] = cnt
-            total += cnt
-        return {
-            "generations": generations,
-            "meta": {
-                "account_counts": account_counts,
-                "total": total,
+    try:
+        result = await db_execute(query)
+        generations = result.data or []
+
+        next_cursor = None
+        if len(generations) > limit:
+            generations = generations[:limit]
+            next_cursor = _encode_history_cursor(generations[-1])
+
+        if not generations:
+            if scope == "all":
+                account_counts = await counts_task
+                return {"generations": [], "meta": {
+                    "account_counts": account_counts,
+                    "total": sum(account_counts.values()),
+                    "next_cursor": None,
+                }}
+            return []
+
+        # Favoriler: sadece bu sayfadaki generation'lar (O(sayfa), kullanıcının tüm favorileri değil)
+        fav_query = (supabase.table("favorites")
+            .select("id, generation_id, variant_index")
+            .eq("user_id", user.id)
+            .in_("generation_id", [gen["id"] for gen in generations])
+            .is_("deleted_at", "null"))
+        if scope != "all":
+            fav_query = fav_query.eq("account_id", account_id)
+        fav_result = await db_execute(fav_query)
+
+        # Build lookup: generation_id -> {variant_index: favorite_id}
+        fav_map = {}
+        for fav in (fav_result.data or []):
+            gid = fav["generation_id"]
+            if gid not in fav_map:
+                fav_map[gid] = {}
+            fav_map[gid][fav["variant_index"]] = fav["id"]
+
+        # scope=all: account_map'i active_accs'tan türet (ekstra sorgu yok)
+        account_map = {}
+        if scope == "all":
+            for acc in (active_accs.data or []):
+                account_map[acc["id"]] = {
+                    "platform": acc["platform"],
+                    "username": acc["username"],
+                    "display_name": acc.get("display_name"),
+                }
+
+        # Attach favorite + account info to each generation
+        for gen in generations:
+            gen["favorited_variants"] = fav_map.get(gen["id"], {})
+            if scope == "all" and gen.get("account_id"):
+                gen["account_info"] = account_map.get(gen["account_id"])
+
+        # scope=all: gerçek toplam sayıları ekle (limit'ten bağımsız, pagination-safe)
+        if scope == "all":
+            account_counts = await counts_task
+            return {
+                "generations": generations,
+                "meta": {
+                    "account_counts": account_counts,
+                    "total": sum(account_counts.values()),
+                    "next_cursor": next_cursor,
+                }
             }
-        }
 
-    return generations
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return generations
+    finally:
+        # Sayfa / favori sorgusu hata verirse (veya istek iptal olursa) sayım task'ı sahipsiz kalmasın
+        if counts_task and not counts_task.done():
+            counts_task.cancel()
+
+
+@api_router.get("/generations/{generation_id}")
+async def get_generation(generation_id: str, user=Depends(require_auth)):
+    """Tek generation'ın tam satırı (fields=light listede satır açılınca)."""
+    result = await db_execute(supabase.table("generations")
+        .select("*")
+        .eq("id", generation_id)
+        .eq("user_id", user.id)
+        .limit(1))
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Generation bulunamadı")
+    return result.data[0]
 
 @api_router.get("/user/stats")
 async def get_user_stats(user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Get user statistics"""
     try:
-        gen_query = supabase.table("generations").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id)
-        tweet_query = supabase.table("generations").select("id", count="exact").eq("type", "tweet").eq("user_id", user.id).eq("account_id", account_id)
         fav_query = supabase.table("favorites").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null")
+        rollup_query = supabase.table("generation_daily_rollups").select("total, type_counts").eq("user_id", user.id).eq("account_id", account_id)
+        fav_res, rollup_res = await asyncio.gather(
+            db_execute(fav_query), db_execute(rollup_query), return_exceptions=True
+        )
+        if isinstance(fav_res, Exception):
+            raise fav_res
+
+        if isinstance(rollup_res, Exception):
+            # Rollup tablosu yoksa (migration 012) eski count sorguları
+            logger.warning(f"Stats rollups unavailable, falling back to counts: {rollup_res}")
+            gen_query = supabase.table("generations").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id)
+            tweet_query = supabase.table("generations").select("id", count="exact").eq("type", "tweet").eq("user_id", user.id).eq("account_id", account_id)
+            generations = (await db_execute(gen_query)).count or 0
+            tweets = (await db_execute(tweet_query)).count or 0
+        else:
+            rows = rollup_res.data or []
+            generations = sum(r["total"] for r in rows)
+            tweets = sum(int((r.get("type_counts") or {}).get("tweet", 0)) for r in rows)
 
         return {
-            "generations": gen_query.execute().count or 0,
-            "tweets": tweet_query.execute().count or 0,
-            "favorites": fav_query.execute().count or 0
+            "generations": generations,
+            "tweets": tweets,
+            "favorites": fav_res.count or 0
         }
     except Exception:
         return {"generations": 0, "tweets": 0, "favorites": 0}
@@ -1076,7 +1360,7 @@ async def get_favorites(limit: int = 50, user=Depends(require_auth), account_id:
     """Get user favorites (only active, not soft-deleted)"""
     try:
         query = supabase.table("favorites").select("*").eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null").order("created_at", desc=True).limit(limit)
-        result = query.execute()
+        result = await db_execute(query)
         return result.data
     except Exception:
         return []
@@ -1086,7 +1370,7 @@ async def get_favorites_trash(limit: int = 50, user=Depends(require_auth), accou
     """Get soft-deleted favorites (Recently Deleted, 30 gün içinde geri alınabilir)"""
     try:
         query = supabase.table("favorites").select("*").eq("user_id", user.id).eq("account_id", account_id).not_.is_("deleted_at", "null").order("deleted_at", desc=True).limit(limit)
-        result = query.execute()
+        result = await db_execute(query)
         return result.data
     except Exception:
         return []
@@ -1104,7 +1388,7 @@ async def add_favorite(content: dict, user=Depends(require_auth), account_id: st
         "variant_index": content.get("variant_index", 0),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    supabase.table("favorites").insert(favorite_doc).execute()
+    await db_execute(supabase.table("favorites").insert(favorite_doc))
     return {"success": True, "id": favorite_doc["id"]}
 
 @api_router.post("/favorites/toggle")
@@ -1117,16 +1401,16 @@ async def toggle_favorite(content: dict, user=Depends(require_auth), account_id:
         raise HTTPException(status_code=400, detail="generation_id gerekli")
 
     # Check if already favorited (only active ones, not soft-deleted)
-    existing = supabase.table("favorites").select("id").eq("user_id", user.id).eq("account_id", account_id).eq("generation_id", generation_id).eq("variant_index", variant_index).is_("deleted_at", "null").execute()
+    existing = await db_execute(supabase.table("favorites").select("id").eq("user_id", user.id).eq("account_id", account_id).eq("generation_id", generation_id).eq("variant_index", variant_index).is_("deleted_at", "null"))
 
     if existing.data:
         # Remove
-        supabase.table("favorites").delete().eq("id", existing.data[0]["id"]).eq("user_id", user.id).eq("account_id", account_id).execute()
+        await db_execute(supabase.table("favorites").delete().eq("id", existing.data[0]["id"]).eq("user_id", user.id).eq("account_id", account_id))
         return {"success": True, "action": "removed", "favorite_id": None}
     else:
         # Add
         fav_id = str(uuid.uuid4())
-        supabase.table("favorites").insert({
+        await db_execute(supabase.table("favorites").insert({
             "id": fav_id,
             "user_id": user.id,
             "account_id": account_id,
@@ -1135,19 +1419,19 @@ async def toggle_favorite(content: dict, user=Depends(require_auth), account_id:
             "generation_id": generation_id,
             "variant_index": variant_index,
             "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
+        }))
         return {"success": True, "action": "added", "favorite_id": fav_id}
 
 @api_router.delete("/generations/all")
 async def delete_all_generations(user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Delete ALL generations and their favorites for the user"""
     # Delete all favorites for this user's generations
-    supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).not_.is_("generation_id", "null").execute()
+    await db_execute(supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).not_.is_("generation_id", "null"))
     # Delete all generations
-    result = supabase.table("generations").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id).execute()
+    result = await db_execute(supabase.table("generations").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id))
     count = result.count or 0
     if count > 0:
-        supabase.table("generations").delete().eq("user_id", user.id).eq("account_id", account_id).execute()
+        await db_execute(supabase.table("generations").delete().eq("user_id", user.id).eq("account_id", account_id))
     return {"deleted": count}
 
 @api_router.delete("/generations/bulk")
@@ -1158,11 +1442,11 @@ async def bulk_delete_generations(body: dict, user=Depends(require_auth), accoun
         return {"deleted": 0}
     # Delete related favorites
     for gid in ids:
-        supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).eq("generation_id", gid).execute()
+        await db_execute(supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).eq("generation_id", gid))
     # Delete generations
     deleted = 0
     for gid in ids:
-        result = supabase.table("generations").delete().eq("id", gid).eq("user_id", user.id).eq("account_id", account_id).execute()
+        result = await db_execute(supabase.table("generations").delete().eq("id", gid).eq("user_id", user.id).eq("account_id", account_id))
         if result.data:
             deleted += len(result.data)
     return {"deleted": deleted}
@@ -1171,9 +1455,9 @@ async def bulk_delete_generations(body: dict, user=Depends(require_auth), accoun
 async def delete_generation(generation_id: str, user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Delete a single generation + its favorites"""
     # Delete related favorites
-    supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).eq("generation_id", generation_id).execute()
+    await db_execute(supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).eq("generation_id", generation_id))
     # Delete the generation
-    result = supabase.table("generations").delete().eq("id", generation_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    result = await db_execute(supabase.table("generations").delete().eq("id", generation_id).eq("user_id", user.id).eq("account_id", account_id))
     count = len(result.data) if result.data else 0
     return {"deleted": count}
 
@@ -1181,23 +1465,23 @@ async def delete_generation(generation_id: str, user=Depends(require_auth), acco
 async def soft_delete_favorite(favorite_id: str, user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Soft delete: Çöp kutusuna taşı (30 gün sonra kalıcı silinir)"""
     now = datetime.now(timezone.utc).isoformat()
-    supabase.table("favorites").update({"deleted_at": now}).eq("id", favorite_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    await db_execute(supabase.table("favorites").update({"deleted_at": now}).eq("id", favorite_id).eq("user_id", user.id).eq("account_id", account_id))
     return {"success": True, "action": "soft_deleted"}
 
 @api_router.post("/favorites/{favorite_id}/restore")
 async def restore_favorite(favorite_id: str, user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Geri al: Çöp kutusundan geri getir"""
-    supabase.table("favorites").update({"deleted_at": None}).eq("id", favorite_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    await db_execute(supabase.table("favorites").update({"deleted_at": None}).eq("id", favorite_id).eq("user_id", user.id).eq("account_id", account_id))
     return {"success": True, "action": "restored"}
 
 @api_router.delete("/favorites/all")
 async def delete_all_favorites(user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Soft delete ALL active favorites for the user (çöp kutusuna taşı)"""
     now = datetime.now(timezone.utc).isoformat()
-    result = supabase.table("favorites").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null").execute()
+    result = await db_execute(supabase.table("favorites").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null"))
     count = result.count or (len(result.data) if result.data else 0)
     if count > 0:
-        supabase.table("favorites").update({"deleted_at": now}).eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null").execute()
+        await db_execute(supabase.table("favorites").update({"deleted_at": now}).eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null"))
     return {"deleted": count}
 
 @api_router.delete("/favorites/bulk")
@@ -1209,7 +1493,7 @@ async def bulk_delete_favorites(body: dict, user=Depends(require_auth), account_
     now = datetime.now(timezone.utc).isoformat()
     deleted = 0
     for fid in ids:
-        result = supabase.table("favorites").update({"deleted_at": now}).eq("id", fid).eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null").execute()
+        result = await db_execute(supabase.table("favorites").update({"deleted_at": now}).eq("id", fid).eq("user_id", user.id).eq("account_id", account_id).is_("deleted_at", "null"))
         if result.data:
             deleted += len(result.data)
     return {"deleted": deleted}
@@ -1217,10 +1501,10 @@ async def bulk_delete_favorites(body: dict, user=Depends(require_auth), account_
 @api_router.delete("/favorites/trash/purge")
 async def purge_trash(user=Depends(require_auth)):
     """Çöp kutusundaki tüm favorileri kalıcı sil"""
-    result = supabase.table("favorites").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id).not_.is_("deleted_at", "null").execute()
+    result = await db_execute(supabase.table("favorites").select("id", count="exact").eq("user_id", user.id).eq("account_id", account_id).not_.is_("deleted_at", "null"))
     count = result.count or (len(result.data) if result.data else 0)
     if count > 0:
-        supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).not_.is_("deleted_at", "null").execute()
+        await db_execute(supabase.table("favorites").delete().eq("user_id", user.id).eq("account_id", account_id).not_.is_("deleted_at", "null"))
     return {"purged": count}
 
 @api_router.post("/favorites/auto-purge")
@@ -1234,16 +1518,16 @@ async def auto_purge_expired_favorites(request: Request):
     
     cutoff = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
     # 30 günden eski silinmişleri bul ve sil
-    expired = supabase.table("favorites").select("id", count="exact").not_.is_("deleted_at", "null").lt("deleted_at", cutoff).execute()
+    expired = await db_execute(supabase.table("favorites").select("id", count="exact").not_.is_("deleted_at", "null").lt("deleted_at", cutoff))
     count = expired.count or (len(expired.data) if expired.data else 0)
     if count > 0:
-        supabase.table("favorites").delete().not_.is_("deleted_at", "null").lt("deleted_at", cutoff).execute()
+        await db_execute(supabase.table("favorites").delete().not_.is_("deleted_at", "null").lt("deleted_at", cutoff))
     return {"purged": count, "cutoff": cutoff}
 
 @api_router.delete("/favorites/{favorite_id}")
 async def remove_favorite(favorite_id: str, user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Favoriden çıkar (toggle off, hard delete from favorites table)"""
-    supabase.table("favorites").delete().eq("id", favorite_id).eq("user_id", user.id).eq("account_id", account_id).execute()
+    await db_execute(supabase.table("favorites").delete().eq("id", favorite_id).eq("user_id", user.id).eq("account_id", account_id))
     return {"success": True}
 
 # ==================== CONTENT EVOLUTION ====================
@@ -1287,7 +1571,7 @@ async def evolve_content(req: EvolveRequest, _=Depends(rate_limit), user=Depends
     """Evolve: seçilen varyant(lar)dan yeni varyantlar üret."""
 
     # 1. Parent generation'ı çek
-    parent = supabase.table("generations").select("*").eq("id", req.parent_generation_id).eq("user_id", user.id).single().execute()
+    parent = await db_execute(supabase.table("generations").select("*").eq("id", req.parent_generation_id).eq("user_id", user.id).single())
     if not parent.data:
         raise HTTPException(status_code=404, detail="Üretim bulunamadı")
 
@@ -1314,7 +1598,7 @@ async def evolve_content(req: EvolveRequest, _=Depends(rate_limit), user=Depends
     # 5. Stil prompt'u çek (varsa)
     style_prompt = ""
     try:
-        style_res = supabase.table("style_profiles").select("style_prompt").eq("user_id", user.id).eq("is_active", True).limit(1).execute()
+        style_res = await db_execute(supabase.table("style_profiles").select("style_prompt").eq("user_id", user.id).eq("is_active", True).limit(1))
         if style_res.data:
             style_prompt = style_res.data[0].get("style_prompt", "")
     except Exception:
@@ -1342,7 +1626,7 @@ async def evolve_content(req: EvolveRequest, _=Depends(rate_limit), user=Depends
     # Check token budget
     check_token_budget(user.id)
 
-    response = openai_client.chat.completions.create(
+    response = await llm_gateway.chat("openai",
         model=MODEL_CONTENT,
         messages=[
             {"role": "system", "content": "Sen bir sosyal medya içerik uzmanısın. İstenen formatta JSON döndür."},
@@ -1393,7 +1677,7 @@ async def evolve_content(req: EvolveRequest, _=Depends(rate_limit), user=Depends
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
 
-    supabase.table("generations").insert(generation_record).execute()
+    await db_execute(supabase.table("generations").insert(generation_record))
 
     return {
         "success": True,
@@ -1407,19 +1691,17 @@ async def evolve_content(req: EvolveRequest, _=Depends(rate_limit), user=Depends
 @api_router.get("/evolve/chain/{chain_id}")
 async def get_evolution_chain(chain_id: str, user=Depends(require_auth)):
     """Bir evolution chain'indeki tüm üretimleri getir."""
-    result = supabase.table("generations") \
-        .select("id, topic, type, variants, evolution_depth, parent_generation_id, parent_variant_indices, evolution_feedback, evolution_quick_tags, created_at") \
-        .eq("evolution_chain_id", chain_id) \
-        .eq("user_id", user.id) \
-        .order("evolution_depth") \
-        .execute()
+    result = await db_execute(supabase.table("generations")
+        .select("id, topic, type, variants, evolution_depth, parent_generation_id, parent_variant_indices, evolution_feedback, evolution_quick_tags, created_at")
+        .eq("evolution_chain_id", chain_id)
+        .eq("user_id", user.id)
+        .order("evolution_depth"))
 
     # Orijinal üretimi de ekle (chain_id = kendi id'si olan)
-    original = supabase.table("generations") \
-        .select("id, topic, type, variants, evolution_depth, parent_generation_id, parent_variant_indices, created_at") \
-        .eq("id", chain_id) \
-        .eq("user_id", user.id) \
-        .execute()
+    original = await db_execute(supabase.table("generations")
+        .select("id, topic, type, variants, evolution_depth, parent_generation_id, parent_variant_indices, created_at")
+        .eq("id", chain_id)
+        .eq("user_id", user.id))
 
     all_gens = (original.data or []) + (result.data or [])
 
@@ -1536,6 +1818,7 @@ app.add_middleware(
     allow_origin_regex=r"https://frontend-.*\.vercel\.app",
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "X-TH-Client", "X-Requested-With", "X-Admin-Key", "X-TH-Timestamp", "X-TH-Nonce", "X-Active-Account-Id"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Middleware stack (last added = first executed)
@@ -1552,6 +1835,18 @@ from middleware.db_cleanup import start_cleanup_task
 async def startup_event():
     start_cleanup_task(supabase)
 
+    # Process genelinde tek LLM client seti + keep-alive pool (shutdown'da kapanır)
+    global openai_client, openai_async_client
+    if os.environ.get('OPENAI_API_KEY'):
+        openai_client = llm_gateway.sync_client("openai")
+        openai_async_client = llm_gateway.async_client("openai")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm_gateway.aclose()
+    shutdown_db_executor()
+
 
 # ==================== V2 MODELS ====================
 
@@ -1569,18 +1864,21 @@ from prompts.smart_defaults import SMART_DEFAULTS, get_smart_defaults
 V2_MODEL_CONFIG = {
     "normal": {
         "model": "google/gemini-3-flash-preview",
+        "fallback_model": os.environ.get('V2_FALLBACK_NORMAL', 'google/gemini-2.5-flash'),
         "provider": "openrouter",
         "max_tokens": 2048,
         "temperature_base": 0.8,
     },
     "ultra": {
         "model": "anthropic/claude-sonnet-4.6",
+        "fallback_model": os.environ.get('V2_FALLBACK_ULTRA', 'anthropic/claude-sonnet-4.5'),
         "provider": "openrouter",
         "max_tokens": 2048,
         "temperature_base": 0.8,
     },
     "shitpost": {
         "model": "mistralai/mistral-large-2512",
+        "fallback_model": os.environ.get('V2_FALLBACK_SHITPOST', 'mistralai/mistral-medium-3.1'),
         "provider": "openrouter",
         "max_tokens": 1024,
         "temperature_base": 0.85,
@@ -1633,20 +1931,11 @@ def _get_shitpost_style():
 
 # ==================== OPENROUTER CLIENT ====================
 
-_openrouter_client = None
-
 def _get_openrouter_client():
-    """Lazy init OpenRouter client (OpenAI-compatible SDK)."""
-    global _openrouter_client
-    if _openrouter_client is None:
-        openrouter_key = os.environ.get('OPENROUTER_API_KEY')
-        if not openrouter_key:
-            raise HTTPException(status_code=500, detail="OpenRouter API key not configured")
-        _openrouter_client = OpenAI(
-            api_key=openrouter_key,
-            base_url="https://openrouter.ai/api/v1",
-        )
-    return _openrouter_client
+    """OpenRouter client (OpenAI-compatible SDK), LLM gateway'in paylaşılan pool'undan."""
+    if not os.environ.get('OPENROUTER_API_KEY'):
+        raise HTTPException(status_code=500, detail="OpenRouter API key not configured")
+    return llm_gateway.async_client("openrouter")
 
 
 # ==================== MODEL ROUTING ====================
@@ -1663,6 +1952,40 @@ def get_model_config(etki: str, is_ultra: bool) -> dict:
 
 # ==================== V2 GENERATION ====================
 
+_V2_OUTPUT_PREFIXES = ["Tweet:", "tweet:", "Tweet metni:", "Çıktı:", "Output:", "İşte tweet:"]
+_V2_ALTERNATIVE_SPLITTERS = ["\n\nYa da ", "\n\nVeya:", "\n\nVeya\n", "\n\nAlternatif:"]
+
+
+def _clean_v2_output(raw_content: Optional[str], model: str) -> str:
+    """Model çıktısındaki tırnak, 'Tweet:' gibi önek ve alternatifleri temizle."""
+    content = raw_content.strip() if raw_content else ""
+    content = content.strip('"').strip("'")
+    for prefix in _V2_OUTPUT_PREFIXES:
+        if content.lower().startswith(prefix.lower()):
+            content = content[len(prefix):].strip()
+
+    # Mistral "veya" fix: take only first part if model gave alternatives
+    if model.startswith("mistral"):
+        for splitter in _V2_ALTERNATIVE_SPLITTERS:
+            if splitter in content:
+                content = content.split(splitter)[0].strip()
+    return content
+
+
+def _truncate_at_sentence(content: str, char_min: int, char_max: int) -> str:
+    """Hard truncate at sentence boundary. Sonuç char_min altında kalırsa orijinali döner."""
+    sentences = content.replace('\n', '. ').split('. ')
+    truncated = ""
+    for s in sentences:
+        if len(truncated) + len(s) + 2 <= char_max:
+            truncated = (truncated + ". " + s).strip(". ") if truncated else s
+        else:
+            break
+    if truncated and len(truncated) >= char_min:
+        return truncated + "."
+    return content
+
+
 async def generate_with_openrouter(
     system_prompt: str,
     user_prompt: str,
@@ -1670,128 +1993,214 @@ async def generate_with_openrouter(
     variants: int = 1,
     user_id: str = None,
     uzunluk: str = "punch",
+    variant_mode: Optional[str] = None,
+    cache: bool = False,
+    usage: Optional[dict] = None,
 ) -> tuple:
     """Generate content via OpenRouter (OpenAI-compatible API).
-    Returns (results, total_tokens_used)."""
-
-    if user_id:
-        check_token_budget(user_id)
+    Returns (results, total_tokens_used).
+
+    Variant'lar paralel çalışır. İlk denemeler stream edilerek uzunluğu izlenir: bir variant
+    (tek variant'lı istek dahil) cevap bitmeden limiti aşınca, o ve henüz bitmemiş diğer
+    variant'lar için strict-prompt retry'ı spekülatif olarak hemen başlatılır; ilk cevap limite
+    uyarsa spekülatif istek iptal edilir. Böylece uzunluk retry'ı seri round trip eklemez.
+    Kullanılmayan ama tamamlanmış spekülatif isteğin token'ları da tokens_used'a sayılır.
+    variant_mode "n"/"json" ise ilk denemeler tek istekte alınır; temizleme ve uzunluk
+    kontrolü her variant'a yine ayrı uygulanır.
+    cache=True ise aynı prompt fingerprint'i için generation_cache'ten döner (tokens_used=0).
+    usage dict verilirse prompt_tokens / cached_tokens ile doldurulur.
+    Her çağrı model_router üzerinden gider: primary p90'ını aşarsa fallback_model'e
+    hedge atılır, ilk cevap alınır. Toplu deneme, ilk denemeler ve empty/strict retry'lar
+    tek bir deadline'ı paylaşır: istek en fazla V2_CALL_TIMEOUT sürer.
+    """
 
-    client = _get_openrouter_client()
     model = model_config["model"]
+    fallback_model = model_config.get("fallback_model")
     # Cap max_tokens by uzunluk to prevent over-generation
     uzunluk_cap = UZUNLUK_MAX_TOKENS.get(uzunluk, 2048)
     max_tokens = min(model_config["max_tokens"], uzunluk_cap)
     temp_base = model_config.get("temperature_base", 0.8)
+    mode = variant_mode if variant_mode in VARIANT_MODES else VARIANT_MODE_DEFAULT
+
+    cache_key = None
+    if cache:
+        cache_key = generation_cache.make_key(
+            user_id, model, system_prompt, user_prompt,
+            [temp_base + (i * 0.05) for i in range(variants)], variants,
+            extra=f"{mode}|{uzunluk}|{max_tokens}",
+        )
+        cached = generation_cache.get(cache_key)
+        if cached:
+            results, saved_tokens = cached
+            logger.info(f"Generation cache hit: model={model} variants={variants} saved_tokens={saved_tokens}")
+            return results, 0
+
+    if user_id:
+        check_token_budget(user_id)
+
+    client = _get_openrouter_client()
     
     # Get char limits for post-generation check
     char_min, char_max = UZUNLUK_CHAR_LIMITS.get(uzunluk, (0, 99999))
+    enforce_length = uzunluk in ("micro", "punch", "spark", "storm")
 
-    results = []
-    total_tokens = 0
+    # Herhangi bir variant limiti aştığında (stream sırasında dahil) set edilir → strict retry erken başlar
+    overlength_seen = asyncio.Event()
 
-    for i in range(variants):
-        try:
-            variant_prompt = user_prompt
-            if variants > 1:
-                variant_prompt += f"\n\nBu {i+1}. varyant. Aynı konu, aynı ayarlar ama farklı bir ifade ve hook kullan. Önceki varyantlardan farklı kelimeler ve cümle yapıları seç."
+    def _watch_length(chars: int):
+        if chars > char_max:
+            overlength_seen.set()
+
+    started = time.monotonic()
+    deadline = started + V2_CALL_TIMEOUT
 
-            response = client.chat.completions.create(
-                model=model,
+    # Tek-istek modu: ilk denemeleri toplu al, eksik kalanlar aşağıda per-variant üretilir
+    batch_outputs: List[tuple[str, int]] = []
+    if variants > 1 and mode in ("n", "json"):
+        try:
+            batch_model, (batch, batch_tokens) = await model_router.hedged(
+                model, fallback_model,
+                lambda m: llm_gateway.run("openrouter", m, lambda: _generate_variants_single_call(
+                    client, mode, variants, system_prompt, user_prompt, usage=usage,
+                    model=m, temperature=temp_base + 0.05, max_tokens=max_tokens,
+                )),
+                deadline=deadline,
+            )
+            batch_outputs = [(_clean_v2_output(c, batch_model), 0) for c in batch]
+            if batch_outputs:
+                batch_outputs[0] = (batch_outputs[0][0], batch_tokens)
+        except Exception as e:
+            logger.warning(f"V2 single-call generation failed (mode={mode}, {model}), falling back to per-variant: {e}")
+
+    async def _call(
+        prompt: str,
+        temperature: float,
+        stream_index: Optional[int] = None,
+        on_text: Optional[Callable[[int], None]] = None,
+    ) -> tuple[str, int]:
+        # Stream edilen çağrı hedge'lenmez / tekrar denenmez: aynı variant'a token iki kez yazılamaz
+        streamed = stream_index is not None and is_streaming()
+        hedge_to = None if streamed else fallback_model
+        answered_by, (raw_content, tokens) = await model_router.hedged(
+            model, hedge_to,
+            lambda m: llm_gateway.run("openrouter", m, lambda: _chat_completion(
+                client,
+                stream_index=stream_index,
+                usage=usage,
+                on_text=on_text,
+                model=m,
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": variant_prompt}
+                    {"role": "user", "content": prompt}
                 ],
-                temperature=temp_base + (i * 0.05),
+                temperature=temperature,
                 max_tokens=max_tokens,
-            )
-
-            raw_content = response.choices[0].message.content
-            content = raw_content.strip() if raw_content else ""
-
-            # Clean up common issues
-            content = content.strip('"').strip("'")
-            for prefix in ["Tweet:", "tweet:", "Tweet metni:", "Çıktı:", "Output:", "İşte tweet:"]:
-                if content.lower().startswith(prefix.lower()):
-                    content = content[len(prefix):].strip()
+            ), retries=0 if streamed else LLM_RETRIES),
+            deadline=deadline,
+        )
+        return _clean_v2_output(raw_content, answered_by), tokens
+
+    async def _first_attempt(output: tuple[str, int]) -> tuple[str, int]:
+        return output
+
+    def _spent_tokens(task: asyncio.Task) -> int:
+        """Sonucu kullanılmayan çağrının token'ı; iptal edilen / hata verenin usage'ı yok → 0."""
+        if task.done() and not task.cancelled() and task.exception() is None:
+            return task.result()[1]
+        return 0
+
+    async def _generate_variant(i: int) -> tuple[str, int]:
+        variant_prompt = user_prompt
+        if variants > 1:
+            variant_prompt += f"\n\nBu {i+1}. varyant. Aynı konu, aynı ayarlar ama farklı bir ifade ve hook kullan. Önceki varyantlardan farklı kelimeler ve cümle yapıları seç."
+        strict_prompt = f"KURAL: Maximum {char_max} karakter. ASLA bu limiti aşma. Kısa ve öz yaz.\n\n" + variant_prompt
+        strict_temp = max(temp_base - 0.2, 0.3)
+
+        if i < len(batch_outputs):
+            first = asyncio.create_task(_first_attempt(batch_outputs[i]))
+        else:
+            # Sadece ilk deneme stream edilir; retry'ların son hali `done` event'inde gelir
+            first = asyncio.create_task(_call(
+                variant_prompt, temp_base + (i * 0.05), stream_index=i,
+                on_text=_watch_length if enforce_length else None,
+            ))
+        strict = None
+        try:
+            if enforce_length:
+                # Bu variant'ın veya bir kardeşinin stream'i limiti geçti → ilk cevabı beklemeden strict başlat
+                overflow = asyncio.create_task(overlength_seen.wait())
+                await asyncio.wait({first, overflow}, return_when=asyncio.FIRST_COMPLETED)
+                overflow.cancel()
+                if not first.done():
+                    strict = asyncio.create_task(_call(strict_prompt, strict_temp))
 
-            # Mistral "veya" fix: take only first part if model gave alternatives
-            if model_config == V2_MODEL_CONFIG["shitpost"]:
-                for splitter in ["\n\nYa da ", "\n\nVeya:", "\n\nVeya\n", "\n\nAlternatif:"]:
-                    if splitter in content:
-                        content = content.split(splitter)[0].strip()
+            content, tokens = await first
 
             # Retry if empty
             if not content or len(content) < 5:
                 logger.warning(f"V2 empty output from {model}, retrying...")
-                response2 = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": variant_prompt}
-                    ],
-                    temperature=temp_base + 0.1,
-                    max_tokens=max_tokens,
-                )
-                raw2 = response2.choices[0].message.content
-                content = raw2.strip() if raw2 else ""
-                if response2.usage:
-                    total_tokens += response2.usage.total_tokens
+                content, retry_tokens = await _call(variant_prompt, temp_base + 0.1)
+                tokens += retry_tokens
 
             # Post-generation length enforcement
-            if len(content) > char_max and uzunluk in ("micro", "punch", "spark", "storm"):
+            if enforce_length and len(content) > char_max:
+                overlength_seen.set()
                 logger.warning(f"V2 output too long ({len(content)} chars, max {char_max}) for {uzunluk}. Retrying with stricter prompt...")
-                strict_prompt = f"KURAL: Maximum {char_max} karakter. ASLA bu limiti aşma. Kısa ve öz yaz.\n\n" + variant_prompt
+                if strict is None:
+                    strict = asyncio.create_task(_call(strict_prompt, strict_temp))
                 try:
-                    response3 = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": strict_prompt}
-                        ],
-                        temperature=max(temp_base - 0.2, 0.3),
-                        max_tokens=max_tokens,
-                    )
-                    retry_content = response3.choices[0].message.content.strip().strip('"').strip("'")
-                    for pfx in ["Tweet:", "tweet:", "Tweet metni:", "Çıktı:", "Output:", "İşte tweet:"]:
-                        if retry_content.lower().startswith(pfx.lower()):
-                            retry_content = retry_content[len(pfx):].strip()
-                    if model_config.get("model", "").startswith("mistral"):
-                        for s in ["\n\nYa da ", "\n\nVeya:", "\n\nVeya\n", "\n\nAlternatif:"]:
-                            if s in retry_content:
-                                retry_content = retry_content.split(s)[0].strip()
+                    retry_content, retry_tokens = await strict
+                    tokens += retry_tokens
                     if retry_content and len(retry_content) <= char_max:
                         logger.info(f"V2 retry succeeded: {len(retry_content)} chars (was {len(content)})")
                         content = retry_content
                     else:
-                        # Hard truncate at sentence boundary
                         logger.warning(f"V2 retry still too long ({len(retry_content) if retry_content else 0}), truncating...")
-                        sentences = content.replace('\n', '. ').split('. ')
-                        truncated = ""
-                        for s in sentences:
-                            if len(truncated) + len(s) + 2 <= char_max:
-                                truncated = (truncated + ". " + s).strip(". ") if truncated else s
-                            else:
-                                break
-                        if truncated and len(truncated) >= char_min:
-                            content = truncated + "."
-                    if response3.usage:
-                        total_tokens += response3.usage.total_tokens
+                        content = _truncate_at_sentence(content, char_min, char_max)
                 except Exception as e:
                     logger.warning(f"V2 length retry failed: {e}")
+            elif strict is not None:
+                # Spekülatif retry'a gerek kalmadı (bittiyse token'ı yine harcandı)
+                tokens += _spent_tokens(strict)
+                strict.cancel()
+
+            return content, tokens
+        except BaseException:
+            first.cancel()
+            if strict is not None:
+                strict.cancel()
+            raise
+
+    tasks = [asyncio.create_task(_generate_variant(i)) for i in range(variants)]
+    try:
+        outputs = await asyncio.gather(*tasks)
+    except asyncio.TimeoutError:
+        for task in tasks:
+            task.cancel()
+        logger.error(f"OpenRouter timeout ({model}, fallback={fallback_model})")
+        raise HTTPException(status_code=504, detail="AI yanıtı zaman aşımına uğradı, lütfen tekrar deneyin")
+    except CircuitOpenError as e:
+        for task in tasks:
+            task.cancel()
+        logger.error(f"OpenRouter circuit open ({model}): {e}")
+        raise HTTPException(status_code=503, detail="AI servisi geçici olarak kullanılamıyor, lütfen biraz sonra tekrar deneyin")
+    except Exception as e:
+        for task in tasks:
+            task.cancel()
+        logger.error(f"OpenRouter API error ({model}): {e}")
+        raise HTTPException(status_code=500, detail="AI üretimi başarısız oldu")
 
-            results.append(content)
-
-            if response.usage:
-                total_tokens += response.usage.total_tokens
+    results = [content for content, _ in outputs]
+    total_tokens = sum(tokens for _, tokens in outputs)
 
-        except Exception as e:
-            logger.error(f"OpenRouter API error ({model}): {e}")
-            raise HTTPException(status_code=500, detail="AI üretimi başarısız oldu")
+    logger.info(f"V2 generate: model={model} mode={mode} variants={variants} batched={len(batch_outputs)} tokens={total_tokens} cached_tokens={(usage or {}).get('cached_tokens', 0)} elapsed={int((time.monotonic() - started) * 1000)}ms")
 
     if user_id and total_tokens > 0:
         record_token_usage(user_id, total_tokens)
 
+    if cache_key:
+        generation_cache.put(cache_key, results, total_tokens)
+
     return results, total_tokens
 
 
@@ -1853,9 +2262,12 @@ class ReplyGenerateRequestV2(BaseModel):
 # ==================== V2 ENDPOINTS ====================
 
 @api_router.post("/v2/generate/tweet", response_model=GenerationResponse)
-async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3", force_model: str = None, force_rag: str = None, _=Depends(rate_limit), user=Depends(require_auth)):
+@streamable
+@single_flight
+async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3", force_model: str = None, force_rag: str = None, variant_mode: Optional[str] = None, regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth)):
     """Generate tweet with v2 settings system (Etki, Karakter, Yapı etc.)"""
     try:
+        gen_usage = {}
         sanitize_generation_request(request)
 
         # Validate settings combination
@@ -1893,12 +2305,12 @@ async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3",
                 # Use user's style profile instead of BeatstoBytes
                 if request.style_profile_id:
                     try:
-                        result = supabase.table("style_profiles").select("*").eq("id", request.style_profile_id).eq("user_id", user.id).execute()
+                        result = await db_execute(supabase.table("style_profiles").select("*").eq("id", request.style_profile_id).eq("user_id", user.id))
                         if result.data:
                             profile = result.data[0]
                             from prompts.style_prompt_v2 import build_style_enhanced_prompt
                             source_ids = profile.get("source_ids", [])
-                            examples_result = supabase.table("source_tweets").select("text").in_("source_id", source_ids).order("created_at", desc=True).limit(20).execute()
+                            examples_result = await db_execute(supabase.table("source_tweets").select("text").in_("source_id", source_ids).order("created_at", desc=True).limit(20))
                             user_examples = [t["text"] for t in examples_result.data] if examples_result.data else []
                             shitpost_style_prompt = build_style_enhanced_prompt(profile, user_examples)
                             shitpost_examples = user_examples
@@ -1907,12 +2319,12 @@ async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3",
                         logger.error(f"V2 shitpost user_style error: {e}")
             else:
                 # Default: BeatstoBytes RAG
-                shitpost_style_prompt, shitpost_examples = _get_shitpost_style()
+                shitpost_style_prompt, shitpost_examples = await db_call(_get_shitpost_style)
                 logger.info(f"V2 shitpost: injecting BeatstoBytes style ({len(shitpost_style_prompt)} chars, {len(shitpost_examples)} examples)")
 
         # Build prompt (v2 or v3 engine)
-        if engine == "v3":
-            system_prompt = build_final_prompt_v3(
+        if engine in ("v3", "v3_cached"):
+            system_prompt = _select_builder(engine)(
                 content_type="tweet",
                 topic=request.topic,
                 persona=request.karakter,
@@ -1947,6 +2359,9 @@ async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3",
         contents, tokens_used = await generate_with_openrouter(
             system_prompt, "İçeriği üret.", model_config, request.variants, user_id=user.id,
             uzunluk=request.uzunluk,
+            variant_mode=_resolve_variant_mode("v2_tweet", variant_mode),
+            cache=not regenerate,
+            usage=gen_usage,
         )
 
         variants = [
@@ -1957,7 +2372,7 @@ async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3",
         # Log to database
         gen_id = str(uuid.uuid4())
         try:
-            supabase.table("generations").insert({
+            await db_execute(supabase.table("generations").insert({
                 "id": gen_id,
                 "type": "tweet",
                 "user_id": user.id,
@@ -1973,7 +2388,9 @@ async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3",
                 "variants": [v.model_dump(mode="json") for v in variants],
                 "tokens_used": tokens_used,
                 "model_used": model_config["model"],
-            }).execute()
+                "cached_tokens": gen_usage.get("cached_tokens", 0),
+                "prompt_engine": engine,
+            }))
         except Exception as e:
             logger.warning(f"DB log failed: {e}")
 
@@ -1987,9 +2404,12 @@ async def generate_tweet_v2(request: TweetGenerateRequestV2, engine: str = "v3",
 
 
 @api_router.post("/v2/generate/quote", response_model=GenerationResponse)
-async def generate_quote_v2(request: QuoteGenerateRequestV2, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+@streamable
+@single_flight
+async def generate_quote_v2(request: QuoteGenerateRequestV2, variant_mode: Optional[str] = None, regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Generate quote tweet with v2 settings."""
     try:
+        gen_usage = {}
         sanitize_generation_request(request)
 
         # Fetch original tweet if needed
@@ -2026,6 +2446,9 @@ async def generate_quote_v2(request: QuoteGenerateRequestV2, _=Depends(rate_limi
 
         contents, tokens_used = await generate_with_openrouter(
             system_prompt, user_msg, model_config, request.variants, user_id=user.id, uzunluk=request.uzunluk,
+            variant_mode=_resolve_variant_mode("v2_quote", variant_mode),
+            cache=not regenerate,
+            usage=gen_usage,
         )
 
         variants = [
@@ -2035,7 +2458,7 @@ async def generate_quote_v2(request: QuoteGenerateRequestV2, _=Depends(rate_limi
 
         gen_id = str(uuid.uuid4())
         try:
-            supabase.table("generations").insert({
+            await db_execute(supabase.table("generations").insert({
                 "id": gen_id, "type": "quote", "user_id": user.id, "account_id": account_id,
                 "topic": f"Quote: {request.tweet_url}", "mode": "v2",
                 "length": request.uzunluk, "persona": request.karakter,
@@ -2043,7 +2466,8 @@ async def generate_quote_v2(request: QuoteGenerateRequestV2, _=Depends(rate_limi
                 "is_ultra": request.is_ultra,
                 "variants": [v.model_dump(mode="json") for v in variants],
                 "tokens_used": tokens_used, "model_used": model_config["model"],
-            }).execute()
+                "cached_tokens": gen_usage.get("cached_tokens", 0), "prompt_engine": "v3",
+            }))
         except Exception as e:
             logger.warning(f"DB log failed: {e}")
 
@@ -2057,9 +2481,12 @@ async def generate_quote_v2(request: QuoteGenerateRequestV2, _=Depends(rate_limi
 
 
 @api_router.post("/v2/generate/reply", response_model=GenerationResponse)
-async def generate_reply_v2(request: ReplyGenerateRequestV2, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
+@streamable
+@single_flight
+async def generate_reply_v2(request: ReplyGenerateRequestV2, variant_mode: Optional[str] = None, regenerate: bool = False, _=Depends(rate_limit), user=Depends(require_auth), account_id: str = Depends(get_active_account)):
     """Generate reply with v2 settings."""
     try:
+        gen_usage = {}
         sanitize_generation_request(request)
 
         original_content = request.tweet_content or ""
@@ -2096,6 +2523,9 @@ async def generate_reply_v2(request: ReplyGenerateRequestV2, _=Depends(rate_limi
 
         contents, tokens_used = await generate_with_openrouter(
             system_prompt, user_msg, model_config, request.variants, user_id=user.id, uzunluk=request.uzunluk,
+            variant_mode=_resolve_variant_mode("v2_reply", variant_mode),
+            cache=not regenerate,
+            usage=gen_usage,
         )
 
         variants = [
@@ -2105,7 +2535,7 @@ async def generate_reply_v2(request: ReplyGenerateRequestV2, _=Depends(rate_limi
 
         gen_id = str(uuid.uuid4())
         try:
-            supabase.table("generations").insert({
+            await db_execute(supabase.table("generations").insert({
                 "id": gen_id, "type": "reply", "user_id": user.id, "account_id": account_id,
                 "topic": f"Reply: {request.tweet_url}", "mode": "v2",
                 "length": request.uzunluk, "persona": request.karakter,
@@ -2113,7 +2543,8 @@ async def generate_reply_v2(request: ReplyGenerateRequestV2, _=Depends(rate_limi
                 "is_ultra": request.is_ultra,
                 "variants": [v.model_dump(mode="json") for v in variants],
                 "tokens_used": tokens_used, "model_used": model_config["model"],
-            }).execute()
+                "cached_tokens": gen_usage.get("cached_tokens", 0), "prompt_engine": "v3",
+            }))
         except Exception as e:
             logger.warning(f"DB log failed: {e}")
 
@@ -7,17 +7,17 @@ import uuid
 from datetime import datetime, timezone
 from typing import List, Optional
 
-from openai import OpenAI
 from supabase import create_client
 
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
+
 logger = logging.getLogger(__name__)
 
 supabase_url = os.environ.get('SUPABASE_URL', '')
 supabase_key = os.environ.get('SUPABASE_SERVICE_KEY', '')
 supabase = create_client(supabase_url, supabase_key) if supabase_url else None
 
-openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY', ''))
-
 
 class AccountAnalyzer:
     async def scrape_account(self, username: str) -> dict:
@@ -97,7 +97,8 @@ Detaylı analiz yap ve JSON formatında döndür:
 Tüm metinler Türkçe olsun. Top 5 tweet seç (engagement bazlı). Posting heatmap'te gerçek veriye dayanarak tahmin yap."""
 
         try:
-            response = openai_client.chat.completions.create(
+            response = await llm_gateway.chat(
+                "openai",
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "Sen bir sosyal medya analisti ve büyüme stratejistisin. Detaylı, aksiyon alınabilir analizler üretiyorsun. JSON formatında yanıt ver."},
@@ -140,14 +141,14 @@ Tüm metinler Türkçe olsun. Top 5 tweet seç (engagement bazlı). Posting heat
 
         # Save to Supabase
         try:
-            supabase.table("account_analyses").insert({
+            await db_execute(supabase.table("account_analyses").insert({
                 "id": result["id"],
                 "username": username,
                 "tweet_count": scrape_result["tweet_count"],
                 "overall_score": analysis.get("overall_score", 0),
                 "analysis": analysis,
                 "created_at": result["created_at"],
-            }).execute()
+            }))
         except Exception as e:
             logger.warning(f"Failed to save analysis: {e}")
 
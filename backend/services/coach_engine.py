@@ -33,6 +33,7 @@ ALL_TONES = list(TONE_LABELS.keys())
 
 
 from zoneinfo import ZoneInfo
+from services.db import db_execute
 
 ISTANBUL_TZ = ZoneInfo("Europe/Istanbul")
 
@@ -56,23 +57,21 @@ async def get_opportunity_cards(user_id: str, sb) -> list:
     try:
         cutoff = _days_ago(1)
         # Önce 70+ dene
-        res = sb.table("trends") \
-            .select("id, topic, summary, score, source_type, keywords, key_angles, suggested_hooks, created_at") \
-            .gte("created_at", cutoff) \
-            .gte("score", 70) \
-            .order("score", desc=True) \
-            .limit(3) \
-            .execute()
+        res = await db_execute(sb.table("trends")
+            .select("id, topic, summary, score, source_type, keywords, key_angles, suggested_hooks, created_at")
+            .gte("created_at", cutoff)
+            .gte("score", 70)
+            .order("score", desc=True)
+            .limit(3))
 
         # Fallback: 0 sonuç gelirse eşiği 55'e düşür, en az 1 kart göster
         if not res.data:
-            res = sb.table("trends") \
-                .select("id, topic, summary, score, source_type, keywords, key_angles, suggested_hooks, created_at") \
-                .gte("created_at", cutoff) \
-                .gte("score", 55) \
-                .order("score", desc=True) \
-                .limit(1) \
-                .execute()
+            res = await db_execute(sb.table("trends")
+                .select("id, topic, summary, score, source_type, keywords, key_angles, suggested_hooks, created_at")
+                .gte("created_at", cutoff)
+                .gte("score", 55)
+                .order("score", desc=True)
+                .limit(1))
 
         for trend in (res.data or []):
             # Freshness hesapla
@@ -124,12 +123,11 @@ async def get_roast_toast_cards(user_id: str, sb) -> list:
 
     try:
         # Son 50 generation
-        gen_res = sb.table("generations") \
-            .select("persona, tone, length, type, created_at, evolution_depth, variants") \
-            .eq("user_id", user_id) \
-            .order("created_at", desc=True) \
-            .limit(50) \
-            .execute()
+        gen_res = await db_execute(sb.table("generations")
+            .select("persona, tone, length, type, created_at, evolution_depth, variants")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+            .limit(50))
         gens = gen_res.data or []
 
         if len(gens) < 5:
@@ -137,11 +135,10 @@ async def get_roast_toast_cards(user_id: str, sb) -> list:
             return cards
 
         # Favori sayısı
-        fav_res = sb.table("favorites") \
-            .select("id, generation_id, created_at") \
-            .eq("user_id", user_id) \
-            .is_("deleted_at", "null") \
-            .execute()
+        fav_res = await db_execute(sb.table("favorites")
+            .select("id, generation_id, created_at")
+            .eq("user_id", user_id)
+            .is_("deleted_at", "null"))
         favs = fav_res.data or []
         fav_gen_ids = {f["generation_id"] for f in favs if f.get("generation_id")}
 
@@ -306,11 +303,10 @@ async def get_daily_goal_cards(user_id: str, sb) -> list:
     today = _today_start().strftime("%Y-%m-%d")
     try:
         today_iso = _today_start().isoformat()
-        res = sb.table("generations") \
-            .select("id", count="exact") \
-            .eq("user_id", user_id) \
-            .gte("created_at", today_iso) \
-            .execute()
+        res = await db_execute(sb.table("generations")
+            .select("id", count="exact")
+            .eq("user_id", user_id)
+            .gte("created_at", today_iso))
 
         count = res.count if hasattr(res, 'count') and res.count is not None else len(res.data or [])
 
@@ -348,14 +344,13 @@ async def get_repurpose_cards(user_id: str, sb) -> list:
     cards = []
     try:
         cutoff = _days_ago(14)
-        res = sb.table("favorites") \
-            .select("id, content, created_at") \
-            .eq("user_id", user_id) \
-            .is_("deleted_at", "null") \
-            .lte("created_at", cutoff) \
-            .order("created_at", desc=True) \
-            .limit(10) \
-            .execute()
+        res = await db_execute(sb.table("favorites")
+            .select("id, content, created_at")
+            .eq("user_id", user_id)
+            .is_("deleted_at", "null")
+            .lte("created_at", cutoff)
+            .order("created_at", desc=True)
+            .limit(10))
 
         old_favs = res.data or []
         if not old_favs:
@@ -404,11 +399,10 @@ async def get_progress_cards(user_id: str, sb) -> list:
     try:
         # Son 14 günün üretimlerini çek
         fourteen_ago = _days_ago(14)
-        res = sb.table("generations") \
-            .select("created_at") \
-            .eq("user_id", user_id) \
-            .gte("created_at", fourteen_ago) \
-            .execute()
+        res = await db_execute(sb.table("generations")
+            .select("created_at")
+            .eq("user_id", user_id)
+            .gte("created_at", fourteen_ago))
 
         all_gens = res.data or []
         if not all_gens:
@@ -493,10 +487,9 @@ async def get_onboarding_cards(user_id: str, sb) -> list:
     cards = []
     try:
         # Toplam generation sayısı
-        gen_res = sb.table("generations") \
-            .select("id", count="exact") \
-            .eq("user_id", user_id) \
-            .execute()
+        gen_res = await db_execute(sb.table("generations")
+            .select("id", count="exact")
+            .eq("user_id", user_id))
         gen_count = gen_res.count if hasattr(gen_res, 'count') and gen_res.count is not None else len(gen_res.data or [])
 
         if gen_count == 0:
@@ -525,10 +518,9 @@ async def get_onboarding_cards(user_id: str, sb) -> list:
             })
 
         # Connected account kontrolü
-        acc_res = sb.table("connected_accounts") \
-            .select("id", count="exact") \
-            .eq("user_id", user_id) \
-            .execute()
+        acc_res = await db_execute(sb.table("connected_accounts")
+            .select("id", count="exact")
+            .eq("user_id", user_id))
         acc_count = acc_res.count if hasattr(acc_res, 'count') and acc_res.count is not None else len(acc_res.data or [])
 
         if acc_count == 0 and gen_count >= 1:
@@ -541,10 +533,9 @@ async def get_onboarding_cards(user_id: str, sb) -> list:
             })
 
         # Style profile kontrolü
-        style_res = sb.table("style_profiles") \
-            .select("id", count="exact") \
-            .eq("user_id", user_id) \
-            .execute()
+        style_res = await db_execute(sb.table("style_profiles")
+            .select("id", count="exact")
+            .eq("user_id", user_id))
         style_count = style_res.count if hasattr(style_res, 'count') and style_res.count is not None else len(style_res.data or [])
 
         if style_count == 0 and gen_count >= 3:
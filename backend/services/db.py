@@ -0,0 +1,64 @@
+"""
+Async DB erişimi - sync supabase-py sorgularını event loop'u bloklamadan çalıştırır.
+
+supabase-py'ın sync client'ı her `.execute()`'ta PostgREST'e blocking HTTP isteği
+atar. `async def` handler içinden direkt çağrılınca o round trip boyunca event loop
+durur ve aynı worker'daki tüm istekler bekler. Burada sorgu sınırlı bir thread
+pool'da çalıştırılır; loop diğer istekleri işlemeye devam eder.
+
+Kullanım:
+    from services.db import db_execute
+
+    result = await db_execute(supabase.table("generations").select("*").eq("user_id", uid))
+    result.data
+
+Sorgu builder'ı her zamanki gibi kurulur, sadece `.execute()` yerine
+`await db_execute(...)` yazılır. Blocking başka bir çağrı için (ör. rpc, storage):
+    await db_call(supabase.storage.from_("media").upload, path, data)
+Sonucu beklenmeyen yazmalar (cache doldurma vb.) için, istek yolunu bekletmeden:
+    db_submit(put_cached_embeddings, supabase, keys, vectors)
+
+Pool boyutu DB_MAX_WORKERS ile ayarlanır (aynı anda açık PostgREST isteği üst sınırı).
+Benchmark: scripts/bench_db_concurrency.py
+"""
+import os
+import asyncio
+import functools
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+DB_MAX_WORKERS = int(os.environ.get("DB_MAX_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="supabase")
+
+
+async def db_execute(query) -> Any:
+    """`query.execute()`'u DB thread pool'unda çalıştır."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, query.execute)
+
+
+async def db_call(fn: Callable, *args, **kwargs) -> Any:
+    """Herhangi bir blocking supabase çağrısını DB thread pool'unda çalıştır."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _log_background_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"Background DB call failed: {future.exception()}")
+
+
+def db_submit(fn: Callable, *args, **kwargs) -> Future:
+    """Blocking çağrıyı DB thread pool'una bırak, bekleme (fire-and-forget). Hata sadece loglanır."""
+    future = _executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_background_error)
+    return future
+
+
+def shutdown_db_executor():
+    """Shutdown'da bekleyen sorguları bitirmeden pool'u kapat."""
+    _executor.shutdown(wait=False, cancel_futures=True)
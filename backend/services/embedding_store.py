@@ -0,0 +1,223 @@
+"""
+Embedding Store - source_tweets.embedding için toplu yazma.
+
+Her vektörü ayrı `update().eq("id")` ile yazmak N tweet = N PostgREST isteği demek.
+Burada bir batch tek RPC ile yazılır (migration 013: bulk_set_source_tweet_embeddings).
+
+Wire format: vektör pgvector text literal'i olarak gönderilir ("[0.0123457,-0.0456789,...]").
+pgvector float4 saklar (~7 anlamlı basamak); 7 basamaktan fazlası zaten atılıyor.
+JSON float listesine göre ~%50 daha küçük payload (1536 boyut: ~30 KB → ~15 KB).
+
+Incremental refresh: her embedding ile birlikte içeriğin normalize hash'i
+(content_hash) yazılır. select_rows_to_embed, hash'i içerikle uyuşmayan
+(yeni / metni değişmiş) satırları seçer; değişmeyenler tekrar embed edilmez.
+
+Global cache (migration 015: embedding_cache): vektörler (model, sha256(clean_for_embedding(text)))
+ile content-addressed saklanır. Aynı viral tweet'i klonlayan N kullanıcı için API bir kez çağrılır;
+source_tweets satırları vektörü DB içinde cache'ten kopyalar (fill_source_tweets_from_cache),
+vektör ağ üzerinden hiç taşınmaz.
+
+Kullanım:
+    from services.embedding_store import save_source_tweet_embeddings
+
+    saved = save_source_tweet_embeddings(supabase, ids, embeddings, hashes)           # sync (script)
+    saved = await db_call(save_source_tweet_embeddings, supabase, ids, embs, hashes)  # async
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from postgrest.types import ReturnMethod
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Tek RPC'de yazılan vektör sayısı (500 × ~15 KB ≈ 7.5 MB istek)
+EMBEDDING_WRITE_CHUNK = int(os.environ.get("EMBEDDING_WRITE_CHUNK", "500"))
+
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f\v]+")
+
+
+def content_hash(text: str) -> str:
+    """
+    Whitespace'i normalize edilmiş içeriğin sha256'sı.
+    Migration 014'teki SQL backfill ile birebir aynı normalizasyon:
+    btrim(regexp_replace(content, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')
+    """
+    normalized = _WHITESPACE_RE.sub(" ", text or "").strip(" ")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def select_rows_to_embed(rows: List[Dict], force: bool = False) -> Tuple[List[Dict], int]:
+    """
+    (id, content, content_hash) satırlarından embed edilmesi gerekenleri seç.
+    Returns: (embed edilecek satırlar — "hash" alanı eklenmiş, atlanan satır sayısı).
+    """
+    pending = []
+    skipped = 0
+    for row in rows:
+        content = row.get("content") or ""
+        if not content.strip():
+            skipped += 1
+            continue
+        digest = content_hash(content)
+        if not force and row.get("content_hash") == digest:
+            skipped += 1
+            continue
+        pending.append({**row, "hash": digest})
+    return pending, skipped
+
+
+def clean_for_embedding(text: str) -> str:
+    """Clean text for embedding generation"""
+    # Remove URLs
+    text = re.sub(r'https?://\S+', '', text)
+    # Remove excessive whitespace
+    text = re.sub(r'\s+', ' ', text).strip()
+    # Truncate to ~8000 chars (model limit safety); rstrip → idempotent (cache key stabil)
+    return text[:8000].rstrip() if text else "empty"
+
+
+def embedding_key(text: str) -> str:
+    """embedding_cache anahtarı: API'ye gönderilen (temizlenmiş) metnin sha256'sı."""
+    return hashlib.sha256(clean_for_embedding(text).encode("utf-8")).hexdigest()
+
+
+def vector_literal(embedding: Sequence[float]) -> str:
+    """float listesi → pgvector text literal (float4 hassasiyetinde)."""
+    return "[" + ",".join(format(x, ".7g") for x in embedding) + "]"
+
+
+def parse_vector(value) -> List[float]:
+    """PostgREST vector kolonunu "[0.1,0.2,...]" string'i olarak döner."""
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+
+# ==================== Global embedding cache ====================
+
+def get_cached_embeddings(supabase_client, keys: List[str], model: str = EMBEDDING_MODEL) -> Dict[str, List[float]]:
+    """embedding_cache'ten key → vektör. Hata olursa boş dict (cache opsiyonel)."""
+    unique = list(dict.fromkeys(keys))
+    if not unique:
+        return {}
+    try:
+        result = supabase_client.table("embedding_cache") \
+            .select("text_hash, embedding") \
+            .eq("model", model) \
+            .in_("text_hash", unique) \
+            .execute()
+        return {row["text_hash"]: parse_vector(row["embedding"]) for row in (result.data or [])}
+    except Exception as e:
+        logger.warning(f"embedding_cache lookup failed: {e}")
+        return {}
+
+
+def put_cached_embeddings(
+    supabase_client,
+    keys: List[str],
+    embeddings: List[Sequence[float]],
+    model: str = EMBEDDING_MODEL,
+):
+    """Yeni üretilen vektörleri embedding_cache'e yaz (varsa dokunma)."""
+    rows = list({
+        key: {"model": model, "text_hash": key, "embedding": vector_literal(embedding)}
+        for key, embedding in zip(keys, embeddings)
+    }.values())
+    for i in range(0, len(rows), EMBEDDING_WRITE_CHUNK):
+        try:
+            supabase_client.table("embedding_cache").upsert(
+                rows[i:i + EMBEDDING_WRITE_CHUNK],
+                on_conflict="model,text_hash",
+                ignore_duplicates=True,
+                returning=ReturnMethod.minimal,
+            ).execute()
+        except Exception as e:
+            logger.warning(f"embedding_cache write failed: {e}")
+
+
+def fill_source_tweets_from_cache(
+    supabase_client,
+    rows: List[Dict],
+    model: str = EMBEDDING_MODEL,
+) -> Set[str]:
+    """
+    select_rows_to_embed çıktısındaki satırlardan cache'te vektörü olanları DB içinde
+    doldur (embedding + content_hash). Returns: doldurulan source_tweets id'leri.
+    """
+    if not rows:
+        return set()
+    try:
+        result = supabase_client.rpc("fill_source_tweets_from_cache", {
+            "p_model": model,
+            "p_ids": [r["id"] for r in rows],
+            "p_keys": [embedding_key(r["content"]) for r in rows],
+            "p_hashes": [r["hash"] for r in rows],
+        }).execute()
+        return {str(row["id"]) if isinstance(row, dict) else str(row) for row in (result.data or [])}
+    except Exception as e:
+        logger.warning(f"fill_source_tweets_from_cache failed: {e}")
+        return set()
+
+
+def _save_one_by_one(
+    supabase_client,
+    ids: List[str],
+    embeddings: List[Sequence[float]],
+    hashes: List[Optional[str]],
+) -> int:
+    """RPC yoksa / chunk reddedildiyse eski yol: satır satır update.
+
+    content_hash sadece hash verildiyse yazılır: migration 014 uygulanmamış DB'de
+    kolon yoktur ve update'e eklenmesi tüm satırları düşürür.
+    """
+    saved = 0
+    for tweet_id, embedding, digest in zip(ids, embeddings, hashes):
+        update = {"embedding": vector_literal(embedding)}
+        if digest is not None:
+            update["content_hash"] = digest
+        try:
+            supabase_client.table("source_tweets") \
+                .update(update) \
+                .eq("id", tweet_id) \
+                .execute()
+            saved += 1
+        except Exception as e:
+            logger.error(f"Failed to save embedding for {tweet_id}: {e}")
+    return saved
+
+
+def save_source_tweet_embeddings(
+    supabase_client,
+    ids: List[str],
+    embeddings: List[Sequence[float]],
+    hashes: Optional[List[Optional[str]]] = None,
+) -> int:
+    """
+    (id, embedding, content_hash) üçlülerini source_tweets'e yaz. Blocking (sync client).
+    hashes verilmezse RPC content_hash'i NULL yazar (bir sonraki refresh'te tekrar embed edilir);
+    satır satır fallback ise kolona dokunmaz.
+    Returns: güncellenen satır sayısı.
+    """
+    if hashes is None:
+        hashes = [None] * len(ids)
+    saved = 0
+    for i in range(0, len(ids), EMBEDDING_WRITE_CHUNK):
+        chunk_ids = list(ids[i:i + EMBEDDING_WRITE_CHUNK])
+        chunk_embeddings = list(embeddings[i:i + EMBEDDING_WRITE_CHUNK])
+        chunk_hashes = list(hashes[i:i + EMBEDDING_WRITE_CHUNK])
+        try:
+            result = supabase_client.rpc("bulk_set_source_tweet_embeddings", {
+                "p_ids": chunk_ids,
+                "p_embeddings": [vector_literal(e) for e in chunk_embeddings],
+                "p_hashes": chunk_hashes,
+            }).execute()
+            saved += int(result.data or 0)
+        except Exception as e:
+            logger.warning(f"Bulk embedding write failed ({len(chunk_ids)} rows), falling back to per-row: {e}")
+            saved += _save_one_by_one(supabase_client, chunk_ids, chunk_embeddings, chunk_hashes)
+    return saved
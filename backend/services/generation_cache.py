@@ -0,0 +1,84 @@
+"""
+Generation Cache - aynı prompt ile tekrar üretimde LLM çağrısını atlar.
+
+Key: sha256(user, model, system prompt, user prompt, temperature schedule, variant count, extra).
+_select_builder aynı ayarlar için byte-identical system prompt ürettiğinden,
+kullanıcı aynı konu/persona/ton/uzunluk kombinasyonunu tekrar çalıştırınca
+sonuç milisaniyede döner ve DAILY_TOKEN_LIMIT'ten harcanmaz.
+
+Kullanıcı bazında izole: iki kullanıcı aynı prompt'u girse bile aynı tweet'i almaz.
+"Yeniden üret" (regenerate) için engine'e cache=False geçilir.
+"""
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CACHE_TTL = int(os.environ.get("GENERATION_CACHE_TTL", "900"))  # 15 dakika
+GENERATION_CACHE_SIZE = int(os.environ.get("GENERATION_CACHE_SIZE", "1000"))
+
+
+class GenerationCache:
+    """TTL + LRU eviction'lı in-process cache. Value: (variants, tokens_used)."""
+
+    def __init__(self, max_size: int = GENERATION_CACHE_SIZE, ttl: int = GENERATION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, List[str], int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        user_id: Optional[str],
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperatures: List[float],
+        variants: int,
+        extra: str = "",
+    ) -> str:
+        fingerprint = "\x1f".join([
+            user_id or "",
+            model,
+            system_prompt,
+            user_prompt,
+            ",".join(f"{t:.3f}" for t in temperatures),
+            str(variants),
+            extra,
+        ])
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[str], int]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, variants, tokens = entry
+        if time.time() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(variants), tokens
+
+    def put(self, key: str, variants: List[str], tokens: int):
+        if not variants or not all(variants):
+            return  # Boş/eksik sonuçları cache'leme
+        self._entries[key] = (time.time(), list(variants), tokens)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+generation_cache = GenerationCache()
@@ -0,0 +1,124 @@
+"""
+Generation Streaming - /generate endpoint'leri için opt-in SSE modu.
+
+Kullanım:
+    from services.generation_stream import streamable
+
+    @router.post("/generate/something", response_model=GenerationResponse)
+    @streamable
+    async def handler(request: SomeRequest, user=Depends(require_auth)):
+        ...
+
+`?stream=true` ile çağrılınca endpoint text/event-stream döner:
+    event: token  → {"variant_index": 0, "delta": "..."}   (model token'ları geldikçe)
+    event: done   → endpoint'in normal JSON cevabı (GenerationResponse, generation_id dahil)
+    event: error  → {"status_code": 500, "detail": "..."}
+
+stream param'ı yoksa endpoint aynen eskisi gibi çalışır.
+Token'lar generation engine'lerinden (generate_with_openai / generate_with_openrouter)
+bir ContextVar üzerinden gelir; route kodunun stream'den haberi olmaz.
+Üretilen variant'ları sonradan eleyen / yeniden sıralayan yollar (Style Lab ranking)
+üretimi `with suppressed_token_stream():` içinde çalıştırır: token index'leri final
+variant'larla eşleşmez, bu yüzden o isteklerde sadece `done` gelir.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Aktif stream'in token kuyruğu (stream modunda değilse None)
+_token_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar("generation_token_sink", default=None)
+
+
+def is_streaming() -> bool:
+    """Mevcut generation bir SSE stream'i içinde mi çalışıyor?"""
+    return _token_sink.get() is not None
+
+
+def emit_token(variant_index: int, delta: str):
+    """Engine'den gelen token parçasını aktif stream'e ilet (stream yoksa no-op)."""
+    queue = _token_sink.get()
+    if queue is not None and delta:
+        queue.put_nowait({"variant_index": variant_index, "delta": delta})
+
+
+@contextmanager
+def suppressed_token_stream():
+    """Blok içinde başlatılan üretimler token yollamaz (stream açık olsa da)."""
+    ctx_token = _token_sink.set(None)
+    try:
+        yield
+    finally:
+        _token_sink.reset(ctx_token)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_events(run):
+    """Endpoint'i arka planda çalıştır, token'ları geldikçe, sonucu en sonda yolla."""
+    queue: asyncio.Queue = asyncio.Queue()
+    ctx_token = _token_sink.set(queue)
+    try:
+        # create_task mevcut context'i kopyalar → engine'ler bu kuyruğu görür
+        task = asyncio.create_task(run())
+    finally:
+        _token_sink.reset(ctx_token)
+
+    try:
+        while not task.done():
+            getter = asyncio.create_task(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield _sse("token", getter.result())
+            else:
+                getter.cancel()
+
+        while not queue.empty():
+            yield _sse("token", queue.get_nowait())
+
+        try:
+            result = task.result()
+        except HTTPException as e:
+            yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            logger.error(f"Streaming generation error: {e}")
+            yield _sse("error", {"status_code": 500, "detail": "Bir hata oluştu. Lütfen tekrar deneyin."})
+            return
+
+        yield _sse("done", jsonable_encoder(result))
+    finally:
+        # Client bağlantıyı kestiyse üretimi boşuna sürdürme
+        if not task.done():
+            task.cancel()
+
+
+def streamable(endpoint):
+    """Endpoint'e opsiyonel `stream: bool = False` query param'ı ekler."""
+    signature = inspect.signature(endpoint)
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, stream: bool = False, **kwargs):
+        if not stream:
+            return await endpoint(*args, **kwargs)
+        return StreamingResponse(
+            _sse_events(lambda: endpoint(*args, **kwargs)),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    stream_param = inspect.Parameter("stream", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool)
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), stream_param])
+    return wrapper
@@ -0,0 +1,336 @@
+"""
+LLM Gateway - tüm LLM çağrıları için tek giriş noktası.
+
+Sağladıkları:
+- Paylaşılan keep-alive connection pool (async + sync httpx client, provider başına tek SDK client)
+- Provider ve model bazlı concurrency limiti (semaphore)
+- İki şerit (lane): "interactive" (kullanıcı bekliyor) ve "background" (cron, enrichment).
+  Background çağrılar provider kapasitesinin en fazla LLM_BACKGROUND_CONCURRENCY kadarını
+  kullanabilir → trend cron'u patladığında interaktif üretime her zaman yer kalır.
+- 429'da adaptif backoff: Retry-After header'ı varsa ona uyar, yoksa exponential + jitter.
+  Provider'a bir cooldown yazılır, aynı anda bekleyen diğer çağrılar da bu süreye uyar.
+- Circuit breaker (provider + model başına): art arda LLM_BREAKER_THRESHOLD hata (5xx / timeout / bağlantı;
+  429 hariç) → o model LLM_BREAKER_COOLDOWN sn boyunca fail-fast (CircuitOpenError), sonra tek bir deneme
+  çağrısıyla (half-open) tekrar açılır. Yavaş bir model aynı provider'daki fallback modeli kilitlemez.
+
+Kullanım:
+    from services.llm_gateway import llm_gateway
+
+    response = await llm_gateway.chat("openai", model="gpt-4o-mini", messages=[...])
+    response = await llm_gateway.chat("openai", lane="background", model=..., messages=[...])
+
+    # Streaming vb. özel çağrılar için limit + retry + breaker ile sarmalama:
+    result = await llm_gateway.run("openrouter", model, lambda: _chat_completion(client, ...))
+
+    # Limitsiz, sadece paylaşılan pool isteyen (sync) kod:
+    client = llm_gateway.sync_client("openai")
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from openai import AsyncOpenAI, OpenAI, RateLimitError, APIStatusError, APIConnectionError, APITimeoutError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROVIDERS = {
+    "openai": {"api_key_env": "OPENAI_API_KEY", "base_url": None},
+    "openrouter": {"api_key_env": "OPENROUTER_API_KEY", "base_url": "https://openrouter.ai/api/v1"},
+}
+
+LANES = ("interactive", "background")
+
+# Provider başına aynı anda açık LLM çağrısı (eski server.LLM_MAX_CONCURRENCY ile aynı env)
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+# Tek bir model için üst limit (provider limitinin altında kalır)
+LLM_MODEL_CONCURRENCY = int(os.environ.get("LLM_MODEL_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+# Background lane'in provider başına kullanabileceği slot sayısı
+LLM_BACKGROUND_CONCURRENCY = int(os.environ.get("LLM_BACKGROUND_CONCURRENCY", "2"))
+
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "50"))
+LLM_KEEPALIVE = int(os.environ.get("LLM_KEEPALIVE", "20"))
+
+LLM_RATE_LIMIT_RETRIES = int(os.environ.get("LLM_RATE_LIMIT_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "30"))
+
+# 5xx / timeout / bağlantı hatası için tekrar deneme (SDK retry'ı kapalı; eski SDK varsayılanı 2)
+LLM_RETRIES = int(os.environ.get("LLM_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+
+LLM_BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Provider/model circuit breaker açık; çağrı hiç gönderilmedi."""
+
+    def __init__(self, provider: str, retry_in: float, model: str = ""):
+        target = f"{provider}/{model}" if model else provider
+        super().__init__(f"LLM '{target}' temporarily unavailable (retry in {retry_in:.0f}s)")
+        self.provider = provider
+        self.model = model
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """closed → (threshold hata) → open → (cooldown) → half-open → başarı: closed / hata: open."""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self, provider: str, model: str = "") -> bool:
+        """Returns True → bu çağrı half-open deneme çağrısı (bitince release_probe çağrılmalı)."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        retry_in = max(0.0, self.cooldown - (time.monotonic() - (self.opened_at or 0)))
+        raise CircuitOpenError(provider, retry_in, model)
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self, provider: str):
+        self.failures += 1
+        if self._probe_in_flight or self.failures >= self.threshold:
+            if self.opened_at is None or self._probe_in_flight:
+                logger.warning(f"LLM circuit opened for {provider} after {self.failures} failures")
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """Deneme çağrısı sonuçsuz bitti (iptal, 4xx, 429) → breaker half-open kalır, sıradaki çağrı dener."""
+        self._probe_in_flight = False
+
+
+def _is_retryable_status(exc: Exception) -> bool:
+    return isinstance(exc, APIStatusError) and exc.status_code >= 500
+
+
+def _counts_as_failure(exc: Exception) -> bool:
+    """Breaker'ı besleyen hatalar: provider tarafı (5xx, timeout, bağlantı).
+    429 hariç (kendi backoff/cooldown yolu var), 4xx istek hataları hariç."""
+    return isinstance(exc, (APIConnectionError, APITimeoutError)) or _is_retryable_status(exc)
+
+
+def _retry_after(exc: RateLimitError) -> Optional[float]:
+    try:
+        value = exc.response.headers.get("retry-after")
+        return float(value) if value else None
+    except (AttributeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    def __init__(self):
+        self._http: Optional[httpx.AsyncClient] = None
+        self._sync_http: Optional[httpx.Client] = None
+        self._async_clients: Dict[Tuple[str, str], AsyncOpenAI] = {}
+        self._sync_clients: Dict[Tuple[str, str], OpenAI] = {}
+        self._provider_sems: Dict[str, asyncio.Semaphore] = {}
+        self._model_sems: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._background_sems: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._cooldown_until: Dict[str, float] = {}
+        self.calls = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.rejected = 0
+
+    # ── Connection pools / clients ──
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Paylaşılan async HTTP client (OpenAI SDK'ları ve raw httpx çağrıları bunu kullanır)."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_KEEPALIVE),
+            )
+        return self._http
+
+    def _sync_pool(self) -> httpx.Client:
+        if self._sync_http is None or self._sync_http.is_closed:
+            self._sync_http = httpx.Client(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_KEEPALIVE),
+            )
+        return self._sync_http
+
+    def _api_key(self, provider: str, api_key: Optional[str]) -> str:
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {provider}")
+        key = api_key or os.environ.get(PROVIDERS[provider]["api_key_env"])
+        if not key:
+            raise ValueError(f"{PROVIDERS[provider]['api_key_env']} is not configured")
+        return key
+
+    def async_client(self, provider: str = "openai", api_key: Optional[str] = None) -> AsyncOpenAI:
+        """Provider için paylaşılan AsyncOpenAI (SDK retry kapalı; retry'ı gateway yapar)."""
+        key = self._api_key(provider, api_key)
+        client = self._async_clients.get((provider, key))
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=key,
+                base_url=PROVIDERS[provider]["base_url"],
+                http_client=self.http,
+                max_retries=0,
+            )
+            self._async_clients[(provider, key)] = client
+        return client
+
+    def sync_client(self, provider: str = "openai", api_key: Optional[str] = None) -> OpenAI:
+        """Provider için paylaşılan sync OpenAI client (sync route'lar için, aynı keep-alive pool)."""
+        key = self._api_key(provider, api_key)
+        client = self._sync_clients.get((provider, key))
+        if client is None:
+            client = OpenAI(api_key=key, base_url=PROVIDERS[provider]["base_url"], http_client=self._sync_pool())
+            self._sync_clients[(provider, key)] = client
+        return client
+
+    def forget_key(self, provider: str):
+        """Key rotation sonrası eski client'ları bırak (pool paylaşıldığı için kapatılmaz)."""
+        self._async_clients = {k: v for k, v in self._async_clients.items() if k[0] != provider}
+        self._sync_clients = {k: v for k, v in self._sync_clients.items() if k[0] != provider}
+
+    # ── Concurrency / backoff / breaker ──
+
+    def _breaker(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        if key not in self._breakers:
+            self._breakers[key] = CircuitBreaker()
+        return self._breakers[key]
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model: str, lane: str = "interactive"):
+        """Provider + model semaphore'u (background lane'de ek olarak lane semaphore'u)."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        provider_sem = self._provider_sems.setdefault(provider, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+        model_sem = self._model_sems.setdefault((provider, model), asyncio.Semaphore(LLM_MODEL_CONCURRENCY))
+
+        if lane == "background":
+            background_sem = self._background_sems.setdefault(provider, asyncio.Semaphore(LLM_BACKGROUND_CONCURRENCY))
+            async with background_sem, provider_sem, model_sem:
+                yield
+        else:
+            async with provider_sem, model_sem:
+                yield
+
+    async def _wait_cooldown(self, provider: str):
+        remaining = self._cooldown_until.get(provider, 0) - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def run(
+        self,
+        provider: str,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        lane: str = "interactive",
+        retries: int = LLM_RETRIES,
+    ) -> T:
+        """call()'ı limitler altında çalıştır; 429'da backoff'la, 5xx / timeout / bağlantı
+        hatasında en fazla `retries` kez jitter'lı backoff'la tekrar dene, breaker'ı güncelle.
+
+        Token stream eden çağrılar retries=0 vermeli: yarıda kesilen stream tekrar
+        denenirse aynı token'lar ikinci kez yollanır.
+        """
+        breaker = self._breaker(provider, model)
+        label = f"{provider}/{model}"
+        attempt = 0
+        error_attempt = 0
+        while True:
+            try:
+                probing = breaker.before_call(provider, model)
+            except CircuitOpenError:
+                self.rejected += 1
+                raise
+
+            try:
+                await self._wait_cooldown(provider)
+                async with self.slot(provider, model, lane):
+                    self.calls += 1
+                    result = await call()
+            except RateLimitError as e:
+                self.rate_limited += 1
+                if attempt >= LLM_RATE_LIMIT_RETRIES:
+                    raise
+                delay = _retry_after(e) or min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))
+                delay += random.uniform(0, delay * 0.25)
+                self._cooldown_until[provider] = max(self._cooldown_until.get(provider, 0), time.monotonic() + delay)
+                logger.warning(f"LLM 429 from {provider}/{model} ({lane}), retry {attempt + 1} in {delay:.1f}s")
+                attempt += 1
+                continue
+            except Exception as e:
+                if not _counts_as_failure(e):
+                    raise
+                # Breaker çağrı başına bir hata görür (retry'lar tükenince); deneme çağrısı tekrarlanmaz
+                if probing or error_attempt >= retries:
+                    breaker.record_failure(label)
+                    raise
+                delay = min(LLM_BACKOFF_MAX, LLM_RETRY_BASE_DELAY * (2 ** error_attempt))
+                delay += random.uniform(0, delay * 0.25)
+                self.retried += 1
+                logger.warning(f"LLM {type(e).__name__} from {label} ({lane}), retry {error_attempt + 1} in {delay:.1f}s")
+                error_attempt += 1
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                # İptal (CancelledError: hedge kaybedeni, speculative retry, early exit), 4xx, 429:
+                # deneme hakkı bırakılmazsa breaker sonsuza kadar açık kalır
+                if probing:
+                    breaker.release_probe()
+            await asyncio.sleep(delay)
+
+    async def chat(self, provider: str = "openai", lane: str = "interactive", api_key: Optional[str] = None, **params):
+        """chat.completions.create (paylaşılan client + limit + 429 backoff + breaker)."""
+        client = self.async_client(provider, api_key)
+        return await self.run(provider, params.get("model", ""), lambda: client.chat.completions.create(**params), lane)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "breakers": {f"{p}/{m}": b.state for (p, m), b in self._breakers.items()},
+        }
+
+    async def aclose(self):
+        """Shutdown'da pool'ları kapat."""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        if self._sync_http is not None and not self._sync_http.is_closed:
+            self._sync_http.close()
+        self._async_clients.clear()
+        self._sync_clients.clear()
+
+
+llm_gateway = LLMGateway()
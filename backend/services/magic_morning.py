@@ -14,12 +14,11 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional
 import uuid
 
-from openai import OpenAI
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
-
 
 def _get_supabase():
     from server import supabase
@@ -84,7 +83,8 @@ async def _generate_evergreen_drafts(user_id: str, niches: list, brand_voice: di
     niche_str = ", ".join(niches[:5]) if niches else "genel"
 
     try:
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat(
+            "openai",
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"""Bugün gündemde öne çıkan bir trend yok. Kullanıcının nişlerine ve sesine uygun 3 zamansız (evergreen) tweet taslağı üret.
@@ -126,7 +126,7 @@ JSON: {{"drafts": [{{"content": "...", "insight": "Neden bu konu her zaman geçe
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
         try:
-            sb.table("daily_drafts").insert(doc).execute()
+            await db_execute(sb.table("daily_drafts").insert(doc))
             saved.append(doc)
         except Exception as e:
             logger.error(f"Evergreen draft save error: {e}")
@@ -144,23 +144,21 @@ async def generate_magic_morning(user_id: str, platform: str = "twitter") -> dic
 
     # 1. Bugünkü taslaklar var mı? (cache check)
     today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    existing = sb.table("daily_drafts") \
-        .select("*") \
-        .eq("user_id", user_id) \
-        .gte("created_at", today_start.isoformat()) \
-        .order("created_at", desc=False) \
-        .limit(5) \
-        .execute()
+    existing = await db_execute(sb.table("daily_drafts")
+        .select("*")
+        .eq("user_id", user_id)
+        .gte("created_at", today_start.isoformat())
+        .order("created_at", desc=False)
+        .limit(5))
 
     if existing.data and len(existing.data) >= 3:
         return {"drafts": existing.data, "cached": True}
 
     # 2. Kullanıcının profil bilgilerini çek
-    profile = sb.table("user_settings") \
-        .select("display_name, niches, brand_voice") \
-        .eq("user_id", user_id) \
-        .limit(1) \
-        .execute()
+    profile = await db_execute(sb.table("user_settings")
+        .select("display_name, niches, brand_voice")
+        .eq("user_id", user_id)
+        .limit(1))
 
     niches = []
     brand_voice = {}
@@ -172,14 +170,13 @@ async def generate_magic_morning(user_id: str, platform: str = "twitter") -> dic
 
     # 3. Trendleri çek (son 48h, score >= 60)
     cutoff = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat()
-    trend_query = sb.table("trends") \
-        .select("id, topic, summary, keywords, content_angle, category, score, url") \
-        .eq("is_visible", True) \
-        .gte("created_at", cutoff) \
-        .gte("score", 60) \
-        .order("score", desc=True) \
-        .limit(20) \
-        .execute()
+    trend_query = await db_execute(sb.table("trends")
+        .select("id, topic, summary, keywords, content_angle, category, score, url")
+        .eq("is_visible", True)
+        .gte("created_at", cutoff)
+        .gte("score", 60)
+        .order("score", desc=True)
+        .limit(20))
 
     trends = trend_query.data or []
     if not trends:
@@ -237,7 +234,8 @@ async def generate_magic_morning(user_id: str, platform: str = "twitter") -> dic
         trends_block += f"Kategori: {t.get('category', '')}\n"
 
     try:
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat(
+            "openai",
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"""Sen bir sosyal medya içerik asistanısın.
@@ -298,7 +296,7 @@ JSON formatı:
         }
 
         try:
-            sb.table("daily_drafts").insert(doc).execute()
+            await db_execute(sb.table("daily_drafts").insert(doc))
             saved_drafts.append(doc)
         except Exception as e:
             logger.error(f"Draft save error: {e}")
@@ -0,0 +1,181 @@
+"""
+Model Router - OpenRouter çağrıları için latency takibi ve hedged request.
+
+Her model için son N çağrının latency'si tutulur (rolling window). Bir çağrı
+primary modelin p90'ını aşınca eşdeğer fallback modele aynı istek ikinci kez
+(hedge) gönderilir; hangisi önce cevap verirse o alınır, diğeri iptal edilir.
+Latency penceresine başarıyla tamamlanan çağrılar girer; hedge'e kaybedip iptal edilen
+çağrı geçen süresiyle censored örnek olarak girer (gerçek süresi en az bu kadar).
+Hatalar / circuit reddi girmez.
+Süre sınırı: tek çağrı için timeout, bir çağrı zinciri (ilk deneme + retry'lar)
+için ortak mutlak deadline (time.monotonic()) verilir.
+
+Kullanım:
+    from services.model_router import model_router
+
+    model_used, result = await model_router.hedged(
+        primary="google/gemini-3-flash-preview",
+        fallback="google/gemini-2.5-flash",
+        call=lambda model: some_llm_call(model),
+        deadline=time.monotonic() + V2_CALL_TIMEOUT,
+    )
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+V2_HEDGE_ENABLED = os.environ.get("V2_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+V2_HEDGE_PERCENTILE = float(os.environ.get("V2_HEDGE_PERCENTILE", "90"))
+# Yeterli örnek yokken kullanılacak hedge gecikmesi (sn)
+V2_HEDGE_DEFAULT_DELAY = float(os.environ.get("V2_HEDGE_DEFAULT_DELAY", "6"))
+# p90 ne olursa olsun hedge bu aralıkta tetiklenir
+V2_HEDGE_MIN_DELAY = float(os.environ.get("V2_HEDGE_MIN_DELAY", "1.5"))
+V2_HEDGE_MAX_DELAY = float(os.environ.get("V2_HEDGE_MAX_DELAY", "12"))
+# /v2/generate/* isteğinin tüm LLM zinciri (ilk deneme + empty/strict retry) için üst süre
+V2_CALL_TIMEOUT = float(os.environ.get("V2_CALL_TIMEOUT", "45"))
+
+LATENCY_WINDOW = int(os.environ.get("MODEL_LATENCY_WINDOW", "200"))
+LATENCY_MIN_SAMPLES = int(os.environ.get("MODEL_LATENCY_MIN_SAMPLES", "20"))
+
+
+class LatencyTracker:
+    """Model başına son LATENCY_WINDOW çağrının süresi (sn)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = LATENCY_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._censored: Dict[str, int] = {}
+
+    def record(self, model: str, seconds: float, censored: bool = False):
+        """censored=True: çağrı bitmeden iptal edildi, seconds gerçek sürenin alt sınırı."""
+        if model not in self._samples:
+            self._samples[model] = deque(maxlen=self.window)
+        self._samples[model].append(seconds)
+        if censored:
+            self._censored[model] = self._censored.get(model, 0) + 1
+
+    def percentile(self, model: str, p: float) -> Optional[float]:
+        """p. percentile (nearest-rank); yeterli örnek yoksa None."""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[rank]
+
+    def stats(self) -> dict:
+        return {
+            model: {
+                "samples": len(samples),
+                "censored": self._censored.get(model, 0),
+                "p50": self.percentile(model, 50),
+                "p90": self.percentile(model, 90),
+                "p99": self.percentile(model, 99),
+            }
+            for model, samples in self._samples.items()
+        }
+
+
+class ModelRouter:
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self, model: str) -> float:
+        observed = self.latency.percentile(model, V2_HEDGE_PERCENTILE)
+        delay = observed if observed is not None else V2_HEDGE_DEFAULT_DELAY
+        return min(V2_HEDGE_MAX_DELAY, max(V2_HEDGE_MIN_DELAY, delay))
+
+    async def _timed(self, model: str, call: Callable[[str], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        try:
+            result = await call(model)
+        except asyncio.CancelledError:
+            # Hedge'e kaybeden (veya deadline'da kesilen) çağrı: gerçek süre >= geçen süre.
+            # Düşürülürse pencerede sadece hızlı cevaplar kalır, p90 aşağı kayar, hedge sıklaşır.
+            self.latency.record(model, time.monotonic() - started, censored=True)
+            raise
+        # Hata / circuit reddi (~0ms) kaydedilmez: cevap süresi değil, p90'ı aşağı çeker
+        self.latency.record(model, time.monotonic() - started)
+        return result
+
+    async def _race(
+        self,
+        primary: str,
+        fallback: Optional[str],
+        call: Callable[[str], Awaitable[T]],
+    ) -> Tuple[str, T]:
+        primary_task = asyncio.create_task(self._timed(primary, call))
+        if not fallback or not V2_HEDGE_ENABLED:
+            return primary, await primary_task
+
+        tasks: Dict[asyncio.Task, str] = {primary_task: primary}
+        try:
+            delay = self.hedge_delay(primary)
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if not done:
+                self.hedges_fired += 1
+                logger.info(f"Hedging {primary} → {fallback} after {delay:.1f}s")
+                tasks[asyncio.create_task(self._timed(fallback, call))] = fallback
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if winner != primary:
+                            self.hedges_won += 1
+                        return winner, task.result()
+                    last_error = task.exception()
+                    # Primary erken hata verdiyse fallback'i beklemeden başlat
+                    if tasks[task] == primary and len(tasks) == 1:
+                        self.hedges_fired += 1
+                        fallback_task = asyncio.create_task(self._timed(fallback, call))
+                        tasks[fallback_task] = fallback
+                        pending.add(fallback_task)
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def hedged(
+        self,
+        primary: str,
+        fallback: Optional[str],
+        call: Callable[[str], Awaitable[T]],
+        timeout: float = V2_CALL_TIMEOUT,
+        deadline: Optional[float] = None,
+    ) -> Tuple[str, T]:
+        """call(model)'i primary ile çalıştır, p90'ı aşarsa fallback ile yarıştır.
+
+        deadline (time.monotonic() cinsinden) verilirse timeout yerine o kullanılır;
+        aynı deadline'ı paylaşan retry'lar toplamda onu aşamaz.
+        Returns (cevap veren model, sonuç). Süre aşılırsa asyncio.TimeoutError.
+        """
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+        return await asyncio.wait_for(self._race(primary, fallback, call), timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "latency": self.latency.stats(),
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,85 @@
+"""
+Single-flight - aynı anda gelen birebir aynı /generate isteklerini birleştirir.
+
+Çift tıklama / frontend retry aynı payload'ı milisaniyeler içinde tekrar yollar.
+Key: sha256(route, user_id, normalize edilmiş request body + query param'lar).
+Aynı key ile devam eden bir üretim varsa yeni istek LLM'i tekrar çağırmaz ve
+generations'a ikinci satır yazmaz; ilk isteğin sonucunu (aynı generation_id) alır.
+Hata da aynı şekilde tüm bekleyenlere döner.
+
+Sadece in-flight istekler birleşir; üretim bitince key silinir
+(tamamlanmış sonuçlar için bkz. services/generation_cache).
+
+Kullanım (streamable'ın altında):
+    @router.post("/generate/something", response_model=GenerationResponse)
+    @streamable
+    @single_flight
+    async def handler(request: SomeRequest, user=Depends(require_auth)):
+        ...
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+_JSON_SCALARS = (str, int, float, bool, type(None), list, dict)
+# Key'e girmeyen param'lar: user ayrıca eklenir, "_" rate_limit dependency sonucu
+_SKIP_PARAMS = {"user", "_"}
+
+_in_flight: Dict[str, asyncio.Task] = {}
+stats = {"leaders": 0, "coalesced": 0}
+
+
+def _request_key(route: str, bound: inspect.BoundArguments) -> Optional[str]:
+    user = bound.arguments.get("user")
+    user_id = getattr(user, "id", None)
+    if not user_id:
+        return None  # Kullanıcısız istekler birleştirilmez
+
+    payload = {}
+    for name, value in bound.arguments.items():
+        if name in _SKIP_PARAMS:
+            continue
+        if isinstance(value, BaseModel):
+            payload[name] = value.model_dump(mode="json")
+        elif isinstance(value, _JSON_SCALARS):
+            payload[name] = value
+        # Request, UploadFile vb. dependency objeleri key'e girmez
+
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{route}\x1f{user_id}\x1f{body}".encode("utf-8")).hexdigest()
+
+
+def single_flight(endpoint):
+    """Eş zamanlı duplicate istekleri tek bir endpoint çalışmasına bağla."""
+    signature = inspect.signature(endpoint)
+    route = f"{endpoint.__module__}.{endpoint.__qualname__}"
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind_partial(*args, **kwargs)
+        key = _request_key(route, bound)
+        if key is None:
+            return await endpoint(*args, **kwargs)
+
+        task = _in_flight.get(key)
+        if task is None:
+            stats["leaders"] += 1
+            task = asyncio.create_task(endpoint(*args, **kwargs))
+            _in_flight[key] = task
+            task.add_done_callback(lambda _t: _in_flight.pop(key, None))
+        else:
+            stats["coalesced"] += 1
+            logger.info(f"Single-flight: coalesced duplicate {endpoint.__name__} request")
+
+        # shield: bir bekleyenin bağlantısı koparsa diğerlerinin üretimi iptal olmaz
+        return await asyncio.shield(task)
+
+    return wrapper
@@ -0,0 +1,102 @@
+"""
+Stage Pipeline - LLM çağrısından önceki hazırlık adımları için küçük bir DAG çalıştırıcı.
+
+Her stage bir isim, bir fonksiyon ve bağımlı olduğu stage'lerden oluşur.
+Bağımlılığı olmayan stage'ler aynı anda başlar; bir stage, bağımlılıkları
+bittiği anda çalışır. Sync fonksiyonlar (supabase select gibi blocking çağrılar)
+thread pool'da çalıştırılır, böylece event loop'u tutmazlar.
+
+Kullanım:
+    pipeline = StagePipeline([
+        Stage("brand_voice", load_brand_voice),
+        Stage("profile", load_profile),
+        Stage("references", load_references, deps=("profile",), optional=True),
+        Stage("prompt", build_prompt, deps=("brand_voice", "profile", "references")),
+    ])
+    run = await pipeline.run(ctx)
+    run.results["prompt"], run.timings  # {"brand_voice": 12.3, ...} (ms)
+
+Stage fonksiyonu tek argüman alır: PipelineRun (ctx + önceki stage sonuçları).
+optional=True olan stage hata verirse sonucu `default` olur ve pipeline devam eder.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[["PipelineRun"], Any]
+    deps: Tuple[str, ...] = ()
+    optional: bool = False
+    default: Any = None
+
+
+@dataclass
+class PipelineRun:
+    ctx: Dict[str, Any]
+    results: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.results[name]
+
+    def timings_str(self) -> str:
+        return " ".join(f"{name}={ms:.0f}ms" for name, ms in self.timings.items())
+
+
+class StagePipeline:
+    def __init__(self, stages: List[Stage]):
+        names = [s.name for s in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names: {names}")
+        # Bağımlılıklar listede daha önce tanımlanmış olmalı → döngü olamaz
+        seen = set()
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in seen]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on undefined/later stages: {missing}")
+            seen.add(stage.name)
+        self.stages = stages
+
+    async def _run_stage(self, stage: Stage, run: PipelineRun, tasks: Dict[str, asyncio.Task]):
+        if stage.deps:
+            await asyncio.gather(*(tasks[d] for d in stage.deps))
+
+        started = time.monotonic()
+        try:
+            if inspect.iscoroutinefunction(stage.fn):
+                result = await stage.fn(run)
+            else:
+                result = await asyncio.to_thread(stage.fn, run)
+        except Exception as e:
+            if not stage.optional:
+                raise
+            logger.warning(f"Stage '{stage.name}' failed (optional, continuing): {e}")
+            result = stage.default
+        finally:
+            run.timings[stage.name] = (time.monotonic() - started) * 1000
+
+        run.results[stage.name] = result
+        return result
+
+    async def run(self, ctx: Dict[str, Any]) -> PipelineRun:
+        run = PipelineRun(ctx=ctx)
+        tasks: Dict[str, asyncio.Task] = {}
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.create_task(self._run_stage(stage, run, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        # Sonuç sırası tanım sırasına göre (log okunurluğu için)
+        run.timings = {s.name: run.timings[s.name] for s in self.stages if s.name in run.timings}
+        return run
@@ -1,17 +1,43 @@
-"""Style RAG v2 - Smart few-shot example selection using pgvector"""
+"""Style RAG v2 - Smart few-shot example selection using pgvector
+
+openai_client verilmezse LLM gateway'in process genelindeki AsyncOpenAI client'ı
+kullanılır (warm keep-alive pool; her istekte yeni client / TLS handshake yok).
+
+Embedding'ler önce global embedding_cache'e bakar (services/embedding_store, migration 015);
+OpenAI sadece daha önce hiç embed edilmemiş metinler için çağrılır. Topic embedding'i
+ayrıca process içi LRU'da tutulur (services/topic_embedding_cache).
+"""
 import logging
-import re
 import math
 from typing import List, Dict, Any, Optional
 
+from services.llm_gateway import llm_gateway
+from services.db import db_call, db_execute, db_submit
+from services.embedding_store import (
+    EMBEDDING_MODEL,
+    clean_for_embedding as _clean_for_embedding,
+    embedding_key,
+    fill_source_tweets_from_cache,
+    get_cached_embeddings,
+    put_cached_embeddings,
+    save_source_tweet_embeddings,
+    select_rows_to_embed,
+)
+from services.topic_embedding_cache import topic_embedding_cache
+from services.vector_index import search_source_tweets, source_vector_index
+
 logger = logging.getLogger(__name__)
 
 
+def _resolve_client(openai_client):
+    return openai_client if openai_client is not None else llm_gateway.async_client("openai")
+
+
 async def get_style_examples(
     topic: str,
     source_id: str,
     supabase_client,
-    openai_client,
+    openai_client=None,
     limit: int = 15,
     strategy: str = "hybrid"  # similarity, viral, hybrid
 ) -> List[dict]:
@@ -28,7 +54,7 @@ async def get_style_examples(
             return await _get_viral_examples(source_id, supabase_client, limit)
         
         # Get topic embedding
-        topic_embedding = await _get_embedding(topic, openai_client)
+        topic_embedding = await _get_embedding(topic, openai_client, supabase_client)
         if not topic_embedding:
             logger.warning("Failed to get topic embedding, falling back to viral strategy")
             return await _get_viral_examples(source_id, supabase_client, limit)
@@ -61,26 +87,24 @@ async def get_style_examples(
 async def generate_embeddings_for_source(
     source_id: str,
     supabase_client,
-    openai_client,
+    openai_client=None,
     batch_size: int = 100
 ) -> Dict[str, Any]:
     """
-    Generate embeddings for all source_tweets that don't have them yet.
-    Returns stats about the operation.
+    Generate embeddings for source_tweets that are new or whose content changed
+    (content_hash mismatch). Returns stats: processed = embedded, skipped = unchanged.
     """
-    stats = {"total": 0, "processed": 0, "errors": 0, "skipped": 0}
+    stats = {"total": 0, "processed": 0, "errors": 0, "skipped": 0, "cache_hits": 0}
     
     try:
-        # Fetch tweets without embeddings
-        result = supabase_client.table("source_tweets") \
-            .select("id, content") \
-            .eq("source_id", source_id) \
-            .is_("embedding", "null") \
-            .limit(5000) \
-            .execute()
+        # Yeni / içeriği değişmiş tweet'ler (content_hash uyuşmayanlar); değişmeyenler atlanır
+        result = await db_execute(supabase_client.table("source_tweets")
+            .select("id, content, content_hash")
+            .eq("source_id", source_id)
+            .limit(5000))
         
-        tweets = result.data if result.data else []
-        stats["total"] = len(tweets)
+        tweets, stats["skipped"] = select_rows_to_embed(result.data or [])
+        stats["total"] = len(tweets) + stats["skipped"]
         
         if not tweets:
             logger.info(f"No tweets need embeddings for source {source_id}")
@@ -91,35 +115,43 @@ async def generate_embeddings_for_source(
         # Process in batches
         for i in range(0, len(tweets), batch_size):
             batch = tweets[i:i + batch_size]
-            texts = [_clean_for_embedding(t["content"]) for t in batch]
             
             try:
-                response = await openai_client.embeddings.create(
-                    model="text-embedding-3-small",
+                # Cache'te vektörü olanlar DB içinde kopyalanır (API + vektör transferi yok)
+                filled = await db_call(fill_source_tweets_from_cache, supabase_client, batch)
+                stats["processed"] += len(filled)
+                stats["cache_hits"] += len(filled)
+                misses = [t for t in batch if str(t["id"]) not in filled]
+                if not misses:
+                    logger.info(f"Batch {i // batch_size + 1}: {len(batch)} embeddings from cache")
+                    continue
+                
+                texts = [_clean_for_embedding(t["content"]) for t in misses]
+                client = _resolve_client(openai_client)
+                response = await llm_gateway.run("openai", EMBEDDING_MODEL, lambda: client.embeddings.create(
+                    model=EMBEDDING_MODEL,
                     input=texts
-                )
+                ), lane="background")
                 
-                # Update each tweet with its embedding
-                for j, embedding_data in enumerate(response.data):
-                    tweet_id = batch[j]["id"]
-                    embedding = embedding_data.embedding
-                    
-                    try:
-                        supabase_client.table("source_tweets") \
-                            .update({"embedding": embedding}) \
-                            .eq("id", tweet_id) \
-                            .execute()
-                        stats["processed"] += 1
-                    except Exception as e:
-                        logger.error(f"Failed to update embedding for tweet {tweet_id}: {e}")
-                        stats["errors"] += 1
+                # Batch'in tüm embedding'leri tek RPC ile + global cache'e
+                ids = [t["id"] for t in misses[:len(response.data)]]
+                embeddings = [d.embedding for d in response.data]
+                hashes = [t["hash"] for t in misses[:len(response.data)]]
+                saved = await db_call(save_source_tweet_embeddings, supabase_client, ids, embeddings, hashes)
+                await db_call(put_cached_embeddings, supabase_client,
+                              [embedding_key(t) for t in texts[:len(embeddings)]], embeddings)
+                stats["processed"] += saved
+                stats["errors"] += len(misses) - saved
                 
-                logger.info(f"Batch {i // batch_size + 1}: {len(batch)} embeddings generated")
+                logger.info(f"Batch {i // batch_size + 1}: {len(misses)} embeddings generated, "
+                            f"{len(filled)} from cache")
                 
             except Exception as e:
                 logger.error(f"Batch embedding generation failed: {e}")
                 stats["errors"] += len(batch)
         
+        if stats["processed"]:
+            source_vector_index.invalidate(source_id)
         logger.info(f"Embedding generation complete: {stats}")
         return stats
         
@@ -133,43 +165,55 @@ async def generate_embeddings_for_source(
 # INTERNAL HELPERS
 # ═══════════════════════════════════════════
 
-async def _get_embedding(text: str, openai_client) -> Optional[List[float]]:
-    """Get embedding for a text using OpenAI text-embedding-3-small"""
+async def _get_embedding(text: str, openai_client=None, supabase_client=None) -> Optional[List[float]]:
+    """Get embedding for a text using OpenAI text-embedding-3-small (in-process LRU → embedding_cache → API)"""
     try:
         cleaned = _clean_for_embedding(text)
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
+        memo_key = topic_embedding_cache.make_key(cleaned, EMBEDDING_MODEL)
+        embedding = topic_embedding_cache.get(memo_key)
+        if embedding is not None:
+            return embedding
+        
+        key = embedding_key(cleaned)
+        if supabase_client is not None:
+            cached = await db_call(get_cached_embeddings, supabase_client, [key])
+            if key in cached:
+                topic_embedding_cache.put(memo_key, cached[key], persistent=True)
+                return cached[key]
+        
+        client = _resolve_client(openai_client)
+        response = await llm_gateway.run("openai", EMBEDDING_MODEL, lambda: client.embeddings.create(
+            model=EMBEDDING_MODEL,
             input=[cleaned]
-        )
-        return response.data[0].embedding
+        ))
+        embedding = response.data[0].embedding
+        topic_embedding_cache.put(memo_key, embedding)
+        if supabase_client is not None:
+            # Cache yazımı cevabı bekletmez; bu process zaten LRU'dan okuyacak
+            db_submit(put_cached_embeddings, supabase_client, [key], [embedding])
+        return embedding
     except Exception as e:
         logger.error(f"Embedding generation failed: {e}")
         return None
 
 
-def _clean_for_embedding(text: str) -> str:
-    """Clean text for embedding generation"""
-    # Remove URLs
-    text = re.sub(r'https?://\S+', '', text)
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    # Truncate to ~8000 chars (model limit safety)
-    return text[:8000] if text else "empty"
-
-
 async def _match_by_similarity(
     source_id: str,
     embedding: List[float],
     supabase_client,
     candidate_count: int = 20
 ) -> List[dict]:
-    """Call Supabase RPC match_source_tweets for cosine similarity search"""
+    """Cosine similarity search: RAG_RETRIEVAL_BACKEND (local / quantized) or match_source_tweets RPC"""
+    matches = await db_call(search_source_tweets, supabase_client, [source_id], embedding, candidate_count)
+    if matches is not None:
+        return matches
+    
     try:
-        result = supabase_client.rpc("match_source_tweets", {
+        result = await db_execute(supabase_client.rpc("match_source_tweets", {
             "query_embedding": embedding,
             "source_id_param": source_id,
             "match_count": candidate_count
-        }).execute()
+        }))
         
         return result.data if result.data else []
     except Exception as e:
@@ -184,12 +228,11 @@ async def _get_viral_examples(
 ) -> List[dict]:
     """Fallback: get highest engagement tweets"""
     try:
-        result = supabase_client.table("source_tweets") \
-            .select("id, content, likes, retweets, replies, algo_score, similarity") \
-            .eq("source_id", source_id) \
-            .order("likes", desc=True) \
-            .limit(limit) \
-            .execute()
+        result = await db_execute(supabase_client.table("source_tweets")
+            .select("id, content, likes, retweets, replies, algo_score, similarity")
+            .eq("source_id", source_id)
+            .order("likes", desc=True)
+            .limit(limit))
         
         return result.data if result.data else []
     except Exception as e:
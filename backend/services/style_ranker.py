@@ -40,29 +40,54 @@ class StyleRanker:
             return []
         
         reference_tweets = reference_tweets or []
-        scored = []
-        
-        for variant in variants:
-            scores = self._score_variant(
-                variant, style_fingerprint, constraints, reference_tweets
-            )
-            
-            # Ağırlıklı final skor
-            final = (
-                scores['constraint'] * 0.25 +
-                scores['length'] * 0.10 +
-                scores['punctuation'] * 0.10 +
-                scores['vocabulary'] * 0.10 +
-                scores['algorithm'] * 0.20 +
-                scores['hook'] * 0.15 +
-                scores['reply_potential'] * 0.10
-            )
-            
-            scored.append((variant, round(final, 3), scores))
+        scored = [
+            self.score(variant, style_fingerprint, constraints, reference_tweets)
+            for variant in variants
+        ]
         
         scored.sort(key=lambda x: x[1], reverse=True)
         return scored
     
+    def score(
+        self,
+        variant: str,
+        style_fingerprint: dict,
+        constraints,
+        reference_tweets: List[dict],
+    ) -> Tuple[str, float, dict]:
+        """Tek variant'ı skorla. Returns (text, final_score, score_breakdown)"""
+        scores = self._score_variant(
+            variant, style_fingerprint, constraints, reference_tweets
+        )
+        
+        # Ağırlıklı final skor
+        final = (
+            scores['constraint'] * 0.25 +
+            scores['length'] * 0.10 +
+            scores['punctuation'] * 0.10 +
+            scores['vocabulary'] * 0.10 +
+            scores['algorithm'] * 0.20 +
+            scores['hook'] * 0.15 +
+            scores['reply_potential'] * 0.10
+        )
+        
+        return (variant, round(final, 3), scores)
+    
+    def incremental(
+        self,
+        style_fingerprint: dict,
+        constraints,
+        reference_tweets: List[dict] = None,
+        needed: int = 1,
+        threshold: float = 0.7,
+        min_constraint_score: float = 0.6,
+    ) -> "IncrementalRanking":
+        """Variant'ları geldikçe skorlayan ranking (early-exit için)"""
+        return IncrementalRanking(
+            self, style_fingerprint, constraints, reference_tweets or [],
+            needed, threshold, min_constraint_score,
+        )
+    
     def _score_variant(
         self,
         text: str,
@@ -307,6 +332,49 @@ class StyleRanker:
         return filtered[:count]
 
 
+class IncrementalRanking:
+    """
+    Multi-shot üretimde variant'ları tamamlandıkça skorlar.
+    
+    add() her yeni variant'ı skorlar ve threshold'u geçen (ve constraint'e uyan)
+    variant sayısı `needed`'a ulaştığında True döner → kalan istekler iptal edilebilir.
+    """
+    
+    def __init__(self, ranker: StyleRanker, style_fingerprint: dict, constraints,
+                 reference_tweets: List[dict], needed: int, threshold: float,
+                 min_constraint_score: float):
+        self.ranker = ranker
+        self.style_fingerprint = style_fingerprint
+        self.constraints = constraints
+        self.reference_tweets = reference_tweets
+        self.needed = needed
+        self.threshold = threshold
+        self.min_constraint_score = min_constraint_score
+        self.scored: List[Tuple[str, float, dict]] = []
+    
+    def add(self, variant: str) -> bool:
+        if variant:
+            self.scored.append(self.ranker.score(
+                variant, self.style_fingerprint, self.constraints, self.reference_tweets
+            ))
+        return self.satisfied
+    
+    @property
+    def good_count(self) -> int:
+        return sum(
+            1 for _, final, scores in self.scored
+            if final >= self.threshold and scores.get('constraint', 0) >= self.min_constraint_score
+        )
+    
+    @property
+    def satisfied(self) -> bool:
+        return self.good_count >= self.needed
+    
+    def ranked(self) -> List[Tuple[str, float, dict]]:
+        """rank() ile aynı format: score DESC"""
+        return sorted(self.scored, key=lambda x: x[1], reverse=True)
+
+
 def get_posting_suggestion(viral_patterns: dict) -> Optional[dict]:
     """Viral pattern'lerden posting önerisi çıkar"""
     if not viral_patterns:
@@ -0,0 +1,76 @@
+"""
+Topic Embedding Cache - RAG sorgusu için topic embedding'ini process içinde tutar.
+
+Kullanıcı aynı konuyu tweet / quote / reply için defalarca üretir; her üretimde
+topic'i tekrar embed etmek ~150-300ms OpenAI round trip'i demek. Bu LRU, aynı
+(model, temizlenmiş metin) için vektörü bellekten döner.
+
+Katmanlar (style_rag._get_embedding / embed_tweets.embed_query):
+    1. topic_embedding_cache (bu modül, in-process LRU)
+    2. embedding_cache tablosu (persistent, migration 015 — process restart / diğer worker'lar)
+    3. OpenAI
+
+Key, embedding_cache ile aynı: embedding_key(text) = sha256(clean_for_embedding(text)).
+Vektörler array('f') olarak saklanır (1536 boyut ≈ 6 KB; Python float listesi ≈ 50 KB).
+Embedding'ler model için deterministik olduğundan TTL yok, sadece LRU eviction.
+"""
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from services.embedding_store import EMBEDDING_MODEL, embedding_key
+
+TOPIC_EMBEDDING_CACHE_SIZE = int(os.environ.get("TOPIC_EMBEDDING_CACHE_SIZE", "512"))
+
+
+class TopicEmbeddingCache:
+    """LRU eviction'lı in-process cache. Thread-safe (embed_tweets sync yolu thread'lerde çalışır)."""
+
+    def __init__(self, max_size: int = TOPIC_EMBEDDING_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[Tuple[str, str], array] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, model: str = EMBEDDING_MODEL) -> Tuple[str, str]:
+        return model, embedding_key(text)
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector.tolist()
+
+    def put(self, key: Tuple[str, str], embedding: Sequence[float], persistent: bool = False):
+        """persistent=True: vektör embedding_cache tablosundan geldi (OpenAI çağrılmadı)."""
+        if not embedding:
+            return
+        vector = array("f", embedding)
+        with self._lock:
+            if persistent:
+                self.persistent_hits += 1
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        # misses = bellekte yok; persistent_hits bunların tablodan dönenleri (kalanı OpenAI'a gitti)
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+        }
+
+
+topic_embedding_cache = TopicEmbeddingCache()
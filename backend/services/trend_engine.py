@@ -16,18 +16,18 @@ import uuid
 
 import feedparser
 import httpx
-from openai import OpenAI
 
 from supabase import create_client
 
+from services.db import db_execute
+from services.llm_gateway import llm_gateway
+
 logger = logging.getLogger(__name__)
 
 supabase_url = os.environ.get('SUPABASE_URL', '')
 supabase_key = os.environ.get('SUPABASE_SERVICE_KEY', '')
 supabase = create_client(supabase_url, supabase_key) if supabase_url else None
 
-openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY', ''))
-
 
 def _resolve_published_at(trend, source_item, items_by_title, all_items):
     """Resolve published_at from multiple sources, ensuring proper format."""
@@ -361,7 +361,9 @@ Aynı konunun tekrarını YAPMA, birleştir.
 Başka açıklama ekleme, sadece JSON döndür."""
 
         try:
-            response = openai_client.chat.completions.create(
+            response = await llm_gateway.chat(
+                "openai",
+                lane="background",  # Cron: interaktif üretimi aç bırakmamalı
                 model=os.environ.get('MODEL_ANALYSIS', 'gpt-4o-mini'),
                 messages=[
                     {"role": "system", "content": "Sen sert bir haber editörüsün. Skorları şişirme, acımasızca değerlendir. Sadece JSON döndür."},
@@ -606,7 +608,7 @@ Başka açıklama ekleme, sadece JSON döndür."""
                         enriched_count += 1
 
                 # Check if URL already exists (dedup)
-                existing = supabase.table("trends").select("id,signal_count,engagement_total,source_tweets").eq("url", trend_url).limit(1).execute()
+                existing = await db_execute(supabase.table("trends").select("id,signal_count,engagement_total,source_tweets").eq("url", trend_url).limit(1))
                 if existing.data:
                     existing_doc = existing.data[0]
                     del doc["id"]
@@ -628,10 +630,10 @@ Başka açıklama ekleme, sadece JSON döndür."""
                     doc["signal_count"] = max(doc["signal_count"], existing_doc.get("signal_count", 1))
                     doc["engagement_total"] = max(doc["engagement_total"], existing_doc.get("engagement_total", 0))
 
-                    supabase.table("trends").update(doc).eq("id", existing_doc["id"]).execute()
+                    await db_execute(supabase.table("trends").update(doc).eq("id", existing_doc["id"]))
                     logger.info(f"Updated trend: {trend.get('topic', '?')} (score: {final_score}, signals: {signal_count})")
                 else:
-                    supabase.table("trends").insert(doc).execute()
+                    await db_execute(supabase.table("trends").insert(doc))
                     logger.info(f"New trend: {trend.get('topic', '?')} (score: {final_score}, signals: {signal_count})")
                 saved += 1
             except Exception as e:
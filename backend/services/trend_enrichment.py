@@ -13,7 +13,7 @@ import json
 import logging
 from typing import Optional
 
-import httpx
+from services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -83,28 +83,25 @@ async def enrich_trend(
     )
 
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 800,
-                    "temperature": 0.7,
-                    "response_format": {"type": "json_object"},
-                },
-            )
-            if resp.status_code == 200:
-                content = resp.json()["choices"][0]["message"]["content"]
-                enrichment = json.loads(content)
-
-                # Validate
-                if "key_angles" in enrichment and "suggested_hooks" in enrichment:
-                    return enrichment
-                else:
-                    logger.warning(f"Enrichment eksik alan: {list(enrichment.keys())}")
-                    return None
+        response = await llm_gateway.chat(
+            "openai",
+            lane="background",
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=800,
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            timeout=30,
+        )
+        content = response.choices[0].message.content
+        enrichment = json.loads(content)
+
+        # Validate
+        if "key_angles" in enrichment and "suggested_hooks" in enrichment:
+            return enrichment
+        else:
+            logger.warning(f"Enrichment eksik alan: {list(enrichment.keys())}")
+            return None
     except Exception as e:
         logger.error(f"Enrichment hatası: {e}")
 
@@ -12,11 +12,17 @@ Kullanıcının tweet'lerini Apify ile çeker, source_tweets'e kaydeder.
 
 import os
 import re
+import asyncio
 import logging
 import hashlib
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timezone
 
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from services.db import db_execute
+
 logger = logging.getLogger(__name__)
 
 # Apify config
@@ -30,6 +36,13 @@ REPLY_TWEET_LIMIT = 100
 QUOTE_TWEET_LIMIT = 100
 QUICK_LIMIT = 50  # Progressive modda hızlı çekim
 
+# DB kayıt: source_tweets bulk upsert
+SAVE_CHUNK_SIZE = int(os.environ.get("TWEET_SAVE_CHUNK_SIZE", "500"))
+SAVE_CHUNK_RETRIES = 2       # Chunk başına tekrar (geçici hata: bağlantı / 5xx), sonra chunk bırakılır
+SAVE_RETRY_DELAY = 1.0       # saniye (attempt ile artar)
+# Mevcut satırları okurken sayfa boyu (PostgREST max-rows varsayılanı 1000; üstü sessizce kesilir)
+EXISTING_PAGE_SIZE = 1000
+
 
 def _build_queries(handle: str, quick: bool = False) -> List[Dict]:
     """Apify search query'leri oluştur"""
@@ -238,46 +251,133 @@ def calculate_engagement_score(tweet: dict) -> float:
     )
 
 
+def _tweet_row(source_id: str, tweet: Dict) -> Dict:
+    return {
+        "source_id": source_id,
+        "tweet_id": tweet["tweet_id"],
+        "content": tweet["content"],
+        "likes": tweet["likes"],
+        "retweets": tweet["retweets"],
+        "replies": tweet["replies"],
+        "views": tweet.get("views"),
+        "bookmarks": tweet.get("bookmarks", 0),
+        "quotes": tweet.get("quotes", 0),
+        "tweet_type": tweet.get("tweet_type", "original"),
+        "language": tweet.get("language"),
+        "has_media": tweet.get("has_media", False),
+        "has_link": tweet.get("has_link", False),
+        "word_count": tweet.get("word_count"),
+        "engagement_score": tweet.get("engagement_score"),
+        "is_thread": tweet.get("is_thread", False),
+        "tweet_created_at": tweet.get("tweet_created_at"),
+    }
+
+
+def _is_row_error(e: Exception) -> bool:
+    """Satır verisinden kaynaklanan hata mı? (22xxx data exception, 23xxx constraint ihlali)"""
+    return isinstance(e, APIError) and str(e.code or "")[:2] in ("22", "23")
+
+
+async def _upsert_rows(supabase_client, rows: List[Dict], attempts: int = 1) -> int:
+    """
+    rows'u tek istekte upsert et.
+    - Satır verisi hatası (22xxx / 23xxx): tekrar denemenin anlamı yok, ikiye bölüp her yarıyı
+      ayrı dene → tek bozuk satır tüm chunk'ı kaybettirmez.
+    - Diğer hatalar (bağlantı, timeout, 5xx, şema): attempts kadar dene, sonra tüm chunk'ı bırak.
+      Bölmek kesintide istek sayısını ~2 katına çıkarır, bir şey kazandırmaz.
+    Returns: kaydedilen satır sayısı.
+    """
+    for attempt in range(attempts):
+        try:
+            await db_execute(supabase_client.table("source_tweets").upsert(
+                rows,
+                on_conflict="source_id,tweet_id",
+                returning=ReturnMethod.minimal,
+            ))
+            return len(rows)
+        except Exception as e:
+            if _is_row_error(e):
+                if len(rows) == 1:
+                    logger.warning(f"Failed to save tweet {rows[0]['tweet_id']}: {e}")
+                    return 0
+                mid = len(rows) // 2
+                return (
+                    await _upsert_rows(supabase_client, rows[:mid], attempts)
+                    + await _upsert_rows(supabase_client, rows[mid:], attempts)
+                )
+            if attempt < attempts - 1:
+                await asyncio.sleep(SAVE_RETRY_DELAY * (attempt + 1))
+            else:
+                logger.warning(f"Failed to save {len(rows)} tweets after {attempts} attempts: {e}")
+    return 0
+
+
+async def upsert_source_tweets(supabase_client, rows: List[Dict]) -> int:
+    """
+    source_tweets satırlarını (source_id, tweet_id) üzerinden chunk'lı upsert et.
+    Var olan satırın embedding / content_hash kolonlarına dokunulmaz (payload'da yoklar).
+    Returns: kaydedilen satır sayısı.
+    """
+    # Aynı istekte aynı conflict key iki kez olursa Postgres tüm upsert'ü reddeder → dedup (sonuncu kazanır)
+    rows = list({(row["source_id"], row["tweet_id"]): row for row in rows}.values())
+
+    saved = 0
+    for i in range(0, len(rows), SAVE_CHUNK_SIZE):
+        chunk = rows[i:i + SAVE_CHUNK_SIZE]
+        saved += await _upsert_rows(supabase_client, chunk, attempts=1 + SAVE_CHUNK_RETRIES)
+    return saved
+
+
+async def replace_source_tweets(supabase_client, source_id: str, records: List[Dict]) -> Dict[str, int]:
+    """
+    Source'un tweet'lerini yeni scrape sonucu ile değiştir (refresh).
+
+    Eskiden delete-all + insert yapılıyordu → her refresh'te tüm embedding'ler siliniyordu.
+    Şimdi: upsert (mevcut tweet'ler id + embedding + content_hash'ini korur) ve listede
+    artık olmayan tweet'leri sil. Böylece embedding refresh sadece yeni/değişen içeriği işler.
+    """
+    existing = []
+    offset = 0
+    while True:
+        page = (await db_execute(supabase_client.table("source_tweets")
+            .select("id, tweet_id")
+            .eq("source_id", source_id)
+            .order("id")
+            .range(offset, offset + EXISTING_PAGE_SIZE - 1))).data or []
+        existing.extend(page)
+        if len(page) < EXISTING_PAGE_SIZE:
+            break
+        offset += EXISTING_PAGE_SIZE
+
+    # id'ler mevcut satırlarda korunur; yeni satırlar DB default'unu alır
+    rows = [{k: v for k, v in record.items() if k != "id"} for record in records]
+    saved = await upsert_source_tweets(supabase_client, rows)
+
+    keep = {str(record["tweet_id"]) for record in records}
+    stale_ids = [row["id"] for row in existing if str(row["tweet_id"]) not in keep]
+    for i in range(0, len(stale_ids), 200):
+        await db_execute(supabase_client.table("source_tweets")
+            .delete()
+            .in_("id", stale_ids[i:i + 200]))
+
+    logger.info(f"Source {source_id}: {saved}/{len(records)} tweets upserted, {len(stale_ids)} stale removed")
+    return {"saved": saved, "removed": len(stale_ids)}
+
+
 async def save_tweets_to_db(
     supabase_client,
     source_id: str,
     tweets: List[Dict],
 ) -> int:
-    """Tweet'leri source_tweets tablosuna kaydet (upsert)"""
-    saved = 0
-    
+    """Tweet'leri source_tweets tablosuna kaydet (chunk'lı bulk upsert)"""
+    rows = []
     for tweet in tweets:
         try:
-            row = {
-                "source_id": source_id,
-                "tweet_id": tweet["tweet_id"],
-                "content": tweet["content"],
-                "likes": tweet["likes"],
-                "retweets": tweet["retweets"],
-                "replies": tweet["replies"],
-                "views": tweet.get("views"),
-                "bookmarks": tweet.get("bookmarks", 0),
-                "quotes": tweet.get("quotes", 0),
-                "tweet_type": tweet.get("tweet_type", "original"),
-                "language": tweet.get("language"),
-                "has_media": tweet.get("has_media", False),
-                "has_link": tweet.get("has_link", False),
-                "word_count": tweet.get("word_count"),
-                "engagement_score": tweet.get("engagement_score"),
-                "is_thread": tweet.get("is_thread", False),
-                "tweet_created_at": tweet.get("tweet_created_at"),
-            }
-            
-            supabase_client.table("source_tweets").upsert(
-                row,
-                on_conflict="source_id,tweet_id",
-            ).execute()
-            saved += 1
-            
-        except Exception as e:
-            logger.warning(f"Failed to save tweet {tweet['tweet_id']}: {e}")
-            continue
-    
+            rows.append(_tweet_row(source_id, tweet))
+        except KeyError as e:
+            logger.warning(f"Skipping malformed tweet {tweet.get('tweet_id')}: missing {e}")
+
+    saved = await upsert_source_tweets(supabase_client, rows)
     logger.info(f"Saved {saved}/{len(tweets)} tweets to source_tweets")
     return saved
 
@@ -303,10 +403,10 @@ async def collect_and_save(
     
     # Update source stats
     try:
-        supabase_client.table("style_sources").update({
+        await db_execute(supabase_client.table("style_sources").update({
             "tweet_count": len(tweets),
             "last_scraped_at": datetime.now(timezone.utc).isoformat(),
-        }).eq("id", source_id).execute()
+        }).eq("id", source_id))
     except Exception as e:
         logger.warning(f"Failed to update source stats: {e}")
     
@@ -14,6 +14,7 @@ import asyncio
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional
 
+from services.db import db_call, db_execute
 from services.twitter_graphql import TwitterGraphQL, QUERY_IDS, DEFAULT_FEATURES
 
 logger = logging.getLogger(__name__)
@@ -76,30 +77,27 @@ def _get_watch_accounts(tier: Optional[int] = None) -> List[dict]:
 
 async def _filter_tier2_tweet(tweet_text: str) -> bool:
     """GPT ile Tier 2 tweet'in AI/tech ile ilgili olup olmadığını kontrol et."""
-    import httpx
+    from services.llm_gateway import llm_gateway
 
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         return True  # Filtre yapamıyorsa geçir
 
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
-            resp = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                        {"role": "system", "content": TIER2_FILTER_PROMPT},
-                        {"role": "user", "content": tweet_text[:500]},
-                    ],
-                    "max_tokens": 5,
-                    "temperature": 0,
-                },
-            )
-            if resp.status_code == 200:
-                answer = resp.json()["choices"][0]["message"]["content"].strip().upper()
-                return answer.startswith("EVET") or answer.startswith("YES")
+        response = await llm_gateway.chat(
+            "openai",
+            lane="background",
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": TIER2_FILTER_PROMPT},
+                {"role": "user", "content": tweet_text[:500]},
+            ],
+            max_tokens=5,
+            temperature=0,
+            timeout=15,
+        )
+        answer = response.choices[0].message.content.strip().upper()
+        return answer.startswith("EVET") or answer.startswith("YES")
     except Exception as e:
         logger.warning(f"Tier 2 filter hatası: {e}")
 
@@ -289,7 +287,7 @@ async def fetch_all_twitter_signals(include_search: bool = False) -> List[dict]:
     all_signals = []
 
     # --- Tier 1: Resmi hesaplar ---
-    tier1_accounts = _get_watch_accounts(tier=1)
+    tier1_accounts = await db_call(_get_watch_accounts, tier=1)
     logger.info(f"Tier 1: {len(tier1_accounts)} resmi hesap taranıyor...")
 
     for account in tier1_accounts:
@@ -307,9 +305,9 @@ async def fetch_all_twitter_signals(include_search: bool = False) -> List[dict]:
             # last_tweet_id güncelle
             if tweets and supabase:
                 newest_id = max(t["tweet_id"] for t in tweets)
-                supabase.table("twitter_watch_accounts").update(
+                await db_execute(supabase.table("twitter_watch_accounts").update(
                     {"last_tweet_id": newest_id}
-                ).eq("username", username).execute()
+                ).eq("username", username))
 
             logger.info(f"  @{username}: {len(tweets)} yeni tweet")
         except Exception as e:
@@ -318,7 +316,7 @@ async def fetch_all_twitter_signals(include_search: bool = False) -> List[dict]:
         await asyncio.sleep(2)  # Rate limit koruması
 
     # --- Tier 2: Key people (GPT filtreli) ---
-    tier2_accounts = _get_watch_accounts(tier=2)
+    tier2_accounts = await db_call(_get_watch_accounts, tier=2)
     logger.info(f"Tier 2: {len(tier2_accounts)} key person taranıyor...")
 
     for account in tier2_accounts:
@@ -344,9 +342,9 @@ async def fetch_all_twitter_signals(include_search: bool = False) -> List[dict]:
             # last_tweet_id güncelle (filtrelenmemiş en son tweet)
             if tweets and supabase:
                 newest_id = max(t["tweet_id"] for t in tweets)
-                supabase.table("twitter_watch_accounts").update(
+                await db_execute(supabase.table("twitter_watch_accounts").update(
                     {"last_tweet_id": newest_id}
-                ).eq("username", username).execute()
+                ).eq("username", username))
 
             logger.info(f"  @{username}: {len(tweets)} tweet, {len(filtered)} relevant")
         except Exception as e:
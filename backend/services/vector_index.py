@@ -0,0 +1,358 @@
+"""
+Vector Index - source başına in-process embedding matrisi (match_source_tweets RPC'ye alternatif).
+Ayrıca RAG retrieval backend seçimi: search_source_tweets.
+
+match_source_tweets RPC'si her sorguda 1536 float'lık vektörü JSON ile gönderir ve DB yüküne
+bağlıdır. Source'lar küçük (≤5000 tweet) olduğundan matris bellekte tutulup tek bir
+vektörel dot product ile aranabilir (exact cosine; HNSW gibi yaklaşık değil).
+
+Backend seçimi: RAG_RETRIEVAL_BACKEND
+    rpc (varsayılan): match_source_tweets (float32 HNSW, migration 002/007)
+    local: source_vector_index.search (bu modül; migration 016)
+    halfvec | halfvec512 | binary: match_source_tweets_quantized (migration 017) — quantized
+        index'ten RAG_RESCORE_CANDIDATES aday, float32 cosine ile yeniden sıralanır
+search_source_tweets None dönerse (rpc seçili, numpy / migration yok, DB hatası) çağıran
+match_source_tweets RPC'sine düşer.
+
+Tazelik: bir source en fazla SOURCE_INDEX_CHECK_INTERVAL saniyede bir
+source_embedding_fingerprints RPC'si ile kontrol edilir (migration 016, vektör taşımaz);
+fingerprint değiştiyse matris yeniden kurulur. Aynı process'te embedding yazan yollar
+ayrıca invalidate(source_id) çağırır.
+
+Bellek: toplam matris boyutu VECTOR_INDEX_MAX_MB'yi aşınca en uzun süredir kullanılmayan
+source atılır (LRU). VECTOR_INDEX_DTYPE=float16 belleği yarıya indirir ama numpy'da float16
+matmul BLAS kullanmaz (~5-10x yavaş); varsayılan float32.
+VECTOR_INDEX_DIR verilirse matrisler .npy olarak diske yazılır ve restart sonrası memory-map
+ile açılır (fingerprint tutuyorsa DB'den vektör çekilmez).
+
+Kullanım:
+    from services.vector_index import search_source_tweets
+
+    rows = search_source_tweets(supabase, [source_id], embedding, count=20)            # sync
+    rows = await db_call(search_source_tweets, supabase, [source_id], embedding, 20)   # async
+    if rows is None: ...  # match_source_tweets RPC
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy yoksa local backend devre dışı, RPC kullanılır
+    np = None
+
+from services.embedding_store import parse_vector
+
+logger = logging.getLogger(__name__)
+
+RAG_RETRIEVAL_BACKEND = os.environ.get("RAG_RETRIEVAL_BACKEND", "rpc")
+VECTOR_INDEX_MAX_MB = int(os.environ.get("VECTOR_INDEX_MAX_MB", "256"))
+VECTOR_INDEX_DTYPE = os.environ.get("VECTOR_INDEX_DTYPE", "float32")
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "")
+SOURCE_INDEX_CHECK_INTERVAL = int(os.environ.get("SOURCE_INDEX_CHECK_INTERVAL", "60"))
+
+# Quantized index modları (migration 017) ve rescoring için çekilen aday sayısı
+QUANTIZED_MODES = ("halfvec", "halfvec512", "binary")
+RAG_RESCORE_CANDIDATES = int(os.environ.get("RAG_RESCORE_CANDIDATES", "100"))
+
+# PostgREST max-rows (varsayılan 1000) — build sırasında sayfa boyutu
+SOURCE_INDEX_PAGE_SIZE = 1000
+
+# match_source_tweets'in döndürdüğü kolonlar (+ source_id, multi-source arama için)
+INDEX_COLUMNS = "id, source_id, content, likes, retweets, replies, engagement_score, algo_score, tweet_type, word_count"
+
+if RAG_RETRIEVAL_BACKEND == "local" and np is None:
+    logger.warning("RAG_RETRIEVAL_BACKEND=local but numpy is not installed, using match_source_tweets RPC")
+
+
+@dataclass
+class SourceIndex:
+    fingerprint: str
+    rows: List[dict]
+    matrix: "np.ndarray"  # (n, dim), satırlar L2-normalize
+    checked_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes)
+
+
+class SourceVectorIndex:
+    """Source başına embedding matrisi; toplam byte bütçeli LRU. Thread-safe (db_call thread'lerinden çağrılır)."""
+
+    def __init__(
+        self,
+        max_bytes: int = VECTOR_INDEX_MAX_MB * 1024 * 1024,
+        dtype: str = VECTOR_INDEX_DTYPE,
+        directory: str = VECTOR_INDEX_DIR,
+        check_interval: float = SOURCE_INDEX_CHECK_INTERVAL,
+    ):
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries: OrderedDict[str, SourceIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.builds = 0
+        self.disk_loads = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+    def invalidate(self, source_id: str):
+        """Bu process'te source'un embedding'leri değişti → sonraki aramada fingerprint kontrolü."""
+        with self._lock:
+            self._entries.pop(str(source_id), None)
+
+    # ==================== Build ====================
+
+    def _fingerprints(self, client, source_ids: List[str]) -> Dict[str, str]:
+        result = client.rpc("source_embedding_fingerprints", {"p_source_ids": source_ids}).execute()
+        return {str(row["source_id"]): row["fingerprint"] for row in (result.data or [])}
+
+    def _fetch_rows(self, client, source_id: str):
+        rows, vectors = [], []
+        offset = 0
+        while True:
+            result = client.table("source_tweets") \
+                .select(f"{INDEX_COLUMNS}, embedding") \
+                .eq("source_id", source_id) \
+                .not_.is_("embedding", "null") \
+                .order("id") \
+                .range(offset, offset + SOURCE_INDEX_PAGE_SIZE - 1) \
+                .execute()
+            page = result.data or []
+            for row in page:
+                vectors.append(parse_vector(row.pop("embedding")))
+                rows.append(row)
+            if len(page) < SOURCE_INDEX_PAGE_SIZE:
+                return rows, vectors
+            offset += SOURCE_INDEX_PAGE_SIZE
+
+    def _paths(self, source_id: str, fingerprint: str):
+        # Dosya adında fingerprint → farklı build'lerin matris/satır dosyaları karışamaz
+        base = os.path.join(self.directory, f"{source_id}.{fingerprint}")
+        return base + ".npy", base + ".json"
+
+    def _load_from_disk(self, source_id: str, fingerprint: str) -> Optional[SourceIndex]:
+        if not self.directory or not fingerprint:
+            return None
+        matrix_path, rows_path = self._paths(source_id, fingerprint)
+        try:
+            with open(rows_path, encoding="utf-8") as f:
+                rows = json.load(f)
+            matrix = np.load(matrix_path, mmap_mode="r")
+            if matrix.dtype != np.dtype(self.dtype) or matrix.shape[0] != len(rows):
+                return None
+            return SourceIndex(fingerprint, rows, matrix, time.monotonic())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Vector index disk load failed for {source_id}: {e}")
+            return None
+
+    def _save_to_disk(self, source_id: str, index: SourceIndex):
+        if not self.directory:
+            return
+        matrix_path, rows_path = self._paths(source_id, index.fingerprint)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(matrix_path + ".tmp", "wb") as f:
+                np.save(f, index.matrix)
+            with open(rows_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(index.rows, f)
+            os.replace(matrix_path + ".tmp", matrix_path)
+            os.replace(rows_path + ".tmp", rows_path)
+            # Aynı source'un eski fingerprint'li dosyaları
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.startswith(f"{source_id}.") and path not in (matrix_path, rows_path) \
+                        and not name.endswith(".tmp"):
+                    os.remove(path)
+        except Exception as e:
+            logger.warning(f"Vector index disk save failed for {source_id}: {e}")
+
+    def _build(self, client, source_id: str, fingerprint: str) -> SourceIndex:
+        index = self._load_from_disk(source_id, fingerprint)
+        if index is not None:
+            self.disk_loads += 1
+            return index
+
+        if not fingerprint:
+            return SourceIndex(fingerprint, [], np.zeros((0, 0), dtype=self.dtype), time.monotonic())
+
+        started = time.monotonic()
+        rows, vectors = self._fetch_rows(client, source_id)
+        if not vectors:
+            return SourceIndex(fingerprint, [], np.zeros((0, 0), dtype=self.dtype), time.monotonic())
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = (matrix / norms).astype(self.dtype, copy=False)
+
+        index = SourceIndex(fingerprint, rows, matrix, time.monotonic())
+        self._save_to_disk(source_id, index)
+        self.builds += 1
+        logger.info(f"Vector index built for source {source_id}: {len(rows)} rows, "
+                    f"{index.nbytes / 1024 / 1024:.1f} MB in {(time.monotonic() - started) * 1000:.0f}ms")
+        return index
+
+    def _store(self, source_id: str, index: SourceIndex):
+        with self._lock:
+            self._entries[source_id] = index
+            self._entries.move_to_end(source_id)
+            total = sum(entry.nbytes for entry in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.nbytes
+                self.evictions += 1
+
+    def _ensure(self, client, source_ids: List[str]) -> List[SourceIndex]:
+        now = time.monotonic()
+        with self._lock:
+            current = {sid: self._entries.get(sid) for sid in source_ids}
+            for sid, entry in current.items():
+                if entry is not None:
+                    self._entries.move_to_end(sid)
+
+        stale = [sid for sid, entry in current.items()
+                 if entry is None or now - entry.checked_at > self.check_interval]
+        if not stale:
+            return [current[sid] for sid in source_ids]
+
+        fingerprints = self._fingerprints(client, stale)
+        for sid in stale:
+            # Embed edilmiş satırı olmayan source RPC'den dönmez → boş index
+            fingerprint = fingerprints.get(sid, "")
+            entry = current[sid]
+            if entry is not None and entry.fingerprint == fingerprint:
+                entry.checked_at = now
+                continue
+
+            with self._lock:
+                build_lock = self._build_locks.setdefault(sid, threading.Lock())
+            with build_lock:
+                # Aynı source'u başka bir istek az önce kurmuş olabilir
+                with self._lock:
+                    latest = self._entries.get(sid)
+                if latest is not None and latest.fingerprint == fingerprint:
+                    entry = latest
+                else:
+                    entry = self._build(client, sid, fingerprint)
+                    self._store(sid, entry)
+            current[sid] = entry
+
+        return [current[sid] for sid in source_ids]
+
+    # ==================== Search ====================
+
+    def search(
+        self,
+        client,
+        source_ids: Sequence[str],
+        embedding: Sequence[float],
+        count: int = 20,
+        threshold: Optional[float] = None,
+    ) -> Optional[List[dict]]:
+        """
+        match_source_tweets ile aynı satırlar (+ similarity), similarity'ye göre azalan.
+        threshold verilirse similarity > threshold olanlar. Blocking (build DB'ye gidebilir).
+        Returns None → local index kullanılamadı, çağıran RPC'ye düşmeli.
+        """
+        if np is None or not source_ids or count <= 0:
+            return None
+        try:
+            indexes = self._ensure(client, [str(sid) for sid in source_ids])
+        except Exception as e:
+            self.fallbacks += 1
+            logger.warning(f"Vector index unavailable, falling back to RPC: {e}")
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        query = query.astype(self.dtype, copy=False)
+
+        scored = []
+        for index in indexes:
+            if not index.rows:
+                continue
+            similarities = index.matrix @ query
+            candidates = np.arange(len(index.rows)) if threshold is None \
+                else np.flatnonzero(similarities > threshold)
+            if len(candidates) > count:
+                candidates = candidates[np.argpartition(-similarities[candidates], count - 1)[:count]]
+            scored.extend((float(similarities[i]), index.rows[i]) for i in candidates)
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        self.hits += 1
+        # Kopya: çağıranlar satıra skor alanları ekliyor (hybrid_score vs.), cache'teki satır değişmesin
+        return [{**row, "similarity": similarity} for similarity, row in scored[:count]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            sources = len(self._entries)
+            total = sum(entry.nbytes for entry in self._entries.values())
+        return {
+            "sources": sources,
+            "bytes": total,
+            "hits": self.hits,
+            "builds": self.builds,
+            "disk_loads": self.disk_loads,
+            "evictions": self.evictions,
+            "fallbacks": self.fallbacks,
+        }
+
+
+source_vector_index = SourceVectorIndex()
+
+
+def search_quantized(
+    client,
+    source_ids: Sequence[str],
+    embedding: Sequence[float],
+    count: int = 20,
+    threshold: Optional[float] = None,
+    mode: str = "halfvec",
+    candidates: int = RAG_RESCORE_CANDIDATES,
+) -> Optional[List[dict]]:
+    """Quantized index'ten aday + float32 rescoring (migration 017). Hata → None."""
+    try:
+        result = client.rpc("match_source_tweets_quantized", {
+            "query_embedding": list(embedding),
+            "source_ids": [str(sid) for sid in source_ids],
+            "match_count": count,
+            "match_threshold": threshold,
+            "p_mode": mode,
+            "p_candidates": candidates,
+        }).execute()
+        return result.data or []
+    except Exception as e:
+        logger.warning(f"match_source_tweets_quantized ({mode}) failed, falling back to RPC: {e}")
+        return None
+
+
+def search_source_tweets(
+    client,
+    source_ids: Sequence[str],
+    embedding: Sequence[float],
+    count: int = 20,
+    threshold: Optional[float] = None,
+    backend: str = RAG_RETRIEVAL_BACKEND,
+) -> Optional[List[dict]]:
+    """
+    RAG_RETRIEVAL_BACKEND'e göre similarity araması. Blocking.
+    Returns None → backend "rpc" ya da kullanılamadı; çağıran match_source_tweets RPC'sini kullanır.
+    """
+    if backend == "local":
+        return source_vector_index.search(client, source_ids, embedding, count, threshold)
+    if backend in QUANTIZED_MODES:
+        return search_quantized(client, source_ids, embedding, count, threshold, mode=backend)
+    return None